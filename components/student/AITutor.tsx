@@ -91,6 +91,8 @@ const AITutor: React.FC = () => {
         { role: 'model', content: DEFAULT_WELCOME_MESSAGE }
     ]);
     const [input, setInput] = useState('');
+    // Server-side tutor session of this conversation; null starts a new one
+    const tutorSessionIdRef = useRef<number | null>(null);
     const [isLoading, setIsLoading] = useState(false);
     const [isMonitorEnabled, setIsMonitorEnabled] = useState(false);
     const [currentExpression, setCurrentExpression] = useState<Expression>('unknown');
@@ -649,7 +651,14 @@ const AITutor: React.FC = () => {
                 chapter: chapterInput.trim() ? chapterInput.trim() : undefined,
             } : undefined;
 
-            const { stream, headers } = await apiService.getTutorResponseStream(messageToSend, useRAG, ragParams);
+            const { stream, headers } = await apiService.getTutorResponseStream(messageToSend, useRAG, ragParams, {
+                sessionId: tutorSessionIdRef.current ?? undefined,
+                newSession: tutorSessionIdRef.current === null,
+            });
+            const sessionId = Number(headers?.['x-tutor-session']);
+            if (sessionId) {
+                tutorSessionIdRef.current = sessionId;
+            }
 
             // Extract RAG metadata from headers
             const status = headers?.['x-rag-status'] || 'disabled';
@@ -716,6 +725,7 @@ const AITutor: React.FC = () => {
     };
 
     const handleClearChat = () => {
+        tutorSessionIdRef.current = null;
         setMessages([{ role: 'model', content: welcomeMessage }]);
         setRagStatus('disabled');
         setRagSources([]);
@@ -1069,7 +1069,8 @@ const runCodeOnBackend = async (code: string, language: string): Promise<{ outpu
 async function getTutorResponseStream(
     message: string,
     useRAG: boolean,
-    ragParams?: { grade?: string; subject?: string; stream?: string; chapter?: string }
+    ragParams?: { grade?: string; subject?: string; stream?: string; chapter?: string },
+    session?: { sessionId?: number; newSession?: boolean }
 ): Promise<{ stream: AsyncGenerator<string, void, undefined>, headers: Record<string, string> }> {
     const token = localStorage.getItem('accessToken');
     const response = await fetch(`${API_BASE_URL}ai-tools/tutor/`, {
@@ -1084,7 +1085,9 @@ async function getTutorResponseStream(
             grade: ragParams?.grade,
             subject: ragParams?.subject,
             stream: ragParams?.stream,
-            chapter: ragParams?.chapter
+            chapter: ragParams?.chapter,
+            sessionId: session?.sessionId,
+            newSession: session?.newSession
         }),
     });
 
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yeneta_backend.communications.channel_layers import SQLiteChannelLayer
+
+
+class TestSQLiteChannelLayerReceive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.layer = SQLiteChannelLayer(path=os.path.join(self.tmpdir.name, 'layer.sqlite3'))
+
+    def tearDown(self):
+        asyncio.run(self.layer.close())
+        self.tmpdir.cleanup()
+
+    def test_cancelled_receive_keeps_other_channels_messages(self):
+        """A receiver cancelled during a poll must not lose the batch it fetched."""
+        layer = self.layer
+        original_fetch = layer._fetch
+
+        def slow_fetch(inbox):
+            rows = original_fetch(inbox)
+            time.sleep(0.2)  # The batch is already deleted from the database here
+            return rows
+
+        layer._fetch = slow_fetch
+
+        async def scenario():
+            first = await layer.new_channel()
+            second = await layer.new_channel()
+            await layer.send(second, {'type': 'test.message', 'text': 'hello'})
+
+            receiver = asyncio.ensure_future(layer.receive(first))
+            await asyncio.sleep(0.05)
+            receiver.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await receiver
+
+            return await asyncio.wait_for(layer.receive(second), timeout=2)
+
+        message = asyncio.run(scenario())
+        self.assertEqual(message['text'], 'hello')
+
+    def test_close_closes_worker_thread_connections(self):
+        """Connections opened in to_thread workers are closed too."""
+        layer = self.layer
+
+        async def scenario():
+            channel = await layer.new_channel()
+            await layer.send(channel, {'type': 'test.message'})
+            await layer.receive(channel)
+            await layer.group_add('group', channel)
+            connections = list(layer._connections)
+            await layer.close()
+            return connections
+
+        connections = asyncio.run(scenario())
+        self.assertTrue(connections)
+        for conn in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute('SELECT 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
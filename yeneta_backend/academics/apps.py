@@ -7,3 +7,4 @@ class AcademicsConfig(AppConfig):
 
     def ready(self):
         import academics.signals
+        import academics.services_realtime_sync
@@ -0,0 +1,24 @@
+"""
+Django management command to recompute the per-subject grade summaries.
+Usage: python manage.py rebuild_grade_summaries [--student <id> ...]
+"""
+
+from django.core.management.base import BaseCommand
+from academics.services_grade_summary import GradeSummaryService
+
+
+class Command(BaseCommand):
+    help = 'Recompute StudentSubjectGradeSummary rows from StudentGrade records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student',
+            type=int,
+            action='append',
+            dest='student_ids',
+            help='Only rebuild summaries of this student id (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        count = GradeSummaryService.rebuild(options.get('student_ids'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} grade summaries'))
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Case, Count, F, FloatField, Max, Min, Q, Value, When
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+# Frozen copies of academics.services_grade_summary as of this migration, so
+# replaying it does not depend on the current service code
+RECENT_WINDOW = 3
+ASSIGNMENT_WEIGHT = 0.4
+EXAM_WEIGHT = 0.6
+
+
+def grade_percentage():
+    return Case(
+        When(max_score__gt=0, then=F('score') * 100.0 / F('max_score')),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+
+def weighted_overall(assignment_avg, exam_avg):
+    if assignment_avg is not None and exam_avg is not None:
+        return (assignment_avg * ASSIGNMENT_WEIGHT) + (exam_avg * EXAM_WEIGHT)
+    if assignment_avg is not None:
+        return assignment_avg
+    return exam_avg
+
+
+def backfill_grade_summaries(apps, schema_editor):
+    StudentGrade = apps.get_model('academics', 'StudentGrade')
+    StudentSubjectGradeSummary = apps.get_model('academics', 'StudentSubjectGradeSummary')
+
+    keys = {
+        (student_id, subject, grade_level, stream or '')
+        for student_id, subject, grade_level, stream in StudentGrade.objects.values_list(
+            'student_id', 'subject', 'grade_level', 'stream'
+        ).distinct()
+    }
+    summaries = []
+    for student_id, subject, grade_level, stream in keys:
+        grades = StudentGrade.objects.filter(student_id=student_id, subject=subject, grade_level=grade_level)
+        grades = grades.filter(stream=stream) if stream else grades.filter(Q(stream='') | Q(stream__isnull=True))
+        grades = grades.annotate(pct=grade_percentage())
+
+        is_assignment = Q(assignment_type__isnull=False)
+        is_exam = Q(exam_type__isnull=False)
+        totals = grades.aggregate(
+            grade_count=Count('id'),
+            assignment_average=Avg('pct', filter=is_assignment),
+            assignment_count=Count('id', filter=is_assignment),
+            exam_average=Avg('pct', filter=is_exam),
+            exam_count=Count('id', filter=is_exam),
+            average_percentage=Avg('pct'),
+            min_percentage=Min('pct'),
+            max_percentage=Max('pct'),
+            last_graded_at=Max(Coalesce('graded_at', 'created_at')),
+        )
+        recent = list(grades.order_by('-created_at', '-id').values_list('created_at', 'pct')[:RECENT_WINDOW])
+        first = grades.order_by('created_at', 'id').values_list('created_at', 'pct').first()
+        summaries.append(StudentSubjectGradeSummary(
+            student_id=student_id,
+            subject=subject,
+            grade_level=grade_level,
+            stream=stream,
+            overall_grade=weighted_overall(totals['assignment_average'], totals['exam_average']),
+            first_recorded_at=first[0],
+            first_percentage=first[1],
+            recent_percentages=[[created_at.isoformat(), pct] for created_at, pct in reversed(recent)],
+            **totals
+        ))
+    StudentSubjectGradeSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('academics', '0032_assignment_is_published_assignment_shared_with'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectGradeSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('grade_level', models.CharField(max_length=10)),
+                ('stream', models.CharField(blank=True, default='', max_length=50)),
+                ('assignment_average', models.FloatField(blank=True, null=True)),
+                ('assignment_count', models.PositiveIntegerField(default=0)),
+                ('exam_average', models.FloatField(blank=True, null=True)),
+                ('exam_count', models.PositiveIntegerField(default=0)),
+                ('overall_grade', models.FloatField(blank=True, null=True)),
+                ('average_percentage', models.FloatField(blank=True, null=True)),
+                ('min_percentage', models.FloatField(blank=True, null=True)),
+                ('max_percentage', models.FloatField(blank=True, null=True)),
+                ('first_percentage', models.FloatField(blank=True, null=True)),
+                ('first_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('recent_percentages', models.JSONField(blank=True, default=list, help_text='Latest [created_at, percentage] pairs, oldest first')),
+                ('grade_count', models.PositiveIntegerField(default=0)),
+                ('last_graded_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(limit_choices_to={'role': 'Student'}, on_delete=django.db.models.deletion.CASCADE, related_name='grade_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'student_subject_grade_summaries',
+                'indexes': [models.Index(fields=['student', 'subject'], name='student_sub_student_8a9626_idx')],
+                'unique_together': {('student', 'subject', 'grade_level', 'stream')},
+            },
+        ),
+        migrations.RunPython(backfill_grade_summaries, migrations.RunPython.noop),
+    ]
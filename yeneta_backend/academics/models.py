@@ -485,6 +485,55 @@ class StudentGrade(models.Model):
         return (self.score / self.max_score) * 100 if self.max_score > 0 else 0
 
 
+class StudentSubjectGradeSummary(models.Model):
+    """
+    Running grade aggregates per student, subject, grade level and stream.
+
+    Maintained from StudentGrade signals so parent dashboards read one row
+    per subject instead of re-aggregating every grade on each request.
+    Averages are of grade percentages; the overall grade weights
+    assignments 40% and exams 60%.
+    """
+
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='grade_summaries',
+        limit_choices_to={'role': 'Student'}
+    )
+    subject = models.CharField(max_length=100)
+    grade_level = models.CharField(max_length=10)
+    stream = models.CharField(max_length=50, blank=True, default='')
+    assignment_average = models.FloatField(null=True, blank=True)
+    assignment_count = models.PositiveIntegerField(default=0)
+    exam_average = models.FloatField(null=True, blank=True)
+    exam_count = models.PositiveIntegerField(default=0)
+    overall_grade = models.FloatField(null=True, blank=True)
+    average_percentage = models.FloatField(null=True, blank=True)
+    min_percentage = models.FloatField(null=True, blank=True)
+    max_percentage = models.FloatField(null=True, blank=True)
+    first_percentage = models.FloatField(null=True, blank=True)
+    first_recorded_at = models.DateTimeField(null=True, blank=True)
+    recent_percentages = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Latest [created_at, percentage] pairs, oldest first"
+    )
+    grade_count = models.PositiveIntegerField(default=0)
+    last_graded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'student_subject_grade_summaries'
+        unique_together = ['student', 'subject', 'grade_level', 'stream']
+        indexes = [
+            models.Index(fields=['student', 'subject']),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.subject} (Grade {self.grade_level}): {self.overall_grade}"
+
+
 # Import Quiz Models
 from .models_quiz import OnlineQuiz, Question, QuizAttempt, QuestionResponse
 
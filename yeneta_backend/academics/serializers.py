@@ -1,3 +1,4 @@
+from django.db.models import QuerySet
 from rest_framework import serializers
 import random
 from .models import Assignment, Submission, PracticeQuestion, Course, Enrollment, Unit, GradeItem, Grade, TeacherCourseRequest, StudentEnrollmentRequest, StudentGrade, OnlineQuiz, Question, QuizAttempt, QuestionResponse, MasterCourse, Region, GradeLevel, Stream, Subject, Curriculum, AssignmentType, ExamType
@@ -69,6 +70,55 @@ class GradeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'percentage', 'graded_at']
 
 
+def _student_scores(serializer, scope):
+    """
+    Scores of the context student keyed by grade item id.
+
+    Loaded with one query covering every object of the root serializer and
+    stored in the context, so nested serializers given the same context
+    reuse it instead of fetching each Grade.
+
+    Args:
+        serializer: Serializer needing scores
+        scope: Lookup from Grade to the serialized model
+            (e.g. 'grade_item__unit__course')
+    """
+    context = serializer.context
+    scores = context.get('grade_scores')
+    if scores is None:
+        student = context.get('student')
+        instances = serializer.root.instance
+        if not isinstance(instances, (list, tuple, QuerySet)):
+            instances = [instances]
+        scores = {}
+        if student:
+            scores = dict(Grade.objects.filter(
+                student=student,
+                **{f'{scope}__in': [instance.pk for instance in instances if instance is not None]}
+            ).values_list('grade_item_id', 'score'))
+        context['grade_scores'] = scores
+    return scores
+
+
+def _percentage_of_graded(grade_items, scores):
+    """Percentage over the graded items, or 0 when none is graded."""
+    total_score = 0
+    total_max = 0
+    graded_count = 0
+    
+    for item in grade_items:
+        score = scores.get(item.id)
+        if score is not None:
+            total_score += score
+            total_max += item.max_score
+            graded_count += 1
+    
+    if graded_count == 0:
+        return 0
+    
+    return round((total_score / total_max) * 100, 1)
+
+
 class GradeItemWithScoreSerializer(serializers.ModelSerializer):
     """Serializer for GradeItem with student's score."""
     
@@ -85,11 +135,7 @@ class GradeItemWithScoreSerializer(serializers.ModelSerializer):
         if not student:
             return None
         
-        try:
-            grade = Grade.objects.get(student=student, grade_item=obj)
-            return grade.score
-        except Grade.DoesNotExist:
-            return None
+        return _student_scores(self, 'grade_item').get(obj.id)
 
 
 class UnitWithGradesSerializer(serializers.ModelSerializer):
@@ -104,9 +150,9 @@ class UnitWithGradesSerializer(serializers.ModelSerializer):
     
     def get_items(self, obj):
         """Get grade items with student scores."""
-        student = self.context.get('student')
+        _student_scores(self, 'grade_item__unit')
         grade_items = obj.grade_items.all()
-        return GradeItemWithScoreSerializer(grade_items, many=True, context={'student': student}).data
+        return GradeItemWithScoreSerializer(grade_items, many=True, context=self.context).data
     
     def get_unit_grade(self, obj):
         """Calculate unit grade as average of all items."""
@@ -118,24 +164,7 @@ class UnitWithGradesSerializer(serializers.ModelSerializer):
         if not grade_items:
             return 0
         
-        total_score = 0
-        total_max = 0
-        graded_count = 0
-        
-        for item in grade_items:
-            try:
-                grade = Grade.objects.get(student=student, grade_item=item)
-                if grade.score is not None:
-                    total_score += grade.score
-                    total_max += item.max_score
-                    graded_count += 1
-            except Grade.DoesNotExist:
-                pass
-        
-        if graded_count == 0:
-            return 0
-        
-        return round((total_score / total_max) * 100, 1)
+        return _percentage_of_graded(grade_items, _student_scores(self, 'grade_item__unit'))
 
 
 class MasterCourseSerializer(serializers.ModelSerializer):
@@ -225,7 +254,13 @@ class StudentEnrollmentRequestSerializer(serializers.ModelSerializer):
 
 
 class CourseWithGradesSerializer(serializers.ModelSerializer):
-    """Serializer for Course with units and grades."""
+    """
+    Serializer for Course with units and grades.
+
+    Pass ``context={'student': student}`` and a queryset prepared with
+    ``setup_eager_loading``: the student's grades for all serialized courses
+    are then read in one query and shared with the nested serializers.
+    """
     
     teacher_name = serializers.CharField(source='teacher.get_full_name', read_only=True)
     units = serializers.SerializerMethodField()
@@ -235,11 +270,16 @@ class CourseWithGradesSerializer(serializers.ModelSerializer):
         model = Course
         fields = ['id', 'title', 'teacher_name', 'overall_grade', 'units']
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load teachers, units and grade items with the courses."""
+        return queryset.select_related('teacher').prefetch_related('units__grade_items')
+    
     def get_units(self, obj):
         """Get units with grade items and scores."""
-        student = self.context.get('student')
+        _student_scores(self, 'grade_item__unit__course')
         units = obj.units.all()
-        return UnitWithGradesSerializer(units, many=True, context={'student': student}).data
+        return UnitWithGradesSerializer(units, many=True, context=self.context).data
     
     def get_overall_grade(self, obj):
         """Calculate overall course grade."""
@@ -251,25 +291,8 @@ class CourseWithGradesSerializer(serializers.ModelSerializer):
         if not units:
             return 0
         
-        total_score = 0
-        total_max = 0
-        graded_count = 0
-        
-        for unit in units:
-            for item in unit.grade_items.all():
-                try:
-                    grade = Grade.objects.get(student=student, grade_item=item)
-                    if grade.score is not None:
-                        total_score += grade.score
-                        total_max += item.max_score
-                        graded_count += 1
-                except Grade.DoesNotExist:
-                    pass
-        
-        if graded_count == 0:
-            return 0
-        
-        return round((total_score / total_max) * 100, 1)
+        grade_items = [item for unit in units for item in unit.grade_items.all()]
+        return _percentage_of_graded(grade_items, _student_scores(self, 'grade_item__unit__course'))
 
 
 class StudentGradeSerializer(serializers.ModelSerializer):
@@ -3,8 +3,15 @@ Grade aggregation and calculation services for the Gradebook Manager.
 Handles real-time aggregation of grades by type and overall calculations.
 """
 
+from django.core.cache import cache
 from django.db.models import Avg, Q, Count
 from .models import StudentGrade
+from .services_grade_summary import grade_percentage
+from .services_realtime_sync import RealtimeSyncService
+
+# Grades counted in the assignment and exam averages
+ASSIGNMENT_GRADES = Q(assignment_type__isnull=False, exam_type__isnull=True)
+EXAM_GRADES = Q(exam_type__isnull=False, assignment_type__isnull=True)
 
 
 class GradeAggregationService:
@@ -17,6 +24,8 @@ class GradeAggregationService:
     
     EXAM_TYPES = ['Quiz', 'Mid Exam', 'Final Exam']
     
+    CACHE_TIMEOUT = 300  # 5 minutes
+    
     @staticmethod
     def get_grade_by_type(student_id, subject, grade_type, type_value):
         """
@@ -62,10 +71,9 @@ class GradeAggregationService:
             Average score or None if no assignments
         """
         avg = StudentGrade.objects.filter(
+            ASSIGNMENT_GRADES,
             student_id=student_id,
-            subject=subject,
-            assignment_type__isnull=False,
-            exam_type__isnull=True
+            subject=subject
         ).aggregate(avg_score=Avg('score'))
         
         return avg['avg_score']
@@ -83,10 +91,9 @@ class GradeAggregationService:
             Average score or None if no exams
         """
         avg = StudentGrade.objects.filter(
+            EXAM_GRADES,
             student_id=student_id,
-            subject=subject,
-            exam_type__isnull=False,
-            assignment_type__isnull=True
+            subject=subject
         ).aggregate(avg_score=Avg('score'))
         
         return avg['avg_score']
@@ -104,9 +111,36 @@ class GradeAggregationService:
         Returns:
             Overall grade or None if insufficient data
         """
-        assignment_avg = GradeAggregationService.get_assignment_average(student_id, subject)
-        exam_avg = GradeAggregationService.get_exam_average(student_id, subject)
+        averages = StudentGrade.objects.filter(
+            student_id=student_id,
+            subject=subject
+        ).aggregate(**GradeAggregationService._average_aggregates())
+        
+        return GradeAggregationService.combine_averages(
+            averages['assignment_avg'], averages['exam_avg']
+        )
+    
+    @staticmethod
+    def _average_aggregates():
+        """Conditional aggregates computing both averages in one pass."""
+        return {
+            'assignment_avg': Avg('score', filter=ASSIGNMENT_GRADES),
+            'exam_avg': Avg('score', filter=EXAM_GRADES),
+        }
+    
+    @staticmethod
+    def combine_averages(assignment_avg, exam_avg):
+        """
+        Weight assignment and exam averages into the overall grade.
+        Overall Grade = (Assignment Average × 0.4) + (Exam Average × 0.6)
         
+        Args:
+            assignment_avg: Assignment average or None
+            exam_avg: Exam average or None
+            
+        Returns:
+            Overall grade, the single available average, or None
+        """
         # Return None if no data
         if assignment_avg is None and exam_avg is None:
             return None
@@ -121,6 +155,70 @@ class GradeAggregationService:
         overall = (assignment_avg * 0.4) + (exam_avg * 0.6)
         return round(overall, 1)
     
+    @staticmethod
+    def get_subject_averages(student_id, subject=None):
+        """
+        Calculate assignment, exam and overall averages for every subject of
+        a student with one grouped query.
+        
+        Args:
+            student_id: Student ID
+            subject: Optional subject name to restrict to
+            
+        Returns:
+            Dictionary of subject -> {'assignment_avg', 'exam_avg', 'overall'}
+        """
+        grades = StudentGrade.objects.filter(student_id=student_id)
+        if subject:
+            grades = grades.filter(subject=subject)
+        
+        rows = grades.order_by().values('subject').annotate(
+            **GradeAggregationService._average_aggregates()
+        )
+        
+        return {
+            row['subject']: {
+                'assignment_avg': row['assignment_avg'],
+                'exam_avg': row['exam_avg'],
+                'overall': GradeAggregationService.combine_averages(row['assignment_avg'], row['exam_avg'])
+            }
+            for row in rows
+        }
+    
+    @staticmethod
+    def get_gradebook_averages(student_id, subject=None):
+        """
+        Calculate percentage averages per subject, grade level and stream with
+        one grouped query. Unlike the score averages above, a grade with both
+        an assignment and an exam type counts towards both averages.
+        
+        Args:
+            student_id: Student ID
+            subject: Optional subject name to restrict to
+            
+        Returns:
+            Dictionary of (subject, grade_level, stream) ->
+            {'assignment_avg', 'exam_avg'}
+        """
+        grades = StudentGrade.objects.filter(student_id=student_id)
+        if subject:
+            grades = grades.filter(subject=subject)
+        
+        rows = grades.annotate(pct=grade_percentage()).order_by().values(
+            'subject', 'grade_level', 'stream'
+        ).annotate(
+            assignment_avg=Avg('pct', filter=Q(assignment_type__isnull=False)),
+            exam_avg=Avg('pct', filter=Q(exam_type__isnull=False))
+        )
+        
+        return {
+            (row['subject'], row['grade_level'], row['stream']): {
+                'assignment_avg': row['assignment_avg'],
+                'exam_avg': row['exam_avg']
+            }
+            for row in rows
+        }
+    
     @staticmethod
     def get_aggregated_grades(student_id, subject):
         """
@@ -189,9 +287,10 @@ class GradeAggregationService:
         result['total_grades'] = result['completed_grades'] + result['pending_grades']
         
         # Calculate averages
-        result['assignment_average'] = GradeAggregationService.get_assignment_average(student_id, subject)
-        result['exam_average'] = GradeAggregationService.get_exam_average(student_id, subject)
-        result['overall_grade'] = GradeAggregationService.get_overall_grade(student_id, subject)
+        averages = GradeAggregationService.get_subject_averages(student_id, subject).get(subject, {})
+        result['assignment_average'] = averages.get('assignment_avg')
+        result['exam_average'] = averages.get('exam_avg')
+        result['overall_grade'] = averages.get('overall')
         
         return result
     
@@ -233,35 +332,27 @@ class GradeAggregationService:
         Returns:
             Dictionary with performance data
         """
+        cache_key = RealtimeSyncService.versioned_key(
+            f"student_performance_{student_id}", RealtimeSyncService.student_scope(student_id)
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         grades = StudentGrade.objects.filter(student_id=student_id)
         
-        subjects = {}
-        for grade in grades:
-            if grade.subject not in subjects:
-                subjects[grade.subject] = {
-                    'assignment_avg': None,
-                    'exam_avg': None,
-                    'overall': None
-                }
-            
-            # Calculate for this subject
-            subjects[grade.subject]['assignment_avg'] = GradeAggregationService.get_assignment_average(
-                student_id, grade.subject
-            )
-            subjects[grade.subject]['exam_avg'] = GradeAggregationService.get_exam_average(
-                student_id, grade.subject
-            )
-            subjects[grade.subject]['overall'] = GradeAggregationService.get_overall_grade(
-                student_id, grade.subject
-            )
+        subjects = GradeAggregationService.get_subject_averages(student_id)
         
         # Calculate overall performance
-        all_grades = grades.aggregate(avg=Avg('score'))['avg']
+        totals = grades.aggregate(avg=Avg('score'), count=Count('id'))
         
-        return {
+        result = {
             'student_id': student_id,
-            'overall_average': all_grades,
+            'overall_average': totals['avg'],
             'subjects': subjects,
             'total_subjects': len(subjects),
-            'total_grades': grades.count()
+            'total_grades': totals['count']
         }
+        
+        cache.set(cache_key, result, GradeAggregationService.CACHE_TIMEOUT)
+        return result
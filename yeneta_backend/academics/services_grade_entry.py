@@ -6,6 +6,7 @@ Handles subject-specific grade retrieval, bulk operations, and caching
 from django.db.models import Q, Count, Avg, F
 from django.core.cache import cache
 from .models import StudentGrade, Course, Enrollment
+from .services_realtime_sync import RealtimeSyncService
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -23,9 +24,11 @@ class TeacherSubjectGradesService:
         Returns subjects grouped by subject and grade level
         Includes both actual Enrollments and approved StudentEnrollmentRequest records
         """
-        cache_key = f"teacher_subjects_{teacher_id}"
+        cache_key = RealtimeSyncService.versioned_key(
+            f"teacher_subjects_{teacher_id}", RealtimeSyncService.teacher_scope(teacher_id)
+        )
         cached = cache.get(cache_key)
-        if cached:
+        if cached is not None:
             return cached
 
         subject_dict = {}
@@ -81,9 +84,11 @@ class TeacherSubjectGradesService:
         Get all students enrolled in subject with their existing grades
         Optimized query with minimal database hits
         """
-        cache_key = f"subject_grades_{teacher_id}_{subject_id}"
+        cache_key = RealtimeSyncService.versioned_key(
+            f"subject_grades_{teacher_id}_{subject_id}", RealtimeSyncService.teacher_scope(teacher_id)
+        )
         cached = cache.get(cache_key)
-        if cached:
+        if cached is not None:
             return cached
 
         # Resolve Subject/Grade/Stream from the ID (which is a StudentEnrollmentRequest ID)
@@ -167,7 +172,7 @@ class TeacherSubjectGradesService:
             'total_students': len(students_data)
         }
 
-        cache.set(cache_key, result, self.CACHE_TIMEOUT)
+        cache.set(cache_key, result, TeacherSubjectGradesService.CACHE_TIMEOUT)
         return result
 
     @staticmethod
@@ -175,9 +180,11 @@ class TeacherSubjectGradesService:
         """
         Get grade statistics for a subject
         """
-        cache_key = f"subject_summary_{teacher_id}_{subject_id}"
+        cache_key = RealtimeSyncService.versioned_key(
+            f"subject_summary_{teacher_id}_{subject_id}", RealtimeSyncService.teacher_scope(teacher_id)
+        )
         cached = cache.get(cache_key)
-        if cached:
+        if cached is not None:
             return cached
 
         from .models import StudentEnrollmentRequest
@@ -226,7 +233,7 @@ class TeacherSubjectGradesService:
             'exam_average': exam_grades.aggregate(Avg('score'))['score__avg'] or 0,
         }
 
-        cache.set(cache_key, result, self.CACHE_TIMEOUT)
+        cache.set(cache_key, result, TeacherSubjectGradesService.CACHE_TIMEOUT)
         return result
 
     @staticmethod
@@ -289,10 +296,7 @@ class TeacherSubjectGradesService:
     @staticmethod
     def invalidate_subject_cache(teacher_id, subject_id=None):
         """
-        Invalidate cache for subject grades
+        Invalidate cache for subject grades.
+        Bumps the teacher's cache version, which covers every subject.
         """
-        if subject_id:
-            cache.delete(f"subject_grades_{teacher_id}_{subject_id}")
-            cache.delete(f"subject_summary_{teacher_id}_{subject_id}")
-        else:
-            cache.delete(f"teacher_subjects_{teacher_id}")
+        RealtimeSyncService.bump_versions(RealtimeSyncService.teacher_scope(teacher_id))
@@ -5,6 +5,7 @@ Enhanced Grade Entry Service - Includes student information with enrolled subjec
 from django.db.models import Q, Count, Avg, F
 from django.core.cache import cache
 from .models import StudentGrade, Course, Enrollment
+from .services_realtime_sync import RealtimeSyncService
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -159,9 +160,11 @@ class EnhancedTeacherSubjectGradesService:
         """
         Get all students in a subject for grading with their existing grades
         """
-        cache_key = f"subject_students_grading_{teacher_id}_{subject_id}"
+        cache_key = RealtimeSyncService.versioned_key(
+            f"subject_students_grading_{teacher_id}_{subject_id}", RealtimeSyncService.teacher_scope(teacher_id)
+        )
         cached = cache.get(cache_key)
-        if cached:
+        if cached is not None:
             return cached
 
         try:
@@ -315,7 +318,5 @@ class EnhancedTeacherSubjectGradesService:
 
     @staticmethod
     def invalidate_cache(teacher_id, subject_id=None):
-        """Invalidate cache for teacher"""
-        cache.delete(f"teacher_subjects_with_students_{teacher_id}")
-        if subject_id:
-            cache.delete(f"subject_students_grading_{teacher_id}_{subject_id}")
+        """Invalidate cache for teacher (every subject, via the teacher's cache version)"""
+        RealtimeSyncService.bump_versions(RealtimeSyncService.teacher_scope(teacher_id))
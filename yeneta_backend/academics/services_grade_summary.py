@@ -0,0 +1,211 @@
+"""
+Maintained per-subject grade aggregates for parent analytics.
+
+Parent dashboards used to re-read every StudentGrade of every enrolled
+subject on each request. ``StudentSubjectGradeSummary`` keeps one row per
+(student, subject, grade level, stream) with the averages, counts and the
+few recent percentages needed for trends. Rows are recomputed from a single
+conditional aggregate whenever a grade of that key is saved or deleted.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Max, Min, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import StudentGrade, StudentSubjectGradeSummary
+
+logger = logging.getLogger(__name__)
+
+# Percentages kept per summary row for trend calculations
+RECENT_WINDOW = 3
+
+ASSIGNMENT_WEIGHT = 0.4
+EXAM_WEIGHT = 0.6
+
+
+def grade_percentage():
+    """SQL expression matching ``StudentGrade.percentage``."""
+    return Case(
+        When(max_score__gt=0, then=F('score') * 100.0 / F('max_score')),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+
+class GradeSummaryService:
+    """Service maintaining and reading StudentSubjectGradeSummary rows."""
+
+    @staticmethod
+    def summary_key(grade) -> Tuple:
+        """The summary row a grade contributes to."""
+        return (grade.student_id, grade.subject, grade.grade_level, grade.stream or '')
+
+    @staticmethod
+    def weighted_overall(assignment_avg, exam_avg):
+        """
+        Combine assignment and exam averages into the overall grade.
+
+        Returns:
+            40/60 weighted average, the single available average, or None
+        """
+        if assignment_avg is not None and exam_avg is not None:
+            return (assignment_avg * ASSIGNMENT_WEIGHT) + (exam_avg * EXAM_WEIGHT)
+        if assignment_avg is not None:
+            return assignment_avg
+        return exam_avg
+
+    @staticmethod
+    def refresh(student_id, subject, grade_level, stream='') -> Optional[StudentSubjectGradeSummary]:
+        """
+        Recompute the summary row of one key from its grades.
+
+        Returns:
+            The updated summary, or None when the key has no grades left
+        """
+        grades = StudentGrade.objects.filter(
+            student_id=student_id,
+            subject=subject,
+            grade_level=grade_level
+        )
+        if stream:
+            grades = grades.filter(stream=stream)
+        else:
+            grades = grades.filter(Q(stream='') | Q(stream__isnull=True))
+        grades = grades.annotate(pct=grade_percentage())
+
+        is_assignment = Q(assignment_type__isnull=False)
+        is_exam = Q(exam_type__isnull=False)
+        totals = grades.aggregate(
+            grade_count=Count('id'),
+            assignment_average=Avg('pct', filter=is_assignment),
+            assignment_count=Count('id', filter=is_assignment),
+            exam_average=Avg('pct', filter=is_exam),
+            exam_count=Count('id', filter=is_exam),
+            average_percentage=Avg('pct'),
+            min_percentage=Min('pct'),
+            max_percentage=Max('pct'),
+            last_graded_at=Max(Coalesce('graded_at', 'created_at')),
+        )
+
+        key = dict(student_id=student_id, subject=subject, grade_level=grade_level, stream=stream or '')
+        if not totals['grade_count']:
+            StudentSubjectGradeSummary.objects.filter(**key).delete()
+            return None
+
+        recent = list(grades.order_by('-created_at', '-id').values_list('created_at', 'pct')[:RECENT_WINDOW])
+        first_recorded_at, first_percentage = grades.order_by('created_at', 'id').values_list('created_at', 'pct').first()
+
+        summary, _ = StudentSubjectGradeSummary.objects.update_or_create(
+            **key,
+            defaults={
+                **totals,
+                'overall_grade': GradeSummaryService.weighted_overall(
+                    totals['assignment_average'], totals['exam_average']
+                ),
+                'first_percentage': first_percentage,
+                'first_recorded_at': first_recorded_at,
+                'recent_percentages': [[created_at.isoformat(), pct] for created_at, pct in reversed(recent)],
+            }
+        )
+        return summary
+
+    @staticmethod
+    def rebuild(student_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute every summary row, optionally only for some students.
+
+        Needed after grades are written without model signals (raw SQL,
+        ``QuerySet.update``, fixtures).
+
+        Returns:
+            Number of summary rows written
+        """
+        grades = StudentGrade.objects.all()
+        summaries = StudentSubjectGradeSummary.objects.all()
+        if student_ids is not None:
+            student_ids = list(student_ids)
+            grades = grades.filter(student_id__in=student_ids)
+            summaries = summaries.filter(student_id__in=student_ids)
+
+        keys = {
+            (student_id, subject, grade_level, stream or '')
+            for student_id, subject, grade_level, stream in grades.values_list(
+                'student_id', 'subject', 'grade_level', 'stream'
+            ).distinct()
+        }
+        with transaction.atomic():
+            summaries.delete()
+            for key in keys:
+                GradeSummaryService.refresh(*key)
+        logger.info(f"Rebuilt {len(keys)} grade summaries")
+        return len(keys)
+
+    @staticmethod
+    def combine(summaries: List[StudentSubjectGradeSummary]) -> Dict:
+        """
+        Merge the rows of one student's subject across grade levels/streams.
+
+        Averages are merged by count and recent grades by creation time, so
+        the result equals aggregating all of the underlying grades at once.
+
+        Returns:
+            Dictionary of aggregate values (averages unrounded); recent
+            percentages are plain numbers, oldest first
+        """
+        def merged_average(average_field, count_field):
+            count = sum(getattr(s, count_field) for s in summaries)
+            if not count:
+                return None
+            return sum(getattr(s, average_field) * getattr(s, count_field) for s in summaries
+                       if getattr(s, average_field) is not None) / count
+
+        assignment_avg = merged_average('assignment_average', 'assignment_count')
+        exam_avg = merged_average('exam_average', 'exam_count')
+        recent = sorted(pair for s in summaries for pair in s.recent_percentages)[-RECENT_WINDOW:]
+        first = min(
+            (s for s in summaries if s.first_recorded_at is not None),
+            key=lambda s: s.first_recorded_at,
+            default=None
+        )
+        last_graded = [s.last_graded_at for s in summaries if s.last_graded_at]
+
+        return {
+            'assignment_average': assignment_avg,
+            'exam_average': exam_avg,
+            'overall_grade': GradeSummaryService.weighted_overall(assignment_avg, exam_avg),
+            'average_percentage': merged_average('average_percentage', 'grade_count'),
+            'min_percentage': min((s.min_percentage for s in summaries if s.min_percentage is not None), default=None),
+            'max_percentage': max((s.max_percentage for s in summaries if s.max_percentage is not None), default=None),
+            'first_percentage': first.first_percentage if first else None,
+            'recent_percentages': [pct for _, pct in recent],
+            'grade_count': sum(s.grade_count for s in summaries),
+            'last_graded_at': max(last_graded) if last_graded else None,
+        }
+
+    @staticmethod
+    def trend_window(combined: Dict) -> Optional[Tuple[float, float]]:
+        """
+        Average of the previous grades and of the latest few grades.
+
+        The latest ``min(3, n // 2 + 1)`` grades are compared with all earlier
+        ones; with only two grades, the last is compared with the first.
+
+        Returns:
+            (previous_avg, recent_avg), or None with fewer than two grades
+        """
+        count = combined['grade_count']
+        recent_scores = combined['recent_percentages']
+        if count < 2 or not recent_scores:
+            return None
+
+        recent_count = min(RECENT_WINDOW, count // 2 + 1, len(recent_scores))
+        recent = recent_scores[-recent_count:]
+        previous_count = count - recent_count
+        if previous_count <= 0:
+            return combined['first_percentage'], recent[-1]
+
+        previous_total = combined['average_percentage'] * count - sum(recent)
+        return previous_total / previous_count, sum(recent) / len(recent)
@@ -4,6 +4,8 @@ Handles real-time updates across all related features when grades are changed.
 Triggers updates for Student Gradebook, Parent Dashboard, and Analytics.
 """
 
+import time
+
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
@@ -11,7 +13,19 @@ from .models import StudentGrade, Grade, Enrollment
 
 
 class RealtimeSyncService:
-    """Service for real-time synchronization of grade updates"""
+    """
+    Service for real-time synchronization of grade updates.
+    
+    Cached gradebook and analytics entries embed the current version of every
+    scope they depend on (a student, a student's subject, a teacher) in their
+    key. A grade change bumps those versions once in the shared cache, so
+    every dependent entry in every worker process misses from then on
+    without having to know or delete the individual keys. Data shown to
+    parents is keyed on their children's student scopes, so parents need no
+    scope of their own.
+    """
+    
+    VERSION_KEY = 'grade_sync_version:{scope}'
     
     CACHE_KEYS = {
         'teacher_stats': 'teacher_stats_{teacher_id}',
@@ -22,51 +36,101 @@ class RealtimeSyncService:
     }
     
     @staticmethod
-    def invalidate_caches(student_id=None, teacher_id=None, parent_id=None, subject=None):
+    def student_scope(student_id, subject=None):
+        if subject:
+            return f'student:{student_id}:subject:{subject}'
+        return f'student:{student_id}'
+    
+    @staticmethod
+    def teacher_scope(teacher_id):
+        return f'teacher:{teacher_id}'
+    
+    @staticmethod
+    def _initial_version():
+        # Time based, so a version evicted from the cache never comes back
+        # as a number that older entries were stored under
+        return int(time.time() * 1000)
+    
+    @staticmethod
+    def get_versions(*scopes):
+        """
+        Current version of each scope, creating missing ones.
+        
+        Returns:
+            List of versions in the order of ``scopes``
+        """
+        keys = [RealtimeSyncService.VERSION_KEY.format(scope=scope) for scope in scopes]
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, RealtimeSyncService._initial_version(), timeout=None)
+                versions[key] = cache.get(key)
+        return [versions[key] for key in keys]
+    
+    @staticmethod
+    def bump_versions(*scopes):
+        """Invalidate every cached entry depending on any of ``scopes``."""
+        for scope in scopes:
+            key = RealtimeSyncService.VERSION_KEY.format(scope=scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Nothing cached against this scope yet (or it was evicted)
+                cache.add(key, RealtimeSyncService._initial_version(), timeout=None)
+    
+    @staticmethod
+    def versioned_key(base_key, *scopes):
+        """
+        Cache key for ``base_key`` that changes whenever a scope is bumped.
+        
+        Args:
+            base_key: Key naming the cached data (e.g. 'student_grades_12')
+            scopes: Scopes the data depends on
+        """
+        versions = RealtimeSyncService.get_versions(*scopes)
+        return f"{base_key}:v" + '.'.join(str(version) for version in versions)
+    
+    @staticmethod
+    def invalidate_caches(student_id=None, teacher_id=None, subject=None):
         """
         Invalidate relevant caches when grade data changes.
         
         Args:
             student_id: Student affected
             teacher_id: Teacher affected
-            parent_id: Parent affected
             subject: Subject affected
         """
-        cache_keys_to_clear = []
+        scopes = []
         
         if student_id:
-            cache_keys_to_clear.append(RealtimeSyncService.CACHE_KEYS['student_grades'].format(student_id=student_id))
-            if parent_id:
-                cache_keys_to_clear.append(RealtimeSyncService.CACHE_KEYS['parent_stats'].format(parent_id=parent_id))
+            scopes.append(RealtimeSyncService.student_scope(student_id))
+            if subject:
+                scopes.append(RealtimeSyncService.student_scope(student_id, subject))
         
         if teacher_id:
-            cache_keys_to_clear.append(RealtimeSyncService.CACHE_KEYS['teacher_stats'].format(teacher_id=teacher_id))
-            if subject:
-                cache_keys_to_clear.append(RealtimeSyncService.CACHE_KEYS['subject_average'].format(teacher_id=teacher_id, subject=subject))
-            cache_keys_to_clear.append(RealtimeSyncService.CACHE_KEYS['class_analytics'].format(teacher_id=teacher_id))
+            scopes.append(RealtimeSyncService.teacher_scope(teacher_id))
         
-        # Clear all matching keys
-        for key in cache_keys_to_clear:
-            cache.delete(key)
+        RealtimeSyncService.bump_versions(*scopes)
     
     @staticmethod
     def get_affected_parent_ids(student_id):
         """Get parent IDs affected by student grade changes"""
-        from users.models import Family, FamilyMember
+        from users.models import FamilyMembership, User
         
-        parent_ids = []
-        try:
-            families = FamilyMember.objects.filter(
-                family__students__id=student_id
-            ).select_related('family__head_of_family')
-            
-            for member in families:
-                if member.family.head_of_family:
-                    parent_ids.append(member.family.head_of_family.id)
-        except Exception:
-            pass
+        parent_ids = set(
+            FamilyMembership.objects.filter(
+                family__members__user_id=student_id,
+                family__members__role='Student',
+                family__members__is_active=True,
+                role='Parent',
+                is_active=True
+            ).values_list('user_id', flat=True)
+        )
+        direct_parent = User.objects.filter(id=student_id).values_list('parent_id', flat=True).first()
+        if direct_parent:
+            parent_ids.add(direct_parent)
         
-        return parent_ids
+        return sorted(parent_ids)
     
     @staticmethod
     def sync_grade_update(grade_obj, action='update'):
@@ -81,15 +145,11 @@ class RealtimeSyncService:
         teacher_id = getattr(grade_obj, 'graded_by_id', None)
         subject = getattr(grade_obj, 'subject', None)
         
-        if student_id and teacher_id:
-            # Get parent IDs
-            parent_ids = RealtimeSyncService.get_affected_parent_ids(student_id)
-            
+        if student_id:
             # Invalidate caches
             RealtimeSyncService.invalidate_caches(
                 student_id=student_id,
                 teacher_id=teacher_id,
-                parent_id=parent_ids[0] if parent_ids else None,
                 subject=subject
             )
             
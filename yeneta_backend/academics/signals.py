@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from communications.models import StudentAssignment
-from academics.models import StudentGrade
+from academics.models import StudentGrade, OnlineQuiz, Question
+from academics.services_grade_summary import GradeSummaryService
+from ai_tools.export_cache import export_cache
 
 @receiver(post_save, sender=StudentAssignment)
 def sync_assignment_grade(sender, instance, created, **kwargs):
@@ -58,3 +60,47 @@ def sync_assignment_grade(sender, instance, created, **kwargs):
             
         except Exception as e:
             print(f"Error syncing grade for assignment {instance.id}: {str(e)}")
+
+
+@receiver(post_save, sender=OnlineQuiz)
+@receiver(post_delete, sender=OnlineQuiz)
+def invalidate_quiz_exports(sender, instance, **kwargs):
+    """Drop cached quiz PDFs when the quiz changes."""
+    export_cache.invalidate(OnlineQuiz._meta.label_lower, instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_quiz_exports_for_question(sender, instance, **kwargs):
+    """Questions are rendered into the quiz PDF, so edits invalidate it too."""
+    export_cache.invalidate(OnlineQuiz._meta.label_lower, instance.quiz_id)
+
+
+@receiver(pre_save, sender=StudentGrade)
+def remember_grade_summary_key(sender, instance, **kwargs):
+    """Record the summary row an existing grade belonged to before the edit."""
+    instance._previous_summary_key = None
+    if instance.pk:
+        previous = StudentGrade.objects.filter(pk=instance.pk).values_list(
+            'student_id', 'subject', 'grade_level', 'stream'
+        ).first()
+        if previous:
+            student_id, subject, grade_level, stream = previous
+            instance._previous_summary_key = (student_id, subject, grade_level, stream or '')
+
+
+@receiver(post_save, sender=StudentGrade)
+def update_grade_summary(sender, instance, **kwargs):
+    """Keep StudentSubjectGradeSummary in step with grade changes."""
+    key = GradeSummaryService.summary_key(instance)
+    GradeSummaryService.refresh(*key)
+
+    previous_key = getattr(instance, '_previous_summary_key', None)
+    if previous_key and previous_key != key:
+        # Grade moved to another subject/grade level/stream
+        GradeSummaryService.refresh(*previous_key)
+
+
+@receiver(post_delete, sender=StudentGrade)
+def remove_from_grade_summary(sender, instance, **kwargs):
+    GradeSummaryService.refresh(*GradeSummaryService.summary_key(instance))
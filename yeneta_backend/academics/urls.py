@@ -47,6 +47,7 @@ urlpatterns = [
     path('teacher-gradebook/', views.teacher_gradebook_view, name='teacher_gradebook'),
     path('admin-enrollment-requests/', views.admin_enrollment_requests_view, name='admin_enrollment_requests'),
     path('student-gradebook/', views.student_gradebook_view, name='student_gradebook'),
+    path('student-course-gradebook/', views.student_course_gradebook_view, name='student_course_gradebook'),
     path('subject-teacher-info/', views.subject_teacher_info_view, name='subject_teacher_info'),
     path('student-enrolled-subjects/', views.student_enrolled_subjects_view, name='student_enrolled_subjects'),
     path('student-family-grades/', views.student_family_grades_view, name='student_family_grades'),
@@ -1,5 +1,5 @@
 from django.utils import timezone
-from django.db.models import Avg, Q, F, ExpressionWrapper, FloatField
+from django.db.models import Avg, Count, Q, F, ExpressionWrapper, FloatField
 from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -16,6 +16,7 @@ from rest_framework.exceptions import ValidationError as DRFValidationError
 from communications.models import Notification
 from .services import GradeAggregationService
 from .services_grade_entry import TeacherSubjectGradesService
+from yeneta_backend.pagination import CursorPaginatedListMixin
 
 
 class MasterCourseViewSet(viewsets.ModelViewSet):
@@ -1508,11 +1509,12 @@ def admin_enrollment_requests_view(request):
     })
 
 
-class StudentGradeViewSet(viewsets.ModelViewSet):
+class StudentGradeViewSet(CursorPaginatedListMixin, viewsets.ModelViewSet):
     """ViewSet for managing student grades."""
     
     serializer_class = None  # Will be set dynamically
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         user = self.request.user
@@ -1696,6 +1698,17 @@ def student_gradebook_view(request):
     
     subject = request.query_params.get('subject')
     
+    # Cached per student; any grade change bumps the student's cache version
+    from django.core.cache import cache
+    from .services_realtime_sync import RealtimeSyncService
+    cache_key = RealtimeSyncService.versioned_key(
+        f"student_gradebook_{request.user.id}_{subject or ''}",
+        RealtimeSyncService.student_scope(request.user.id)
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return Response(cached)
+    
     grades = StudentGrade.objects.filter(student=request.user)
     
     if subject:
@@ -1743,29 +1756,13 @@ def student_gradebook_view(request):
             })
     
     # Calculate overall grades for each unique subject-grade-stream combination
+    averages = GradeAggregationService.get_gradebook_averages(request.user.id, subject)
     for unique_key, subject_data in gradebook.items():
-        all_grades = StudentGrade.objects.filter(
-            student=request.user,
-            subject=subject_data['subject'],
-            grade_level=subject_data['grade_level'],
-            stream=subject_data['stream']
+        subject_averages = averages.get(
+            (subject_data['subject'], subject_data['grade_level'], subject_data['stream']), {}
         )
-        
-        assignment_grades = all_grades.filter(assignment_type__isnull=False)
-        exam_grades = all_grades.filter(exam_type__isnull=False)
-        
-        assignment_avg = None
-        exam_avg = None
-        
-        if assignment_grades.exists():
-            assignment_scores = [g.percentage for g in assignment_grades if g.percentage is not None]
-            if assignment_scores:
-                assignment_avg = sum(assignment_scores) / len(assignment_scores)
-        
-        if exam_grades.exists():
-            exam_scores = [g.percentage for g in exam_grades if g.percentage is not None]
-            if exam_scores:
-                exam_avg = sum(exam_scores) / len(exam_scores)
+        assignment_avg = subject_averages.get('assignment_avg')
+        exam_avg = subject_averages.get('exam_avg')
         
         overall_grade = None
         if assignment_avg is not None and exam_avg is not None:
@@ -1779,7 +1776,42 @@ def student_gradebook_view(request):
         subject_data['assignment_average'] = round(assignment_avg, 2) if assignment_avg else None
         subject_data['exam_average'] = round(exam_avg, 2) if exam_avg else None
     
-    return Response(list(gradebook.values()))
+    result = list(gradebook.values())
+    cache.set(cache_key, result, GradeAggregationService.CACHE_TIMEOUT)
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def student_course_gradebook_view(request):
+    """Get the student's enrolled courses with units, grade items and scores."""
+    
+    if request.user.role != 'Student':
+        return Response(
+            {'error': 'Only students can access this endpoint'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    courses = Course.objects.filter(enrollments__student=request.user)
+    course_id = request.query_params.get('course')
+    if course_id:
+        try:
+            course_id = int(course_id)
+        except (ValueError, TypeError):
+            return Response(
+                {'error': 'course must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        courses = courses.filter(id=course_id)
+    
+    # Grades of all listed courses are loaded in one query and shared with
+    # the nested unit and item serializers
+    serializer = CourseWithGradesSerializer(
+        CourseWithGradesSerializer.setup_eager_loading(courses),
+        many=True,
+        context={'student': request.user}
+    )
+    return Response(serializer.data)
 
 
 @api_view(['GET'])
@@ -2463,30 +2495,33 @@ def parent_enrolled_subjects_analytics_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    from users.models import FamilyMembership, User
+    from users.models import FamilyMembership
     from datetime import datetime, timedelta
-    from django.db.models import Avg, Q
+    from .models import StudentSubjectGradeSummary
+    from .services_grade_summary import GradeSummaryService
 
     # Get all families the parent is part of
-    family_memberships = FamilyMembership.objects.filter(
+    family_memberships = list(FamilyMembership.objects.filter(
         user=request.user,
         role='Parent',
         is_active=True
-    ).select_related('family')
-    
+    ).select_related('family'))
+
     family_ids = [fm.family.id for fm in family_memberships]
+    family_names = {fm.family.id: fm.family.name for fm in family_memberships}
 
-    # Get all students that belong to these families or are direct children
-    # 1. Students in families
-    family_student_ids = FamilyMembership.objects.filter(
+    # Students in these families, with the first family each belongs to
+    student_family = {}
+    for student_id, family_id in FamilyMembership.objects.filter(
         family_id__in=family_ids,
         role='Student',
         is_active=True
-    ).values_list('user__id', flat=True)
+    ).order_by('id').values_list('user_id', 'family_id'):
+        student_family.setdefault(student_id, family_id)
 
-    # 2. Get enrollments for these students OR direct children of the parent
+    # Get enrollments for these students OR direct children of the parent
     enrollments = StudentEnrollmentRequest.objects.filter(
-        Q(student__id__in=family_student_ids) | Q(student__parent=request.user),
+        Q(student__id__in=list(student_family)) | Q(student__parent=request.user),
         status='approved'
     ).select_related('student', 'teacher', 'family').distinct()
 
@@ -2510,6 +2545,16 @@ def parent_enrolled_subjects_analytics_view(request):
         except (ValueError, TypeError):
             pass
 
+    enrollments = list(enrollments)
+
+    # Grade aggregates of every enrolled subject in one query
+    summaries_by_subject = {}
+    for summary in StudentSubjectGradeSummary.objects.filter(
+        student_id__in={enrollment.student_id for enrollment in enrollments},
+        subject__in={enrollment.subject for enrollment in enrollments}
+    ):
+        summaries_by_subject.setdefault((summary.student_id, summary.subject), []).append(summary)
+
     families_data = {}
     all_grades = []
     total_subjects_count = 0
@@ -2522,43 +2567,21 @@ def parent_enrolled_subjects_analytics_view(request):
                 'family_name': fm.family.name,
                 'students': {}
             }
-            
-    # Also initialize "Direct Enrollments" bucket if needed (we'll create it on demand usually, but let's be consistent)
-    # Actually, iterate through enrollments now.
 
     for enrollment in enrollments:
-        # Determine which family bucket this enrollment belongs to.
-        # Ideally, we find which family the STUDENT belongs to relative to this PARENT.
-        # A student might be in multiple families, but we should prioritize the one this parent is viewing?
-        # Or just put them in the family they are linked to.
-        
-        # Logic: 
-        # 1. If enrollment has a family_id, use it (if parent matches).
-        # 2. If not, check which family the student shares with the parent.
-        # 3. Fallback to Direct.
-        
+        # Determine which family bucket this enrollment belongs to:
+        # 1. The enrollment's family, if the parent belongs to it
+        # 2. Otherwise a family the student shares with the parent
+        # 3. Fallback to Direct
         target_family_id = 0
         target_family_name = "Direct Enrollments"
-        
+
         if enrollment.family and enrollment.family.id in family_ids:
             target_family_id = enrollment.family.id
             target_family_name = enrollment.family.name
-        else:
-            # Try to find a family link
-            # We already have family_ids. Check if student is in any of them.
-            # This is a bit N+1 but we can optimize if needed. For now correctness > speed.
-            # actually we can infer from the family_student_ids query if we structured it differently, 
-            # but let's query purely for the match.
-            member_family = FamilyMembership.objects.filter(
-                user_id=enrollment.student.id,
-                family_id__in=family_ids,
-                role='Student',
-                is_active=True
-            ).first()
-            
-            if member_family:
-                target_family_id = member_family.family.id
-                target_family_name = member_family.family.name
+        elif enrollment.student_id in student_family:
+            target_family_id = student_family[enrollment.student_id]
+            target_family_name = family_names[target_family_id]
 
         if target_family_id not in families_data:
             families_data[target_family_id] = {
@@ -2583,41 +2606,17 @@ def parent_enrolled_subjects_analytics_view(request):
         # Key: SubjectName_GradeLevel_Stream_EnrollmentID
         # We must allow multiple enrollments for the same subject if they are distinct (e.g. different teachers)
         subject_key = f"{enrollment.subject}_{enrollment.grade_level}_{enrollment.stream or ''}_{enrollment.id}"
-        
+
         if subject_key in families_data[target_family_id]['students'][student_id]['seen_subjects']:
             continue # Skip duplicate
-            
-        families_data[target_family_id]['students'][student_id]['seen_subjects'].add(subject_key)
-
-        # Get grades for this subject
-        grades = StudentGrade.objects.filter(
-            student_id=student_id,
-            subject=enrollment.subject
-        ).order_by('created_at') # Order by date for trend calculation
 
-        assignment_grades = grades.filter(assignment_type__isnull=False)
-        exam_grades = grades.filter(exam_type__isnull=False)
-
-        assignment_avg = None
-        exam_avg = None
-        overall_grade = None
-
-        if assignment_grades.exists():
-            assignment_scores = [g.percentage for g in assignment_grades if g.percentage is not None]
-            if assignment_scores:
-                assignment_avg = sum(assignment_scores) / len(assignment_scores)
-
-        if exam_grades.exists():
-            exam_scores = [g.percentage for g in exam_grades if g.percentage is not None]
-            if exam_scores:
-                exam_avg = sum(exam_scores) / len(exam_scores)
+        families_data[target_family_id]['students'][student_id]['seen_subjects'].add(subject_key)
 
-        if assignment_avg is not None and exam_avg is not None:
-            overall_grade = (assignment_avg * 0.4) + (exam_avg * 0.6)
-        elif assignment_avg is not None:
-            overall_grade = assignment_avg
-        elif exam_avg is not None:
-            overall_grade = exam_avg
+        # Grades for this subject, across grade levels and streams
+        grades = GradeSummaryService.combine(summaries_by_subject.get((student_id, enrollment.subject), []))
+        assignment_avg = grades['assignment_average']
+        exam_avg = grades['exam_average']
+        overall_grade = grades['overall_grade']
 
         # Determine performance level
         perf_level = 'no_grade'
@@ -2639,39 +2638,20 @@ def parent_enrolled_subjects_analytics_view(request):
         if performance_level_filter and perf_level != performance_level_filter:
             continue
 
-        # Determine trend based on actual history
+        # Determine trend: average of the latest grades vs the earlier ones
         trend = 'stable'
         trend_value = 0
-        scores = [g.percentage for g in grades if g.percentage is not None]
-        
-        if len(scores) >= 2:
-            # Compare average of last 3 (or fewer) vs previous
-            recent_count = min(3, len(scores) // 2 + 1)
-            recent_scores = scores[-recent_count:]
-            previous_scores = scores[:-recent_count]
-            
-            if previous_scores:
-                recent_avg = sum(recent_scores) / len(recent_scores)
-                previous_avg = sum(previous_scores) / len(previous_scores)
-                
-                diff = recent_avg - previous_avg
-                trend_value = round(abs(diff), 1)
+        window = GradeSummaryService.trend_window(grades)
+        if window:
+            previous_avg, recent_avg = window
+            diff = recent_avg - previous_avg
+            trend_value = round(abs(diff), 1)
+
+            if diff > 2: # 2% threshold
+                trend = 'improving'
+            elif diff < -2:
+                trend = 'declining'
 
-                if diff > 2: # 2% threshold
-                    trend = 'improving'
-                elif diff < -2:
-                    trend = 'declining'
-                else:
-                    trend = 'stable'
-            else:
-                 # Fallback if not enough previous history but have at least 2 scores
-                 diff = scores[-1] - scores[0]
-                 trend_value = round(abs(diff), 1)
-                 if diff > 2:
-                     trend = 'improving'
-                 elif diff < -2:
-                     trend = 'declining'
-        
         subject_data = {
             'id': enrollment.id,
             'subject': enrollment.subject,
@@ -2690,7 +2670,7 @@ def parent_enrolled_subjects_analytics_view(request):
             'exam_average': round(exam_avg, 1) if exam_avg is not None else None,
             'overall_grade': round(overall_grade, 1) if overall_grade is not None else None,
             'performance_level': perf_level,
-            'total_grades': grades.count(),
+            'total_grades': grades['grade_count'],
             'trend': trend,
             'trend_value': trend_value
         }
@@ -2745,119 +2725,117 @@ def parent_academic_analytics_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    from users.models import FamilyMembership
-    from datetime import datetime, timedelta
-    from django.db.models import Avg, Count, Q
+    from datetime import timedelta
+    from .models import Enrollment, Grade, StudentSubjectGradeSummary
+    from .services_grade_summary import GradeSummaryService
 
     # Get all children of this parent
-    children = request.user.children.filter(is_active=True)
-    
-    if not children.exists():
+    children = list(request.user.children.filter(is_active=True))
+
+    # Get query parameters for filtering
+    min_score = request.query_params.get('min_score')
+    max_score = request.query_params.get('max_score')
+    days_back = request.query_params.get('days_back')
+    performance_level = request.query_params.get('performance_level')
+    subject_filter = request.query_params.get('subject')
+    filters_applied = {
+        'min_score': min_score,
+        'max_score': max_score,
+        'days_back': days_back,
+        'performance_level': performance_level,
+        'subject': subject_filter
+    }
+
+    if not children:
         return Response({
             'analytics': [],
             'summary': {
                 'total_children': 0,
                 'total_subjects': 0,
                 'average_performance': None,
-                'performance_alerts': []
+                'performance_alerts': [],
+                'filters_applied': filters_applied
             }
         })
 
-    # Get query parameters for filtering
-    min_score = request.query_params.get('min_score')
-    max_score = request.query_params.get('max_score')
-    days_back = request.query_params.get('days_back')
-    performance_level = request.query_params.get('performance_level')
-    subject_filter = request.query_params.get('subject')
-
-    # Build filter criteria
-    filters = Q()
-    
-    if min_score:
+    def parse_float(value):
         try:
-            filters &= Q(overall_score__gte=float(min_score))
+            return float(value) if value else None
         except (ValueError, TypeError):
-            pass
-    
-    if max_score:
-        try:
-            filters &= Q(overall_score__lte=float(max_score))
-        except (ValueError, TypeError):
-            pass
-    
+            return None
+
+    min_score = parse_float(min_score)
+    max_score = parse_float(max_score)
+
+    # Grade aggregates of every child's subjects in one query
+    summaries = StudentSubjectGradeSummary.objects.filter(student__in=children)
+    if subject_filter:
+        summaries = summaries.filter(subject__icontains=subject_filter)
+
+    summaries_by_child = {}
+    for summary in summaries:
+        summaries_by_child.setdefault(summary.student_id, {}).setdefault(summary.subject, []).append(summary)
+
+    # Completion: share of the active grade items of each child's courses
+    # that have a score, counted in one grouped query each
+    item_counts = dict(
+        Enrollment.objects.filter(
+            student__in=children, course__units__grade_items__is_active=True
+        ).values('student_id').annotate(
+            items=Count('course__units__grade_items')
+        ).values_list('student_id', 'items')
+    )
+    graded_counts = dict(
+        Grade.objects.filter(
+            student__in=children,
+            score__isnull=False,
+            grade_item__is_active=True,
+            grade_item__unit__course__enrollments__student=F('student')
+        ).values('student_id').annotate(
+            graded=Count('id', distinct=True)
+        ).values_list('student_id', 'graded')
+    )
+
+    cutoff_date = None
     if days_back:
         try:
-            cutoff_date = datetime.now() - timedelta(days=int(days_back))
-            filters &= Q(created_at__gte=cutoff_date)
+            cutoff_date = timezone.now() - timedelta(days=int(days_back))
         except (ValueError, TypeError):
             pass
-    
-    if performance_level:
-        if performance_level == 'excellent':
-            filters &= Q(overall_score__gte=90)
-        elif performance_level == 'good':
-            filters &= Q(overall_score__gte=80, overall_score__lt=90)
-        elif performance_level == 'average':
-            filters &= Q(overall_score__gte=70, overall_score__lt=80)
-        elif performance_level == 'below_average':
-            filters &= Q(overall_score__gte=60, overall_score__lt=70)
-        elif performance_level == 'needs_improvement':
-            filters &= Q(overall_score__lt=60)
-    
-    if subject_filter:
-        filters &= Q(subject__icontains=subject_filter)
 
     # Collect analytics for each child
     analytics_list = []
-    all_grades = []
     performance_alerts = []
+    total_subjects = 0
 
     for child in children:
-        # Get all grades for this child
-        child_grades = StudentGrade.objects.filter(
-            student=child
-        ).select_related('student', 'teacher').apply_filters(filters) if hasattr(StudentGrade.objects, 'apply_filters') else StudentGrade.objects.filter(
-            student=child
-        ).filter(filters)
-
-        if not child_grades.exists():
-            continue
-
-        # Group by subject
-        subject_map = {}
-        for grade in child_grades:
-            if grade.subject not in subject_map:
-                subject_map[grade.subject] = []
-            subject_map[grade.subject].append(grade)
-
-        # Calculate analytics per subject
         subject_analytics = []
-        for subject, grades in subject_map.items():
-            scores = [g.percentage for g in grades if g.percentage is not None]
-            if not scores:
+        for subject, rows in summaries_by_child.get(child.id, {}).items():
+            grades = GradeSummaryService.combine(rows)
+            avg_score = grades['average_percentage']
+            if avg_score is None:
                 continue
 
-            avg_score = sum(scores) / len(scores)
-            latest_score = scores[-1] if scores else None
-            
-            # Calculate trend (compare first half vs second half)
-            mid_point = len(scores) // 2
-            if mid_point > 0:
-                first_half_avg = sum(scores[:mid_point]) / mid_point
-                second_half_avg = sum(scores[mid_point:]) / len(scores[mid_point:])
-                
-                if second_half_avg > first_half_avg + 5:
+            # Filters apply to the subject average; days_back keeps recently graded subjects
+            if cutoff_date and (grades['last_graded_at'] is None or grades['last_graded_at'] < cutoff_date):
+                continue
+            if min_score is not None and avg_score < min_score:
+                continue
+            if max_score is not None and avg_score > max_score:
+                continue
+
+            # Calculate trend (latest grades vs earlier grades)
+            trend = 'stable'
+            trend_value = 0
+            window = GradeSummaryService.trend_window(grades)
+            if window and window[0]:
+                previous_avg, recent_avg = window
+                if recent_avg > previous_avg + 5:
                     trend = 'improving'
-                    trend_value = round(((second_half_avg - first_half_avg) / first_half_avg * 100), 2)
-                elif second_half_avg < first_half_avg - 5:
+                    trend_value = round(((recent_avg - previous_avg) / previous_avg * 100), 2)
+                elif recent_avg < previous_avg - 5:
                     trend = 'declining'
-                    trend_value = round(((first_half_avg - second_half_avg) / first_half_avg * 100), 2)
-                else:
-                    trend = 'stable'
-                    trend_value = 0
-            else:
-                trend = 'stable'
-                trend_value = 0
+                    trend_value = round(((previous_avg - recent_avg) / previous_avg * 100), 2)
 
             # Determine performance level
             if avg_score >= 90:
@@ -2871,6 +2849,9 @@ def parent_academic_analytics_view(request):
             else:
                 performance = 'needs_improvement'
 
+            if performance_level and performance != performance_level:
+                continue
+
             # Add alert if performance is low
             if avg_score < 60:
                 performance_alerts.append({
@@ -2889,25 +2870,46 @@ def parent_academic_analytics_view(request):
                     'severity': 'medium'
                 })
 
+            latest_score = grades['recent_percentages'][-1] if grades['recent_percentages'] else None
             subject_analytics.append({
                 'subject': subject,
                 'average_score': round(avg_score, 2),
                 'latest_score': round(latest_score, 2) if latest_score else None,
-                'total_grades': len(scores),
+                'total_grades': grades['grade_count'],
                 'trend': trend,
                 'trend_value': trend_value,
                 'performance_level': performance,
-                'min_score': round(min(scores), 2),
-                'max_score': round(max(scores), 2)
+                'min_score': round(grades['min_percentage'], 2),
+                'max_score': round(grades['max_percentage'], 2)
             })
-    
+
+        if not subject_analytics:
+            continue
+
+        total_grades = sum(item['total_grades'] for item in subject_analytics)
+        analytics_list.append({
+            'student_id': child.id,
+            'student_name': f"{child.first_name} {child.last_name}".strip() or child.username,
+            'average_score': round(
+                sum(item['average_score'] * item['total_grades'] for item in subject_analytics) / total_grades, 2
+            ),
+            'total_grades': total_grades,
+            'subjects': len(subject_analytics),
+            'subject_analytics': subject_analytics,
+            'completion_rate': round(
+                graded_counts.get(child.id, 0) / item_counts[child.id] * 100, 2
+            ) if item_counts.get(child.id) else 0
+        })
+        total_subjects += len(subject_analytics)
+
     return Response({
         'analytics': analytics_list,
         'summary': {
-            'total_children': children.count(),
-            'total_subjects': len(analytics_list),
+            'total_children': len(children),
+            'total_subjects': total_subjects,
             'average_performance': round(sum([a['average_score'] for a in analytics_list]) / len(analytics_list), 2) if analytics_list else 0,
-            'performance_alerts': performance_alerts
+            'performance_alerts': performance_alerts,
+            'filters_applied': filters_applied
         }
     })
 
@@ -1,5 +1,6 @@
 from django.utils import timezone
 from django.db.models import Sum
+from django.db.models.functions import Length
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
@@ -187,8 +188,17 @@ class OnlineQuizViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def export_pdf(self, request, pk=None):
         """Export quiz as PDF."""
+        from ai_tools.export_cache import export_cache
+
         quiz = self.get_object()
-        
+        size_hint = quiz.questions.aggregate(
+            size=Sum(Length('text')) + Sum(Length('explanation'))
+        )['size'] or 0
+        return export_cache.respond(
+            quiz, 'pdf', lambda: self._export_quiz_as_pdf(quiz), size_hint=size_hint, request=request
+        )
+
+    def _export_quiz_as_pdf(self, quiz):
         try:
             from reportlab.lib.pagesizes import letter
             from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
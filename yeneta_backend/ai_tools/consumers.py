@@ -0,0 +1,198 @@
+"""
+Async AI Tutor streaming endpoint for the ASGI stack.
+
+``tutor_view`` streams through a synchronous generator, so every open
+tutoring session pins a worker thread for the whole generation. This ASGI
+app streams from the async LLM path instead: hundreds of concurrent tutor
+streams share the event loop, the provider is only read as fast as the
+client accepts data, and a client disconnect cancels the generation so the
+model stops producing tokens nobody will read.
+
+The request body is the same JSON accepted by ``tutor_view``. Responses are
+``text/plain`` chunks like the sync view, or Server-Sent Events when the
+client sends ``Accept: text/event-stream``.
+"""
+import asyncio
+import json
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .llm import llm_router
+from .tutor_session import TutorSessionService
+
+logger = logging.getLogger(__name__)
+
+
+def _authenticate(authorization: bytes):
+    """Resolve the user for a ``Bearer`` JWT header, or None."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+    authenticator = JWTAuthentication()
+    raw_token = authenticator.get_raw_token(authorization)
+    if raw_token is None:
+        return None
+    try:
+        validated = authenticator.get_validated_token(raw_token)
+        return authenticator.get_user(validated)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _prepare(user, data):
+    """Build the tutor request and raise any student alert, as tutor_view does."""
+    from .views import _prepare_tutor_request
+
+    prepared = _prepare_tutor_request(user, data)
+
+    if user.role == 'Student':
+        try:
+            from alerts.alert_generator import AlertGenerator
+            if AlertGenerator.should_generate_alert(user, prepared['message']):
+                AlertGenerator.generate_alert_from_tutor_interaction(
+                    student=user,
+                    student_message=prepared['message'],
+                    tutor_response='',
+                    subject=prepared['subject'],
+                    topic=None
+                )
+        except Exception as alert_error:
+            logger.error(f"Failed to generate alert: {alert_error}")
+
+    return prepared
+
+
+class TutorStreamConsumer:
+    """Raw ASGI app streaming AI Tutor responses with disconnect cancellation."""
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get('headers', []))
+        cors_headers = self._cors_headers(headers.get(b'origin'))
+
+        if scope['method'] == 'OPTIONS':
+            await self._respond(send, 204, b'', cors_headers)
+            return
+        if scope['method'] != 'POST':
+            await self._respond_json(send, 405, {'error': 'Method not allowed'}, cors_headers)
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            return  # Client went away before sending the request
+
+        user = await database_sync_to_async(_authenticate)(headers.get(b'authorization', b''))
+        if user is None or not user.is_active:
+            await self._respond_json(send, 401, {'error': 'Authentication credentials were not provided or are invalid'}, cors_headers)
+            return
+
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            await self._respond_json(send, 400, {'error': 'Invalid JSON body'}, cors_headers)
+            return
+
+        if not data.get('message'):
+            await self._respond_json(send, 400, {'error': 'Message is required'}, cors_headers)
+            return
+
+        prepared = await database_sync_to_async(_prepare)(user, data)
+
+        use_sse = b'text/event-stream' in headers.get(b'accept', b'')
+        response_headers = cors_headers + [
+            (b'content-type', b'text/event-stream' if use_sse else b'text/plain; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-rag-status', prepared['rag_status'].encode()),
+            (b'x-tutor-session', str(prepared['tutor_session'].id).encode()),
+        ]
+        if prepared['rag_status'] == 'success' and prepared['curriculum_sources']:
+            response_headers.append((b'x-rag-sources', ','.join(set(prepared['curriculum_sources'])).encode('utf-8')))
+        if prepared['rag_message']:
+            response_headers.append((b'x-rag-message', prepared['rag_message'].encode('utf-8')))
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+
+        stream_task = asyncio.ensure_future(self._stream(send, prepared, use_sse))
+        disconnect_task = asyncio.ensure_future(self._wait_for_disconnect(receive))
+
+        done, pending = await asyncio.wait(
+            {stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED
+        )
+        for task in pending:
+            task.cancel()
+        if disconnect_task in done and not stream_task.done():
+            logger.info(f"Tutor stream for {user.username} cancelled: client disconnected")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _stream(self, send, prepared, use_sse):
+        reply = []
+        try:
+            async for chunk in llm_router.aprocess_request_stream(prepared['llm_request']):
+                reply.append(chunk)
+                await send({'type': 'http.response.body', 'body': self._format(chunk, use_sse), 'more_body': True})
+            await database_sync_to_async(TutorSessionService.record_exchange)(
+                prepared['tutor_session'], prepared['message'], ''.join(reply)
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ AI Tutor async streaming error: {e}", exc_info=True)
+            await send({
+                'type': 'http.response.body',
+                'body': self._format("\n\n⚠️ Error: Unable to generate response. Please try again.", use_sse),
+                'more_body': True,
+            })
+
+        closing = b'event: done\ndata: {}\n\n' if use_sse else b''
+        await send({'type': 'http.response.body', 'body': closing, 'more_body': False})
+
+    @staticmethod
+    def _format(chunk: str, use_sse: bool) -> bytes:
+        if use_sse:
+            return f"data: {json.dumps({'delta': chunk})}\n\n".encode('utf-8')
+        return chunk.encode('utf-8')
+
+    @staticmethod
+    async def _read_body(receive):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    def _cors_headers(origin):
+        if not origin:
+            return []
+        allowed = getattr(settings, 'CORS_ALLOWED_ORIGINS', [])
+        if origin.decode('latin-1') not in allowed:
+            return []
+        return [
+            (b'access-control-allow-origin', origin),
+            (b'access-control-allow-credentials', b'true'),
+            (b'access-control-allow-methods', b'POST, OPTIONS'),
+            (b'access-control-allow-headers', b'authorization, content-type, accept'),
+            (b'access-control-expose-headers', b'x-rag-status, x-rag-sources, x-rag-message, x-tutor-session'),
+            (b'vary', b'origin'),
+        ]
+
+    async def _respond(self, send, status, body, headers):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _respond_json(self, send, status, payload, headers):
+        await self._respond(
+            send, status, json.dumps(payload).encode('utf-8'),
+            headers + [(b'content-type', b'application/json')]
+        )
@@ -0,0 +1,265 @@
+"""
+Cache of rendered PDF/DOCX exports.
+
+Export actions used to rebuild the reportlab / python-docx document on every
+click, so a class downloading the same lesson plan rendered it once per
+student. Rendered files are now stored on disk, keyed by object, format and
+content version (``updated_at``), and dropped by signals when the object
+changes.
+
+Identical concurrent requests share one render. Clients that poll can
+opt in with ``?async=1``: documents larger than
+``EXPORT_BACKGROUND_THRESHOLD`` characters are then rendered on a
+background thread, and the request waits briefly and, if the file is still
+not ready, answers ``202 Accepted`` with ``Retry-After`` until the cached
+file is served. Other requests wait for the render to finish. At most
+``EXPORT_MAX_BACKGROUND_RENDERS`` renders run in the background, and a
+render still in flight after ``EXPORT_RENDER_TIMEOUT`` seconds is abandoned
+so later requests start afresh.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class _RenderJob:
+    """One in-flight render shared by every request for the same key."""
+
+    def __init__(self, background: bool = False):
+        self.done = threading.Event()
+        self.response = None
+        self.background = background
+        self.started = time.monotonic()
+
+
+class ExportCache:
+    """Disk-backed store of rendered exports with single-flight rendering."""
+
+    def __init__(self, root=None, background_threshold=None, wait_seconds=3.0, retry_after=2,
+                 max_background=None, render_timeout=None):
+        """
+        Args:
+            root: Cache directory (defaults to ``settings.EXPORT_CACHE_DIR``)
+            background_threshold: Content size in characters above which
+                documents are rendered on a background thread
+            wait_seconds: How long a request waits for a background render
+                before answering 202
+            retry_after: Seconds suggested to clients polling a pending render
+            max_background: Most renders running in the background at once
+                (defaults to ``settings.EXPORT_MAX_BACKGROUND_RENDERS``)
+            render_timeout: Seconds after which an unfinished render is
+                abandoned (defaults to ``settings.EXPORT_RENDER_TIMEOUT``)
+        """
+        self._root = root
+        self._background_threshold = background_threshold
+        self.wait_seconds = wait_seconds
+        self.retry_after = retry_after
+        self._max_background = max_background
+        self._render_timeout = render_timeout
+        self._jobs: Dict[str, _RenderJob] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or getattr(settings, 'EXPORT_CACHE_DIR', settings.BASE_DIR / 'export_cache'))
+
+    @property
+    def background_threshold(self) -> int:
+        if self._background_threshold is not None:
+            return self._background_threshold
+        return getattr(settings, 'EXPORT_BACKGROUND_THRESHOLD', 20000)
+
+    @property
+    def max_background(self) -> int:
+        if self._max_background is not None:
+            return self._max_background
+        return getattr(settings, 'EXPORT_MAX_BACKGROUND_RENDERS', 4)
+
+    @property
+    def render_timeout(self) -> float:
+        if self._render_timeout is not None:
+            return self._render_timeout
+        return getattr(settings, 'EXPORT_RENDER_TIMEOUT', 300)
+
+    @staticmethod
+    def accepts_pending(request) -> bool:
+        """Whether the client opted in to 202 responses with ``?async=1``."""
+        if request is None:
+            return False
+        return request.query_params.get('async', '').lower() in ('1', 'true')
+
+    # Keys and storage
+
+    def _object_dir(self, model_label: str, pk) -> Path:
+        return self.root / model_label / str(pk)
+
+    @staticmethod
+    def content_version(obj) -> str:
+        """Version string that changes whenever the object's content is saved."""
+        updated_at = getattr(obj, 'updated_at', None)
+        raw = updated_at.isoformat() if updated_at else ''
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _paths(self, obj, export_format: str):
+        version = self.content_version(obj)
+        base = self._object_dir(obj._meta.label_lower, obj.pk) / f'{export_format}-{version}'
+        return base.with_suffix('.bin'), base.with_suffix('.json')
+
+    def _load(self, obj, export_format: str) -> Optional[HttpResponse]:
+        body_path, meta_path = self._paths(obj, export_format)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        response = HttpResponse(body, content_type=meta['content_type'])
+        if meta.get('content_disposition'):
+            response['Content-Disposition'] = meta['content_disposition']
+        return response
+
+    def _store(self, obj, export_format: str, response: HttpResponse) -> None:
+        body_path, meta_path = self._paths(obj, export_format)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Drop renders of older versions of this format
+        for stale in body_path.parent.glob(f'{export_format}-*'):
+            if stale.stem != body_path.stem:
+                stale.unlink(missing_ok=True)
+
+        meta = {
+            'content_type': response['Content-Type'],
+            'content_disposition': response.get('Content-Disposition', ''),
+        }
+        # Write to temp files and rename so readers never see partial files
+        for path, data in ((body_path, response.content), (meta_path, json.dumps(meta).encode('utf-8'))):
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+    def invalidate(self, model_label: str, pk) -> None:
+        """Remove every cached export of an object."""
+        shutil.rmtree(self._object_dir(model_label, pk), ignore_errors=True)
+
+    # Rendering
+
+    def respond(self, obj, export_format: str, render: Callable[[], HttpResponse], size_hint: int = 0,
+                request=None):
+        """
+        Serve a cached export of ``obj``, rendering it if needed.
+
+        Args:
+            obj: Model instance being exported
+            export_format: Cache key for the rendered variant (e.g. 'pdf', 'docx')
+            render: Callable returning the export response; only successful
+                ``HttpResponse`` results are cached
+            size_hint: Approximate content size in characters
+            request: Export request; ``?async=1`` allows a 202 response
+
+        Returns:
+            The export response, or, for clients that opted in, a 202
+            response while a large document is still rendering
+        """
+        cached = self._load(obj, export_format)
+        if cached is not None:
+            return cached
+
+        pending_allowed = self.accepts_pending(request)
+        key = f'{obj._meta.label_lower}:{obj.pk}:{export_format}:{self.content_version(obj)}'
+        with self._lock:
+            now = time.monotonic()
+            for stale_key, stale in list(self._jobs.items()):
+                if now - stale.started > self.render_timeout:
+                    logger.warning(f"Abandoning export render {stale_key} after {self.render_timeout}s")
+                    del self._jobs[stale_key]
+            job = self._jobs.get(key)
+            owner = job is None
+            if owner:
+                running = sum(1 for other in self._jobs.values() if other.background)
+                background = (
+                    pending_allowed
+                    and size_hint > self.background_threshold
+                    and running < self.max_background
+                )
+                job = self._jobs[key] = _RenderJob(background)
+
+        if owner:
+            if job.background:
+                threading.Thread(
+                    target=self._render_in_background, args=(key, job, obj, export_format, render),
+                    name=f'export-render-{obj.pk}', daemon=True
+                ).start()
+            else:
+                self._render(key, job, obj, export_format, render)
+
+        if not job.done.wait(self.wait_seconds if pending_allowed else self.render_timeout):
+            if pending_allowed:
+                return self._pending_response()
+            return Response(
+                {'error': f'Timed out exporting {export_format}. Please try again.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        if owner:
+            return job.response
+        # Responses are not shareable between requests; waiters get their own copy
+        return self._load(obj, export_format) or self._copy(job.response)
+
+    def _render(self, key: str, job: _RenderJob, obj, export_format: str, render: Callable[[], HttpResponse]):
+        try:
+            response = render()
+            job.response = response
+            if response.status_code == 200 and not isinstance(response, Response):
+                try:
+                    self._store(obj, export_format, response)
+                except OSError as e:
+                    logger.warning(f"Could not cache export {key}: {e}")
+        except Exception as e:
+            logger.error(f"Export render failed for {key}: {e}", exc_info=True)
+            job.response = Response(
+                {'error': f'Failed to export {export_format}: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        finally:
+            with self._lock:
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+            job.done.set()
+
+    def _render_in_background(self, key: str, job: _RenderJob, obj, export_format: str, render: Callable[[], HttpResponse]):
+        try:
+            self._render(key, job, obj, export_format, render)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _copy(response):
+        if isinstance(response, Response):
+            return Response(response.data, status=response.status_code)
+        copy = HttpResponse(response.content, content_type=response['Content-Type'], status=response.status_code)
+        if response.get('Content-Disposition'):
+            copy['Content-Disposition'] = response['Content-Disposition']
+        return copy
+
+    def _pending_response(self) -> Response:
+        response = Response(
+            {'status': 'rendering', 'message': 'Export is being prepared. Please retry shortly.'},
+            status=status.HTTP_202_ACCEPTED
+        )
+        response['Retry-After'] = str(self.retry_after)
+        return response
+
+
+export_cache = ExportCache()
@@ -1,22 +1,43 @@
 """
 Utility functions for extracting text from various file formats.
 Supports PDF, Word (DOCX), and plain text files.
+
+Extracted text is cached on disk by content hash, so re-submitting an
+identical file skips extraction. Callers that only need the beginning of a
+document pass ``max_chars``/``max_tokens`` and extraction stops as soon as
+that budget is covered.
 """
 
+import codecs
+import hashlib
 import io
+import json
 import logging
+import os
+from pathlib import Path
 from typing import Optional, Tuple
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 
 logger = logging.getLogger(__name__)
 
+# Conservative characters-per-token ratio, matching TokenCounter's estimate
+CHARS_PER_TOKEN = 4
+HASH_CHUNK_SIZE = 64 * 1024
+
 
-def extract_text_from_file(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]:
+def extract_text_from_file(
+    file: UploadedFile,
+    max_chars: Optional[int] = None,
+    max_tokens: Optional[int] = None
+) -> Tuple[Optional[str], Optional[str]]:
     """
     Extract text content from uploaded file.
     
     Args:
-        file: Django UploadedFile object
+        file: Django UploadedFile (or FieldFile) object
+        max_chars: Stop extracting once this many characters are available
+        max_tokens: Same as max_chars, expressed as an estimated token budget
         
     Returns:
         Tuple of (extracted_text, error_message)
@@ -27,64 +48,139 @@ def extract_text_from_file(file: UploadedFile) -> Tuple[Optional[str], Optional[
         return None, "No file provided"
     
     file_name = file.name.lower()
+    budget = _char_budget(max_chars, max_tokens)
     
     try:
+        content_hash = _hash_file(file)
+        cached = _load_cached_text(content_hash, budget)
+        if cached is not None:
+            logger.info(f"Extracted text cache hit for {file_name} ({content_hash[:12]})")
+            return _apply_budget(cached, budget), None
+        
         # Reset file pointer to beginning
         file.seek(0)
         
         # Handle PDF files
         if file_name.endswith('.pdf'):
-            return _extract_from_pdf(file)
+            text, error, complete = _extract_from_pdf(file, budget)
         
         # Handle Word documents
         elif file_name.endswith('.docx'):
-            return _extract_from_docx(file)
+            text, error, complete = _extract_from_docx(file, budget)
         
         # Handle DOC files (older Word format)
         elif file_name.endswith('.doc'):
-            return _extract_from_doc(file)
+            text, error = _extract_from_doc(file)
+            complete = True
         
         # Handle plain text files
         elif file_name.endswith('.txt'):
-            return _extract_from_txt(file)
+            text, error, complete = _extract_from_txt(file, budget)
         
         else:
             return None, f"Unsupported file format: {file_name.split('.')[-1]}"
+        
+        if text is not None:
+            _store_cached_text(content_hash, text, complete)
+            text = _apply_budget(text, budget)
+        return text, error
     
     except Exception as e:
         logger.error(f"Error extracting text from {file_name}: {str(e)}")
         return None, f"Error processing file: {str(e)}"
 
 
-def _extract_from_pdf(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]:
-    """Extract text from PDF file using PyPDF2."""
+def _char_budget(max_chars: Optional[int], max_tokens: Optional[int]) -> Optional[int]:
+    budgets = [b for b in (max_chars, max_tokens * CHARS_PER_TOKEN if max_tokens else None) if b]
+    return min(budgets) if budgets else None
+
+
+def _apply_budget(text: str, budget: Optional[int]) -> str:
+    return text[:budget] if budget else text
+
+
+def _hash_file(file: UploadedFile) -> str:
+    """SHA-256 of the file content, read in chunks."""
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _cache_path(content_hash: str) -> Path:
+    root = getattr(settings, 'EXTRACTED_TEXT_CACHE_DIR', settings.BASE_DIR / 'extracted_text_cache')
+    return Path(root) / content_hash[:2] / f'{content_hash}.json'
+
+
+def _load_cached_text(content_hash: str, budget: Optional[int]) -> Optional[str]:
+    """Return cached text if it is complete or already covers the budget."""
+    try:
+        entry = json.loads(_cache_path(content_hash).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if entry.get('complete') or (budget and len(entry.get('text', '')) >= budget):
+        return entry['text']
+    return None
+
+
+def _store_cached_text(content_hash: str, text: str, complete: bool) -> None:
+    path = _cache_path(content_hash)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps({'text': text, 'complete': complete}), encoding='utf-8')
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not cache extracted text {content_hash[:12]}: {e}")
+
+
+def _extract_from_pdf(file: UploadedFile, budget: Optional[int] = None) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    Extract text from PDF file using PyPDF2, one page at a time.
+    
+    Returns:
+        Tuple of (text, error_message, complete); ``complete`` is False when
+        extraction stopped early at the character budget
+    """
     try:
         from PyPDF2 import PdfReader
         
         # Read PDF from file object
         pdf_reader = PdfReader(file)
+        page_count = len(pdf_reader.pages)
         
-        # Extract text from all pages
+        # Extract page by page until the budget is covered
         text_parts = []
-        for page_num, page in enumerate(pdf_reader.pages, 1):
-            page_text = page.extract_text()
+        total_chars = 0
+        complete = True
+        for page_num in range(1, page_count + 1):
+            if budget and total_chars >= budget:
+                complete = False
+                break
+            page_text = pdf_reader.pages[page_num - 1].extract_text() or ''
             if page_text.strip():
-                text_parts.append(f"--- Page {page_num} ---\n{page_text}")
+                part = f"--- Page {page_num} ---\n{page_text}"
+                text_parts.append(part)
+                total_chars += len(part) + 2
         
         if not text_parts:
-            return None, "No text content found in PDF"
+            return None, "No text content found in PDF", True
         
         full_text = "\n\n".join(text_parts)
-        return full_text, None
+        if not complete:
+            logger.info(f"PDF extraction stopped at page {page_num - 1}/{page_count} (budget {budget} chars)")
+        return full_text, None, complete
     
     except ImportError:
-        return None, "PyPDF2 library not installed"
+        return None, "PyPDF2 library not installed", True
     except Exception as e:
         logger.error(f"PDF extraction error: {str(e)}")
-        return None, f"Failed to extract PDF content: {str(e)}"
+        return None, f"Failed to extract PDF content: {str(e)}", True
 
 
-def _extract_from_docx(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]:
+def _extract_from_docx(file: UploadedFile, budget: Optional[int] = None) -> Tuple[Optional[str], Optional[str], bool]:
     """Extract text from DOCX file using python-docx."""
     try:
         from docx import Document
@@ -92,30 +188,38 @@ def _extract_from_docx(file: UploadedFile) -> Tuple[Optional[str], Optional[str]
         # Read DOCX from file object
         doc = Document(file)
         
-        # Extract text from all paragraphs
-        paragraphs = []
-        for para in doc.paragraphs:
-            if para.text.strip():
-                paragraphs.append(para.text)
+        def blocks():
+            # Paragraphs first, then table rows
+            for para in doc.paragraphs:
+                if para.text.strip():
+                    yield para.text
+            for table in doc.tables:
+                for row in table.rows:
+                    row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
+                    if row_text:
+                        yield row_text
         
-        # Also extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
-                if row_text:
-                    paragraphs.append(row_text)
+        paragraphs = []
+        total_chars = 0
+        complete = True
+        for block in blocks():
+            if budget and total_chars >= budget:
+                complete = False
+                break
+            paragraphs.append(block)
+            total_chars += len(block) + 2
         
         if not paragraphs:
-            return None, "No text content found in Word document"
+            return None, "No text content found in Word document", True
         
         full_text = "\n\n".join(paragraphs)
-        return full_text, None
+        return full_text, None, complete
     
     except ImportError:
-        return None, "python-docx library not installed"
+        return None, "python-docx library not installed", True
     except Exception as e:
         logger.error(f"DOCX extraction error: {str(e)}")
-        return None, f"Failed to extract Word document content: {str(e)}"
+        return None, f"Failed to extract Word document content: {str(e)}", True
 
 
 def _extract_from_doc(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]:
@@ -138,25 +242,39 @@ def _extract_from_doc(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]
         return None, f"Failed to extract document content: {str(e)}"
 
 
-def _extract_from_txt(file: UploadedFile) -> Tuple[Optional[str], Optional[str]]:
-    """Extract text from plain text file."""
+def _extract_from_txt(file: UploadedFile, budget: Optional[int] = None) -> Tuple[Optional[str], Optional[str], bool]:
+    """Extract text from plain text file, reading in chunks up to the budget."""
     try:
         # Try UTF-8 first
         try:
-            text = file.read().decode('utf-8')
+            text, complete = _read_text(file, 'utf-8', budget)
         except UnicodeDecodeError:
             # Fallback to latin-1 if UTF-8 fails
             file.seek(0)
-            text = file.read().decode('latin-1')
+            text, complete = _read_text(file, 'latin-1', budget)
         
         if not text or not text.strip():
-            return None, "Text file is empty"
+            return None, "Text file is empty", True
         
-        return text, None
+        return text, None, complete
     
     except Exception as e:
         logger.error(f"TXT extraction error: {str(e)}")
-        return None, f"Failed to read text file: {str(e)}"
+        return None, f"Failed to read text file: {str(e)}", True
+
+
+def _read_text(file: UploadedFile, encoding: str, budget: Optional[int]) -> Tuple[str, bool]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    total_chars = 0
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        part = decoder.decode(chunk)
+        parts.append(part)
+        total_chars += len(part)
+        if budget and total_chars >= budget:
+            return ''.join(parts), False
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts), True
 
 
 def get_supported_file_extensions() -> list:
@@ -0,0 +1,207 @@
+"""
+Embedding Cache - Persistent store of computed text embeddings
+Chunks and queries are re-embedded on every reprocess, re-index and repeated
+question. Vectors are kept in a local SQLite file keyed by the embedding
+model identity and the SHA-256 of the text, so each text is embedded once
+per model across processes and restarts. The oldest vectors are culled once
+the table holds more than EMBEDDING_CACHE_MAX_ENTRIES.
+"""
+
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+"""
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+# The table is culled every this many stored vectors
+CULL_EVERY = 1000
+
+# Share of the cap removed by a cull, so culls are not repeated on every write
+CULL_RATIO = 0.1
+
+
+def text_hash(text: str) -> str:
+    """Stable hash of the exact text that is embedded."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache shared by all worker processes.
+    Vectors are stored as float32 blobs.
+    """
+
+    def __init__(self, path: Optional[str] = None, enabled: Optional[bool] = None,
+                 max_entries: Optional[int] = None):
+        """
+        Initialize embedding cache.
+
+        Args:
+            path: SQLite file (defaults to settings.EMBEDDING_CACHE_PATH)
+            enabled: Whether lookups and writes happen (defaults to EMBEDDING_CACHE_ENABLED)
+            max_entries: Vectors kept before the oldest are culled
+                (defaults to settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        """
+        self.path = str(path or getattr(
+            settings, 'EMBEDDING_CACHE_PATH', settings.BASE_DIR / 'data' / 'embedding_cache.sqlite3'
+        ))
+        if enabled is None:
+            enabled = os.getenv('EMBEDDING_CACHE_ENABLED', 'True') == 'True'
+        self.enabled = enabled
+        self.max_entries = max_entries or getattr(settings, 'EMBEDDING_CACHE_MAX_ENTRIES', 200000)
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the file and schema on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            model: Embedding model identity
+            texts: Texts to look up
+
+        Returns:
+            Dictionary mapping each cached text to its embedding
+        """
+        if not self.enabled or not texts:
+            return {}
+
+        hashes = {}
+        for text in texts:
+            hashes.setdefault(text_hash(text), text)
+
+        found = {}
+        try:
+            conn = self._connection()
+            keys = list(hashes)
+            for i in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[i:i + LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({', '.join('?' * len(batch))})",
+                    (model, *batch)
+                ).fetchall()
+                for key, vector in rows:
+                    found[hashes[key]] = np.frombuffer(vector, dtype=np.float32).tolist()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def set_many(self, model: str, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings.
+
+        Args:
+            model: Embedding model identity
+            embeddings: Dictionary mapping text to embedding
+        """
+        if not self.enabled or not embeddings:
+            return
+
+        now = time.time()
+        rows = [
+            (model, text_hash(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in embeddings.items()
+            if vector is not None
+        ]
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+            self._writes += len(rows)
+            if self._writes >= CULL_EVERY:
+                self._writes = 0
+                self._cull(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def _cull(self, conn: sqlite3.Connection) -> None:
+        """Drop the oldest vectors once the table holds more than ``max_entries``."""
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + int(self.max_entries * CULL_RATIO)
+            conn.execute(
+                "DELETE FROM embeddings WHERE (model, text_hash) IN ("
+                "SELECT model, text_hash FROM embeddings ORDER BY created_at LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Culled {excess} embedding(s) from the cache")
+
+    def clear(self, model: Optional[str] = None) -> int:
+        """
+        Remove cached embeddings, optionally only those of one model.
+
+        Returns:
+            Number of embeddings removed
+        """
+        conn = self._connection()
+        if model:
+            return conn.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+        return conn.execute("DELETE FROM embeddings").rowcount
+
+    def get_stats(self) -> Dict:
+        """Get cache size per model and hit/miss counters of this process"""
+        try:
+            models = dict(self._connection().execute(
+                "SELECT model, COUNT(*) FROM embeddings GROUP BY model"
+            ).fetchall())
+        except sqlite3.Error:
+            models = {}
+        return {
+            'path': self.path,
+            'enabled': self.enabled,
+            'models': models,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -5,11 +5,19 @@ Supports multiple embedding models with fallback mechanisms.
 
 import os
 import logging
-from typing import List, Optional
+from typing import Callable, List, Optional
 import numpy as np
 
+from .embedding_cache import EmbeddingCache
+
 logger = logging.getLogger(__name__)
 
+# ONNX exports shipped with sentence-transformers models on the Hugging Face Hub
+ONNX_MODEL_FILES = {
+    'onnx': 'onnx/model.onnx',
+    'onnx-int8': 'onnx/model_qint8_avx512.onnx',
+}
+
 # Try to import embedding providers
 try:
     from sentence_transformers import SentenceTransformer
@@ -37,9 +45,24 @@ class EmbeddingService:
     """
     Unified embedding service supporting multiple providers.
     Provides fallback mechanisms for offline scenarios.
+    
+    Sentence Transformer models run on PyTorch by default. Setting
+    EMBEDDING_BACKEND to 'onnx' or 'onnx-int8' runs the same model through
+    ONNX Runtime on CPU at a fraction of the cost. fp32 ONNX vectors match
+    PyTorch output; the int8 variant (like any other EMBEDDING_ONNX_FILE)
+    is cached under its own key and never written to or queried against
+    the ChromaDB collections. Every embedding goes through the persistent EmbeddingCache.
     """
     
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, cache: Optional[EmbeddingCache] = None):
+        """
+        Initialize embedding service.
+        
+        Args:
+            backend: Sentence Transformer runtime: 'torch', 'onnx' or 'onnx-int8'
+                (defaults to EMBEDDING_BACKEND)
+            cache: Embedding cache (defaults to the on-disk cache at EMBEDDING_CACHE_PATH)
+        """
         self.embedding_model = os.getenv('EMBEDDING_MODEL', 'sentence-transformers')
         self.sentence_transformer_model = os.getenv(
             'SENTENCE_TRANSFORMER_MODEL',
@@ -49,11 +72,35 @@ class EmbeddingService:
             'OLLAMA_EMBEDDING_MODEL',
             'mxbai-embed-large:latest'
         )
+        self.backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
+        self.cache = cache or EmbeddingCache()
         
         self.model = None
+        self.onnx_file = None  # ONNX model file in use, if any
         self._init_embedding_model()
         
-        logger.info(f"EmbeddingService initialized with model: {self.embedding_model}")
+        logger.info(f"EmbeddingService initialized with model: {self.embedding_model} ({self.backend})")
+    
+    def _load_sentence_transformer(self):
+        """Load the Sentence Transformer on the configured runtime, falling back to PyTorch"""
+        if self.backend in ONNX_MODEL_FILES:
+            file_name = os.getenv('EMBEDDING_ONNX_FILE') or ONNX_MODEL_FILES[self.backend]
+            try:
+                # Requires sentence-transformers>=3.2 with optimum[onnxruntime]
+                model = SentenceTransformer(
+                    self.sentence_transformer_model,
+                    device='cpu',
+                    backend='onnx',
+                    model_kwargs={'file_name': file_name}
+                )
+                logger.info(f"Using ONNX Runtime embeddings: {file_name}")
+                self.onnx_file = file_name
+                return model
+            except Exception as e:
+                logger.warning(f"ONNX embedding backend unavailable, using PyTorch: {e}")
+                self.backend = 'torch'
+        
+        return SentenceTransformer(self.sentence_transformer_model)
     
     def _init_embedding_model(self):
         """Initialize the embedding model based on configuration"""
@@ -61,7 +108,7 @@ class EmbeddingService:
         # Try Sentence Transformers first (best for offline)
         if self.embedding_model == 'sentence-transformers' and SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
-                self.model = SentenceTransformer(self.sentence_transformer_model)
+                self.model = self._load_sentence_transformer()
                 logger.info(f"Loaded Sentence Transformer: {self.sentence_transformer_model}")
                 return
             except Exception as e:
@@ -80,7 +127,7 @@ class EmbeddingService:
         # Fallback to Sentence Transformers if available
         if SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
-                self.model = SentenceTransformer(self.sentence_transformer_model)
+                self.model = self._load_sentence_transformer()
                 self.embedding_model = 'sentence-transformers'
                 logger.info(f"Fallback to Sentence Transformer: {self.sentence_transformer_model}")
                 return
@@ -89,6 +136,53 @@ class EmbeddingService:
         
         logger.warning("No embedding model available! RAG will not work.")
     
+    @property
+    def quantized(self) -> bool:
+        """Whether vectors come from an ONNX file other than the fp32 export"""
+        return self.onnx_file is not None and self.onnx_file != ONNX_MODEL_FILES['onnx']
+    
+    @property
+    def model_key(self) -> str:
+        """Identity of the vectors this service produces, used as cache key"""
+        if self.embedding_model == 'sentence-transformers' and self.model:
+            # fp32 ONNX matches PyTorch output; other model files (quantized
+            # exports, EMBEDDING_ONNX_FILE overrides) are cached under their own key
+            suffix = f':{self.onnx_file}' if self.quantized else ''
+            return f"sentence-transformers:{self.sentence_transformer_model}{suffix}"
+        if self.embedding_model == 'ollama':
+            return f"ollama:{self.ollama_embedding_model}"
+        if self.embedding_model == 'gemini':
+            return "gemini:models/embedding-001"
+        return f"{self.embedding_model}:{self.sentence_transformer_model}"
+    
+    def _cached(
+        self,
+        texts: List[str],
+        compute: Callable[[List[str]], List[Optional[List[float]]]],
+        model_key: Optional[str] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Serve embeddings from the cache, computing and storing the misses.
+        
+        Args:
+            texts: Texts to embed
+            compute: Batch embedding function called with the uncached texts
+            model_key: Cache namespace (defaults to the model identity)
+        
+        Returns:
+            Embeddings in the order of texts
+        """
+        model_key = model_key or self.model_key
+        embeddings = self.cache.get_many(model_key, texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in embeddings]
+        
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self.cache.set_many(model_key, computed)
+            embeddings.update(computed)
+        
+        return [embeddings.get(text) for text in texts]
+    
     def embed_text(self, text: str) -> Optional[List[float]]:
         """
         Generate embedding for a single text.
@@ -103,6 +197,14 @@ class EmbeddingService:
             logger.warning("Empty text provided for embedding")
             return None
         
+        return self._cached([text], lambda missing: [self._compute_embedding(missing[0])])[0]
+    
+    def _compute_embedding(self, text: str) -> Optional[List[float]]:
+        """Embed a single text with the configured model, bypassing the cache"""
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding")
+            return None
+        
         try:
             if self.embedding_model == 'sentence-transformers' and self.model:
                 embedding = self.model.encode(text, convert_to_numpy=True)
@@ -135,6 +237,7 @@ class EmbeddingService:
     def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
         Generate embeddings for multiple texts (batch processing).
+        Only texts missing from the embedding cache are encoded.
         
         Args:
             texts: List of texts to embed
@@ -145,6 +248,10 @@ class EmbeddingService:
         if not texts:
             return []
         
+        return self._cached(texts, self._compute_embeddings)
+    
+    def _compute_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed a batch of texts with the configured model, bypassing the cache"""
         try:
             if self.embedding_model == 'sentence-transformers' and self.model:
                 # Batch encoding is more efficient
@@ -153,12 +260,12 @@ class EmbeddingService:
             
             else:
                 # Fall back to individual encoding
-                return [self.embed_text(text) for text in texts]
+                return [self._compute_embedding(text) for text in texts]
         
         except Exception as e:
             logger.error(f"Batch embedding failed: {e}")
             # Fall back to individual encoding
-            return [self.embed_text(text) for text in texts]
+            return [self._compute_embedding(text) for text in texts]
     
     def embed_query(self, query: str) -> Optional[List[float]]:
         """
@@ -174,16 +281,19 @@ class EmbeddingService:
         # But some models (like Gemini) have different task types
         
         if self.embedding_model == 'gemini' and GENAI_AVAILABLE:
-            try:
-                result = genai.embed_content(
-                    model='models/embedding-001',
-                    content=query,
-                    task_type='retrieval_query'
-                )
-                return result['embedding']
-            except Exception as e:
-                logger.error(f"Failed to generate query embedding: {e}")
-                return None
+            def compute(missing):
+                try:
+                    result = genai.embed_content(
+                        model='models/embedding-001',
+                        content=missing[0],
+                        task_type='retrieval_query'
+                    )
+                    return [result['embedding']]
+                except Exception as e:
+                    logger.error(f"Failed to generate query embedding: {e}")
+                    return [None]
+            
+            return self._cached([query], compute, model_key=f"{self.model_key}:query")[0]
         
         # Default: use same method as document embedding
         return self.embed_text(query)
@@ -5,6 +5,7 @@ Routes requests to optimal model based on task, user, cost, and connectivity.
 
 import os
 import logging
+import dataclasses
 from typing import Optional
 from datetime import datetime
 
@@ -16,6 +17,7 @@ from .llm_service import llm_service
 from .cost_tracker import cost_tracker
 from .token_counter import token_counter
 from .rag_service import rag_service
+from .request_coalescer import RequestCoalescer
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +32,27 @@ class LLMRouter:
         self.default_tier = os.getenv('DEFAULT_LLM_TIER', 'gemini-flash')
         self.enable_ollama_fallback = os.getenv('ENABLE_OLLAMA_FALLBACK', 'True') == 'True'
         self.enable_cost_optimization = os.getenv('ENABLE_COST_OPTIMIZATION', 'True') == 'True'
+        self.enable_coalescing = os.getenv('ENABLE_REQUEST_COALESCING', 'True') == 'True'
+        self.coalescer = RequestCoalescer()
         
         logger.info(
             f"LLMRouter initialized. Default: {self.default_tier}, "
-            f"Ollama fallback: {self.enable_ollama_fallback}"
+            f"Ollama fallback: {self.enable_ollama_fallback}, "
+            f"Request coalescing: {self.enable_coalescing}"
+        )
+    
+    def _coalescing_key(self, kind: str, request: LLMRequest, model: LLMModel) -> Optional[str]:
+        """Single-flight key of a request, or None when it must run on its own."""
+        if not self.enable_coalescing:
+            return None
+        return self.coalescer.request_key(kind, request, model)
+    
+    @staticmethod
+    def _share_response(response: LLMResponse) -> LLMResponse:
+        """Copy of a coalesced response for a request that waited on it."""
+        return dataclasses.replace(
+            response,
+            metadata={**(response.metadata or {}), 'coalesced': True}
         )
     
     def route_request(self, request: LLMRequest) -> LLMModel:
@@ -154,6 +173,8 @@ class LLMRouter:
     def process_request(self, request: LLMRequest) -> LLMResponse:
         """
         Process LLM request with routing, RAG, generation, and tracking.
+        Identical requests already in flight are waited on instead of
+        being sent to the provider again.
         
         Args:
             request: LLMRequest with all parameters
@@ -161,11 +182,36 @@ class LLMRouter:
         Returns:
             LLMResponse with generated content and metadata
         """
-        start_time = datetime.now()
-        
         # Route to optimal model
         selected_model = self.route_request(request)
         
+        response = self.coalescer.call(
+            self._coalescing_key('text', request, selected_model),
+            lambda: self._process_request(request, selected_model),
+            share=self._share_response
+        )
+        
+        # The leader tracked the provider call. A request served from it is
+        # logged for its own user at no cost, since the provider was paid once
+        if response.success and response.metadata.get('coalesced'):
+            cost_tracker.track_usage(LLMUsage(
+                user_id=request.user_id,
+                user_role=request.user_role,
+                model=response.model,
+                task_type=request.task_type,
+                input_tokens=response.input_tokens,
+                output_tokens=response.output_tokens,
+                cost_usd=0.0,
+                latency_ms=response.latency_ms,
+                success=True,
+                metadata={**(request.metadata or {}), 'coalesced': True},
+            ))
+        
+        return response
+    
+    def _process_request(self, request: LLMRequest, selected_model: LLMModel) -> LLMResponse:
+        start_time = datetime.now()
+        
         # Enforce router selection by setting it in metadata
         if request.metadata is None:
             request.metadata = {}
@@ -237,11 +283,15 @@ class LLMRouter:
         Returns:
             Dict containing the parsed JSON response
         """
-        start_time = datetime.now()
-        
         # Route to optimal model
         selected_model = self.route_request(request)
         
+        return self.coalescer.call(
+            self._coalescing_key('json', request, selected_model),
+            lambda: self._process_json_request(request, selected_model)
+        )
+    
+    def _process_json_request(self, request: LLMRequest, selected_model: LLMModel) -> dict:
         # Apply RAG if enabled and context documents provided
         if request.use_rag and request.prompt:
             logger.info("Applying RAG to enhance prompt for JSON generation")
@@ -298,8 +348,36 @@ class LLMRouter:
         # Route to optimal model
         selected_model = self.route_request(request)
         
-        # Stream response
-        yield from llm_service.generate_stream(request)
+        # Stream response, shared with identical streams in flight
+        yield from self.coalescer.stream(
+            self._coalescing_key('stream', request, selected_model),
+            lambda: llm_service.generate_stream(request)
+        )
+    
+    async def aprocess_request_stream(self, request: LLMRequest):
+        """
+        Async counterpart of process_request_stream for ASGI consumers.
+        
+        Routing touches the cost tracker and database, so it runs in a
+        worker thread; generation itself streams on the event loop.
+        
+        Args:
+            request: LLMRequest with streaming enabled
+        
+        Yields:
+            Chunks of generated text
+        """
+        from asgiref.sync import sync_to_async
+        
+        # Route to optimal model
+        selected_model = await sync_to_async(self.route_request)(request)
+        
+        # Stream response, shared with identical streams in flight
+        async for chunk in self.coalescer.astream(
+            self._coalescing_key('stream', request, selected_model),
+            lambda: llm_service.agenerate_stream(request)
+        ):
+            yield chunk
     
     def get_routing_info(self, request: LLMRequest) -> dict:
         """
@@ -354,6 +432,12 @@ class LLMRouter:
         """Get comprehensive cost analytics"""
         return cost_tracker.get_analytics_summary()
     
+    def get_coalescing_statistics(self) -> dict:
+        """Get how many requests were served by an identical one in flight"""
+        stats = self.coalescer.get_statistics()
+        stats['enabled'] = self.enable_coalescing
+        return stats
+    
     def generate_text(
         self,
         prompt: str,
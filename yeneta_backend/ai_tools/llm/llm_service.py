@@ -5,8 +5,11 @@ Handles OpenAI, Google Gemini, and Ollama with error handling and retries.
 
 import os
 import time
+import asyncio
+import concurrent.futures
+import threading
 import logging
-from typing import Optional, Generator, Union, Dict, Any
+from typing import Optional, Generator, AsyncGenerator, Union, Dict, Any
 from datetime import datetime
 import json
 import re
@@ -126,30 +129,21 @@ class LLMService:
             logger.info(f"Context fits within {model_name} limits: {current_tokens}/{max_input_tokens} tokens")
             return context
         
-        # Need to truncate - use character-based approximation (1 token ≈ 4 chars)
-        chars_per_token = 4
-        target_chars = max_input_tokens * chars_per_token
-        
-        if len(context) > target_chars:
-            # Smart Truncation: Keep Start (Intro/Objectives) and End (Summary/Exercises)
-            # Split budget: 60% for start, 40% for end
-            start_chars = int(target_chars * 0.6)
-            end_chars = target_chars - start_chars - 100 # Reserve space for marker
-            
-            if end_chars < 100: # If budget is too small, just take start
-                truncated = context[:target_chars]
-            else:
-                truncated = context[:start_chars]
-                truncated += "\n\n[... Content Truncated to fit model context limit ...]\n\n"
-                truncated += context[-end_chars:]
-            
-            logger.warning(
-                f"Context truncated for {model_name}: {current_tokens} -> ~{max_input_tokens} tokens "
-                f"({len(context)} -> {len(truncated)} chars). Preserved start & end."
-            )
-            return truncated
+        # Smart Truncation: Keep Start (Intro/Objectives) and End (Summary/Exercises)
+        # Split budget: 60% for start, 40% for end, cut at token boundaries
+        truncated = token_counter.truncate_middle(
+            context,
+            max_input_tokens,
+            model,
+            marker="\n\n[... Content Truncated to fit model context limit ...]\n\n",
+            head_ratio=0.6
+        )
         
-        return context
+        logger.warning(
+            f"Context truncated for {model_name}: {current_tokens} -> ~{max_input_tokens} tokens "
+            f"({len(context)} -> {len(truncated)} chars). Preserved start & end."
+        )
+        return truncated
     
     def _init_ollama(self):
         """Initialize Ollama client"""
@@ -882,6 +876,223 @@ class LLMService:
             logger.error(f"OpenAI streaming failed: {e}")
             yield f"Error: {str(e)}"
     
+    # ------------------------------------------------------------------
+    # Async streaming (ASGI)
+    # ------------------------------------------------------------------
+    
+    async def agenerate_stream(self, request: LLMRequest) -> AsyncGenerator[str, None]:
+        """
+        Generate text with an async streaming response.
+        
+        Uses each provider's native async client so many streams can share
+        one event loop. Chunks are pulled only as fast as the caller consumes
+        them, and closing the generator (e.g. on client disconnect) closes
+        the provider stream so the model stops generating.
+        
+        Args:
+            request: LLMRequest with streaming enabled
+        
+        Yields:
+            Chunks of generated text
+        """
+        model = self._get_model_from_request(request)
+        
+        try:
+            if model.value.startswith(('llama', 'gemma', 'llava')):
+                stream = self._agenerate_ollama_stream(request, model)
+            elif model.value.startswith('gemini'):
+                stream = self._agenerate_gemini_stream(request, model)
+            elif model.value.startswith('gpt'):
+                stream = self._agenerate_openai_stream(request, model)
+            else:
+                raise ValueError(f"Unsupported model for streaming: {model}")
+            
+            async for chunk in stream:
+                yield chunk
+        
+        except asyncio.CancelledError:
+            logger.info(f"Streaming generation cancelled ({model.value})")
+            raise
+        except Exception as e:
+            logger.error(f"Async streaming generation failed: {e}")
+            yield f"Error: {str(e)}"
+    
+    async def _agenerate_ollama_stream(
+        self,
+        request: LLMRequest,
+        model: LLMModel
+    ) -> AsyncGenerator[str, None]:
+        """Stream generation from Ollama's async client"""
+        if not self.ollama_available:
+            yield "Error: Ollama is not available"
+            return
+        
+        if not hasattr(ollama, 'AsyncClient'):
+            async for chunk in self._iterate_in_thread(self._generate_ollama_stream(request, model)):
+                yield chunk
+            return
+        
+        full_prompt = request.prompt
+        if request.system_prompt:
+            full_prompt = f"{request.system_prompt}\n\n{request.prompt}"
+        
+        client = ollama.AsyncClient(host=self.ollama_base_url, timeout=self.ollama_timeout)
+        stream = await client.generate(
+            model=model.value,
+            prompt=full_prompt,
+            options={
+                'temperature': request.temperature,
+                'num_predict': request.max_tokens,
+            },
+            stream=True,
+        )
+        
+        try:
+            async for chunk in stream:
+                if 'response' in chunk:
+                    yield chunk['response']
+        finally:
+            await stream.aclose()
+    
+    async def _agenerate_gemini_stream(
+        self,
+        request: LLMRequest,
+        model: LLMModel
+    ) -> AsyncGenerator[str, None]:
+        """Stream generation from Gemini's async API"""
+        if not self.genai_available:
+            yield "Error: Google Gemini is not available"
+            return
+        
+        model_name = model.value
+        try:
+            # Key selection touches the database, keep it off the event loop
+            from asgiref.sync import sync_to_async
+            from api_key_rotation import get_api_key_rotator
+            key_config = await sync_to_async(get_api_key_rotator().get_key_for_provider)(
+                'gemini', request.max_tokens or 1000, model.value
+            )
+            genai.configure(api_key=key_config.key)
+            model_name = key_config.model or model_name
+        except Exception as e:
+            logger.warning(f"Gemini key rotation unavailable for streaming, using configured key: {e}")
+        
+        gemini_model = genai.GenerativeModel(model_name)
+        
+        full_prompt = request.prompt
+        if request.system_prompt:
+            full_prompt = f"{request.system_prompt}\n\n{request.prompt}"
+        
+        response = await gemini_model.generate_content_async(
+            full_prompt,
+            generation_config=genai.GenerationConfig(
+                temperature=request.temperature,
+                max_output_tokens=request.max_tokens,
+            ),
+            stream=True,
+        )
+        
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+    
+    async def _agenerate_openai_stream(
+        self,
+        request: LLMRequest,
+        model: LLMModel
+    ) -> AsyncGenerator[str, None]:
+        """Stream generation from OpenAI's async client"""
+        if not self.openai_available:
+            yield "Error: OpenAI is not available"
+            return
+        
+        messages = []
+        if request.system_prompt:
+            messages.append({"role": "system", "content": request.system_prompt})
+        messages.append({"role": "user", "content": request.prompt})
+        
+        if hasattr(openai, 'AsyncOpenAI'):
+            client = openai.AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+            stream = await client.chat.completions.create(
+                model=model.value,
+                messages=messages,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                stream=True,
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        else:
+            stream = await openai.ChatCompletion.acreate(
+                model=model.value,
+                messages=messages,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices[0].delta.get('content'):
+                    yield chunk.choices[0].delta.content
+    
+    async def _iterate_in_thread(
+        self,
+        generator: Generator[str, None, None],
+        max_buffered: int = 32
+    ) -> AsyncGenerator[str, None]:
+        """
+        Bridge a blocking generator onto the event loop.
+        
+        A worker thread produces into a bounded queue, so a slow consumer
+        stalls the producer (backpressure). Closing this generator tells the
+        worker to stop and close the underlying stream.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+        stop = threading.Event()
+        done = object()
+        
+        def put(item) -> bool:
+            # Wait for queue space, giving up once the consumer has gone away
+            while not stop.is_set():
+                try:
+                    future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+                except RuntimeError:
+                    return False  # Event loop closed
+                try:
+                    future.result(timeout=1)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    future.cancel()
+            return False
+        
+        def produce():
+            try:
+                for chunk in generator:
+                    if not put(chunk):
+                        break
+                else:
+                    put(done)
+            except Exception as e:
+                put(e)
+            finally:
+                generator.close()
+        
+        loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+    
     def check_connectivity(self) -> Dict[str, bool]:
         """Check connectivity status for all providers"""
         status = {
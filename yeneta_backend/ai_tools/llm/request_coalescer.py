@@ -0,0 +1,274 @@
+"""
+Single-flight coalescing of identical LLM requests.
+
+When a class presses the same button at once (a projected practice lab or
+chapter assistant), the router used to issue one provider call per
+student, each with its own RAG lookup and key rotation. Requests are keyed
+by their normalized prompts, routed model, sampling and RAG parameters and
+metadata (which steers generation, e.g. question counts or a preferred
+model). While a request is in flight, identical ones wait for it and share
+its result instead of calling the provider again. Budget checks still run
+for every request during routing; only the leader's provider call is
+billed.
+
+Blocking calls share the leader's return value. Streams are produced once
+by a pump (a thread, or a task on the event loop for async streams) into a
+shared buffer; every subscriber replays it from the first chunk, so a late
+joiner still receives the whole response. A stream stops when its last
+subscriber leaves, so a client disconnect still cancels generation.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from .models import LLMModel, LLMRequest
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: Optional[str]) -> str:
+    return ' '.join((text or '').split())
+
+
+class _Flight:
+    """One in-flight blocking call."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _StreamFlight:
+    """One in-flight stream and the chunks produced so far."""
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.chunks = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class RequestCoalescer:
+    """Shares the result of identical concurrent LLM requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._astreams: Dict[tuple, _StreamFlight] = {}
+        self.coalesced = 0
+
+    @staticmethod
+    def request_key(kind: str, request: LLMRequest, model: LLMModel) -> Optional[str]:
+        """
+        Key identifying requests that produce interchangeable results.
+
+        Args:
+            kind: Router entry point ('text', 'json' or 'stream')
+            request: Request before RAG enhancement
+            model: Model selected by the router
+
+        Returns:
+            Hex digest, or None when the request must not be shared
+        """
+        if request.images or request.tools:
+            return None
+        payload = json.dumps([
+            kind,
+            model.value,
+            request.task_type.value,
+            _normalize(request.prompt),
+            _normalize(request.system_prompt),
+            _normalize(request.context_text),
+            request.context_documents,
+            request.temperature,
+            request.max_tokens,
+            request.use_rag,
+            request.requires_multimodal,
+            request.metadata or {},
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _joined(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+
+    # Blocking calls
+
+    def call(self, key: Optional[str], compute: Callable[[], Any], share: Callable[[Any], Any] = copy.deepcopy) -> Any:
+        """
+        Run ``compute`` unless an identical call is in flight, in which case
+        wait for it and return ``share`` of its result.
+        """
+        if key is None:
+            return compute()
+
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return share(flight.result)
+
+        try:
+            flight.result = compute()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            flight.done.set()
+
+    # Streams
+
+    def stream(self, key: Optional[str], produce: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Yield the chunks of ``produce()``, shared with identical streams in flight."""
+        if key is None:
+            yield from produce()
+            return
+
+        with self._lock:
+            flight = self._streams.get(key)
+            if flight is None:
+                flight = self._streams[key] = _StreamFlight(threading.Condition())
+                pump = threading.Thread(
+                    target=self._pump, args=(key, flight, produce), name='llm-stream', daemon=True
+                )
+            else:
+                pump = None
+                self.coalesced += 1
+            with flight.condition:
+                flight.subscribers += 1
+        if pump is not None:
+            pump.start()
+
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.finished)
+                    pending = flight.chunks[index:]
+                    finished = flight.finished
+                index += len(pending)
+                yield from pending
+                if finished and index == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            with flight.condition:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.finished
+            if abandoned:
+                # The pump stops at its next chunk; newcomers start afresh
+                with self._lock:
+                    if self._streams.get(key) is flight:
+                        del self._streams[key]
+
+    def _pump(self, key: str, flight: _StreamFlight, produce: Callable[[], Iterator[str]]) -> None:
+        from django.db import close_old_connections
+
+        chunks = produce()
+        try:
+            for chunk in chunks:
+                with flight.condition:
+                    if flight.subscribers == 0:
+                        break
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except Exception as e:
+            logger.error(f"Shared LLM stream failed: {e}")
+            flight.error = e
+        finally:
+            chunks.close()
+            close_old_connections()
+            with self._lock:
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            with flight.condition:
+                flight.finished = True
+                flight.condition.notify_all()
+
+    async def astream(self, key: Optional[str], produce: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Async counterpart of ``stream``, pumped by a task on the running loop."""
+        if key is None:
+            async for chunk in produce():
+                yield chunk
+            return
+
+        # Flights belong to the event loop whose task pumps them
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._astreams.get(flight_key)
+        if flight is None:
+            flight = self._astreams[flight_key] = _StreamFlight(asyncio.Condition())
+            flight.task = asyncio.ensure_future(self._apump(flight_key, flight, produce))
+        else:
+            self._joined()
+        flight.subscribers += 1
+
+        index = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.finished)
+                    pending = flight.chunks[index:]
+                    finished = flight.finished
+                index += len(pending)
+                for chunk in pending:
+                    yield chunk
+                if finished and index == len(flight.chunks):
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                # Nobody is reading any more: stop the provider stream
+                if self._astreams.get(flight_key) is flight:
+                    del self._astreams[flight_key]
+                flight.task.cancel()
+
+    async def _apump(self, flight_key: tuple, flight: _StreamFlight, produce: Callable[[], AsyncIterator[str]]) -> None:
+        chunks = produce()
+        try:
+            async for chunk in chunks:
+                async with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Shared async LLM stream failed: {e}")
+            flight.error = e
+        finally:
+            await chunks.aclose()
+            if self._astreams.get(flight_key) is flight:
+                del self._astreams[flight_key]
+            flight.finished = True
+            async with flight.condition:
+                flight.condition.notify_all()
+
+    def get_statistics(self) -> dict:
+        """Coalesced request count and requests currently in flight."""
+        with self._lock:
+            return {
+                'coalesced_requests': self.coalesced,
+                'in_flight': len(self._calls) + len(self._streams) + len(self._astreams),
+            }
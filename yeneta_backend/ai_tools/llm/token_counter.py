@@ -1,10 +1,16 @@
 """
 Token Counter - Accurate token counting for cost optimization
-Supports tiktoken for OpenAI models and estimation for others.
+Counts with the tokenizer of each model family when it is available locally
+(tiktoken for OpenAI models, Hugging Face tokenizer files for Gemini/Gemma
+and Llama) and with calibrated per-script estimates otherwise.
 """
 
 import os
-from typing import Optional, Dict
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
 import logging
 
 try:
@@ -14,19 +20,116 @@ except ImportError:
     TIKTOKEN_AVAILABLE = False
     logging.warning("tiktoken not available. Using estimation for token counting.")
 
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
 from .models import LLMModel
 
 logger = logging.getLogger(__name__)
 
+# Ethiopic script (Amharic, Tigrinya, Afaan Oromo in Ge'ez) tokenizes far less
+# efficiently than Latin text, so it is estimated separately
+ETHIOPIC_RE = re.compile('[\u1200-\u139F\u2D80-\u2DDF\uAB00-\uAB2F]')
+
+# Estimation fallback: (characters per token for other text, for Ethiopic text)
+CHARS_PER_TOKEN = {
+    'o200k': (4.2, 1.5),
+    'cl100k': (4.0, 0.6),
+    'gemini': (4.5, 1.5),
+    'gemma': (4.5, 1.5),
+    'llama3': (4.0, 0.8),
+    'llama2': (4.0, 0.5),
+    'generic': (4.0, 0.8),
+}
+
+# Hugging Face tokenizer.json file per family, looked up in TOKENIZER_DIR.
+# Gemini and Gemma share a SentencePiece vocabulary.
+TOKENIZER_FILES = {
+    'gemini': 'gemma.json',
+    'gemma': 'gemma.json',
+    'llama3': 'llama3.json',
+    'llama2': 'llama2.json',
+}
+
+TIKTOKEN_ENCODINGS = {
+    'o200k': ('o200k_base', 'cl100k_base'),
+    'cl100k': ('cl100k_base',),
+}
+
+# Texts shorter than this are counted directly instead of memoized
+MEMO_MIN_CHARS = 64
+
+TRUNCATION_MARKER = "\n\n[... content truncated for length ...]\n\n"
+
+
+def model_family(model: Optional[LLMModel]) -> str:
+    """Tokenizer family of a model ('generic' when unknown or not given)"""
+    if model is None:
+        return 'generic'
+    name = model.value
+    if name.startswith(('gpt-4o', 'gpt-oss')):
+        return 'o200k'
+    if name.startswith('gpt'):
+        return 'cl100k'
+    if name.startswith('gemini'):
+        return 'gemini'
+    if name.startswith('gemma'):
+        return 'gemma'
+    if name.startswith('llava'):
+        # LLaVA 7B is built on a Llama 2 / Vicuna language model
+        return 'llama2'
+    if name.startswith('llama'):
+        return 'llama3'
+    return 'generic'
+
+
+class _TiktokenTokenizer:
+    """tiktoken encoding with character offsets of each token"""
+    
+    def __init__(self, encoding):
+        self.encoding = encoding
+    
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+    
+    def offsets(self, text: str) -> List[int]:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return offsets
+
+
+class _HFTokenizer:
+    """Hugging Face tokenizer loaded from a local tokenizer.json"""
+    
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+    
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+    
+    def offsets(self, text: str) -> List[int]:
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return [start for start, _ in encoding.offsets]
+
 
 class TokenCounter:
     """
     Token counter for accurate cost estimation and optimization.
-    Uses tiktoken for OpenAI models and estimation for others.
+    Uses the model family's tokenizer when available and calibrated
+    estimation otherwise. Counts of longer texts are memoized by text hash.
     """
     
-    def __init__(self):
+    def __init__(self, memo_size: int = 4096):
         self.encoders: Dict[str, any] = {}
+        self.tokenizer_dir = os.getenv('TOKENIZER_DIR', './data/tokenizers')
+        self._tokenizers: Dict[str, Optional[object]] = {}
+        self._tokenizer_lock = threading.Lock()
+        self._memo: 'OrderedDict[Tuple[str, bytes], int]' = OrderedDict()
+        self._memo_size = memo_size
+        self._memo_lock = threading.Lock()
         self._init_encoders()
     
     def _init_encoders(self):
@@ -34,13 +137,43 @@ class TokenCounter:
         if not TIKTOKEN_AVAILABLE:
             return
         
-        try:
-            # GPT-4o uses cl100k_base encoding
-            self.encoders['gpt-4o'] = tiktoken.get_encoding("cl100k_base")
-            self.encoders['gpt-4o-mini'] = tiktoken.get_encoding("cl100k_base")
+        for model in LLMModel:
+            family = model_family(model)
+            if family in TIKTOKEN_ENCODINGS:
+                tokenizer = self._get_tokenizer(family)
+                if tokenizer:
+                    self.encoders[model.value] = tokenizer.encoding
+        if self.encoders:
             logger.info("Initialized tiktoken encoders for OpenAI models")
-        except Exception as e:
-            logger.error(f"Failed to initialize tiktoken encoders: {e}")
+    
+    def _load_tokenizer(self, family: str):
+        """Load the local tokenizer of a family, or None when unavailable"""
+        if family in TIKTOKEN_ENCODINGS and TIKTOKEN_AVAILABLE:
+            for encoding_name in TIKTOKEN_ENCODINGS[family]:
+                try:
+                    return _TiktokenTokenizer(tiktoken.get_encoding(encoding_name))
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding {encoding_name} unavailable: {e}")
+        
+        file_name = TOKENIZER_FILES.get(family)
+        if file_name and TOKENIZERS_AVAILABLE:
+            path = os.path.join(self.tokenizer_dir, file_name)
+            if os.path.exists(path):
+                try:
+                    tokenizer = _HFTokenizer(Tokenizer.from_file(path))
+                    logger.info(f"Loaded {family} tokenizer from {path}")
+                    return tokenizer
+                except Exception as e:
+                    logger.warning(f"Failed to load tokenizer {path}: {e}")
+        
+        return None
+    
+    def _get_tokenizer(self, family: str):
+        if family not in self._tokenizers:
+            with self._tokenizer_lock:
+                if family not in self._tokenizers:
+                    self._tokenizers[family] = self._load_tokenizer(family)
+        return self._tokenizers[family]
     
     def count_tokens(self, text: str, model: Optional[LLMModel] = None) -> int:
         """
@@ -56,56 +189,110 @@ class TokenCounter:
         if not text:
             return 0
         
-        # If no model specified, use generic estimation
-        if model is None:
-            return self._estimate_tokens_generic(text)
-        
-        # Use tiktoken for OpenAI models
-        if model.value.startswith('gpt') and TIKTOKEN_AVAILABLE:
+        family = model_family(model)
+        if len(text) < MEMO_MIN_CHARS:
+            return self._count(text, family)
+        
+        key = (family, hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest())
+        with self._memo_lock:
+            count = self._memo.get(key)
+            if count is not None:
+                self._memo.move_to_end(key)
+                return count
+        
+        count = self._count(text, family)
+        with self._memo_lock:
+            self._memo[key] = count
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        return count
+    
+    def _count(self, text: str, family: str) -> int:
+        """Count tokens with the family tokenizer, falling back to estimation"""
+        tokenizer = self._get_tokenizer(family)
+        if tokenizer:
             try:
-                encoder = self.encoders.get(model.value)
-                if encoder:
-                    return len(encoder.encode(text))
+                return tokenizer.count(text)
             except Exception as e:
-                logger.warning(f"tiktoken encoding failed: {e}. Using estimation.")
+                logger.warning(f"{family} tokenization failed: {e}. Using estimation.")
         
-        # Estimation for other models
-        return self._estimate_tokens(text, model)
+        return self._estimate_tokens(text, family)
     
     def _estimate_tokens_generic(self, text: str) -> int:
         """
         Generic token estimation when model is not specified.
         Uses conservative 4 characters per token estimate.
         """
-        if not text:
-            return 0
-        return int(len(text) / 4)
+        return self._estimate_tokens(text, 'generic')
     
-    def _estimate_tokens(self, text: str, model: LLMModel) -> int:
+    def _estimate_tokens(self, text: str, family: str) -> int:
         """
-        Estimate token count using heuristics.
+        Estimate token count using calibrated characters-per-token ratios.
         
-        Different models have different tokenization:
-        - English: ~4 chars per token
-        - Code: ~3 chars per token
-        - Amharic/Oromo: ~2-3 chars per token (more efficient)
+        Different tokenizers split text differently:
+        - English: ~4-4.5 chars per token
+        - Amharic/Tigrinya (Ethiopic script): ~0.5-1.5 chars per token,
+          depending on how much of the script the vocabulary covers
         """
         if not text:
             return 0
         
-        # Base estimation: 4 characters per token (conservative)
-        char_count = len(text)
-        
-        # Adjust for model type
-        if model.value.startswith('gemini'):
-            # Gemini is slightly more efficient
-            return int(char_count / 4.5)
-        elif model.value.startswith(('llama', 'gemma', 'llava')):
-            # Ollama models vary, use conservative estimate
-            return int(char_count / 4)
-        else:
-            # Default estimation
-            return int(char_count / 4)
+        other_ratio, ethiopic_ratio = CHARS_PER_TOKEN.get(family, CHARS_PER_TOKEN['generic'])
+        ethiopic_chars = len(ETHIOPIC_RE.findall(text))
+        other_chars = len(text) - ethiopic_chars
+        
+        return int(other_chars / other_ratio + ethiopic_chars / ethiopic_ratio)
+    
+    def _token_offsets(self, text: str, model: Optional[LLMModel]) -> Optional[List[int]]:
+        """Start offset of each token in text, or None when only estimation is available"""
+        family = model_family(model)
+        tokenizer = self._get_tokenizer(family)
+        if tokenizer:
+            try:
+                return tokenizer.offsets(text)
+            except Exception as e:
+                logger.warning(f"{family} tokenization failed: {e}. Using estimation.")
+        return None
+    
+    @staticmethod
+    def _join_slack(offsets: Optional[List[int]]) -> int:
+        """Tokens reserved per join: estimates of the parts round down separately"""
+        return 0 if offsets is not None else 1
+    
+    def _prefix_end(self, text: str, max_tokens: int, model: Optional[LLMModel], offsets=None) -> int:
+        """Length of the longest prefix of text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return 0
+        if offsets is not None:
+            return len(text) if len(offsets) <= max_tokens else offsets[max_tokens]
+        
+        # Estimation grows with prefix length: binary search the cut point
+        family = model_family(model)
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self._estimate_tokens(text[:mid], family) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+    
+    def _suffix_start(self, text: str, max_tokens: int, model: Optional[LLMModel], offsets=None) -> int:
+        """Start of the longest suffix of text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return len(text)
+        if offsets is not None:
+            return 0 if len(offsets) <= max_tokens else offsets[len(offsets) - max_tokens]
+        
+        family = model_family(model)
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high) // 2
+            if self._estimate_tokens(text[mid:], family) <= max_tokens:
+                high = mid
+            else:
+                low = mid + 1
+        return low
     
     def count_messages_tokens(
         self,
@@ -186,20 +373,49 @@ class TokenCounter:
         if not text:
             return text
         
-        current_tokens = self.count_tokens(text, model)
-        
-        if current_tokens <= max_tokens:
+        if self.count_tokens(text, model) <= max_tokens:
             return text
         
-        # Calculate target character count
-        chars_per_token = len(text) / current_tokens if current_tokens > 0 else 4
-        target_chars = int(max_tokens * chars_per_token * 0.95)  # 5% buffer
+        # Keep the longest prefix that leaves room for the ellipsis
+        offsets = self._token_offsets(text, model)
+        budget = max(max_tokens - self.count_tokens("...", model) - self._join_slack(offsets), 0)
+        return text[:self._prefix_end(text, budget, model, offsets)] + "..."
+    
+    def truncate_middle(
+        self,
+        text: str,
+        max_tokens: int,
+        model: Optional[LLMModel] = None,
+        marker: str = TRUNCATION_MARKER,
+        head_ratio: float = 0.6
+    ) -> str:
+        """
+        Truncate text from the middle, keeping its beginning and end.
         
-        if target_chars >= len(text):
+        Args:
+            text: Text to truncate
+            max_tokens: Maximum number of tokens
+            model: LLM model for token counting (optional)
+            marker: Text inserted where content was removed
+            head_ratio: Share of the budget kept from the beginning
+        
+        Returns:
+            Truncated text
+        """
+        if not text or self.count_tokens(text, model) <= max_tokens:
             return text
         
-        # Simple truncation from end
-        return text[:target_chars] + "..."
+        # The text is tokenized once; both cut points come from its offsets
+        offsets = self._token_offsets(text, model)
+        budget = max_tokens - self.count_tokens(marker, model) - 2 * self._join_slack(offsets)
+        if budget <= 0:
+            return text[:self._prefix_end(text, max_tokens, model, offsets)]
+        
+        head_tokens = int(budget * head_ratio)
+        head_end = self._prefix_end(text, head_tokens, model, offsets)
+        tail_start = max(self._suffix_start(text, budget - head_tokens, model, offsets), head_end)
+        
+        return text[:head_end] + marker + text[tail_start:]
     
     def optimize_prompt(
         self,
@@ -228,24 +444,7 @@ class TokenCounter:
             f"Prompt exceeds {max_tokens} tokens ({current_tokens}). Truncating."
         )
         
-        # Calculate target character count
-        chars_per_token = len(prompt) / current_tokens
-        target_chars = int(max_tokens * chars_per_token * 0.95)  # 5% buffer
-        
-        if target_chars >= len(prompt):
-            return prompt
-        
-        # Truncate from middle, keep beginning and end
-        keep_start = int(target_chars * 0.6)
-        keep_end = int(target_chars * 0.4)
-        
-        truncated = (
-            prompt[:keep_start] +
-            "\n\n[... content truncated for length ...]\n\n" +
-            prompt[-keep_end:]
-        )
-        
-        return truncated
+        return self.truncate_middle(prompt, max_tokens, model)
     
     def get_token_budget(
         self,
@@ -0,0 +1,22 @@
+"""
+Django management command to rebuild the lesson plan and rubric full-text indexes.
+Usage: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+from ai_tools.models import SavedLessonPlan, SavedRubric
+from ai_tools.search_index import lesson_plan_index, rubric_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 search indexes for saved lesson plans and rubrics'
+    
+    def handle(self, *args, **options):
+        for index, model in ((lesson_plan_index, SavedLessonPlan), (rubric_index, SavedRubric)):
+            if not index.create():
+                self.stdout.write(self.style.WARNING(
+                    f'FTS5 is not available; {model.__name__} search uses icontains filters'
+                ))
+                continue
+            count = index.rebuild(model.objects.iterator())
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {model.__name__} rows into {index.table}'))
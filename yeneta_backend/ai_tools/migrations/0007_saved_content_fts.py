@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from ai_tools.search_index import lesson_plan_index, rubric_index
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    for index, model_name in ((lesson_plan_index, 'SavedLessonPlan'), (rubric_index, 'SavedRubric')):
+        if index.create(connection):
+            index.rebuild(apps.get_model('ai_tools', model_name).objects.iterator())
+
+
+def drop_search_indexes(apps, schema_editor):
+    lesson_plan_index.drop(schema_editor.connection)
+    rubric_index.drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_tools', '0006_alter_sharedfile_content_type_savedlesson_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
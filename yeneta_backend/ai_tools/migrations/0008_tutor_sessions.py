@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ai_tools', '0007_saved_content_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TutorSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.TextField(blank=True, default='', help_text='Rolling summary of the turns folded out of the recent window')),
+                ('summarized_through', models.PositiveIntegerField(default=0, help_text='Sequence number of the last turn folded into the summary')),
+                ('turn_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tutor_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TutorTurn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('role', models.CharField(choices=[('user', 'Student'), ('assistant', 'Tutor')], max_length=10)),
+                ('content', models.TextField()),
+                ('token_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turns', to='ai_tools.tutorsession')),
+            ],
+            options={
+                'ordering': ['session', 'sequence'],
+                'unique_together': {('session', 'sequence')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tutorsession',
+            index=models.Index(fields=['user', 'updated_at'], name='ai_tools_tu_user_id_be8b7c_idx'),
+        ),
+    ]
@@ -669,3 +669,65 @@ class TutorConfiguration(models.Model):
             'updated_at': self.updated_at.isoformat(),
             'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
         }
+
+
+class TutorSession(models.Model):
+    """
+    Server-side AI Tutor conversation. Recent turns are replayed to the
+    model verbatim; older ones are folded into a rolling summary.
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tutor_sessions'
+    )
+    summary = models.TextField(
+        blank=True,
+        default='',
+        help_text="Rolling summary of the turns folded out of the recent window"
+    )
+    summarized_through = models.PositiveIntegerField(
+        default=0,
+        help_text="Sequence number of the last turn folded into the summary"
+    )
+    turn_count = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username}: tutor session {self.id} ({self.turn_count} turns)"
+
+
+class TutorTurn(models.Model):
+    """One student message or tutor reply of a TutorSession."""
+    
+    ROLE_CHOICES = [
+        ('user', 'Student'),
+        ('assistant', 'Tutor'),
+    ]
+    
+    session = models.ForeignKey(
+        TutorSession,
+        on_delete=models.CASCADE,
+        related_name='turns'
+    )
+    sequence = models.PositiveIntegerField()
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    token_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['session', 'sequence']
+        unique_together = ['session', 'sequence']
+    
+    def __str__(self):
+        return f"Session {self.session_id} turn {self.sequence} ({self.role})"
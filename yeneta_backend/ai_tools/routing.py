@@ -0,0 +1,7 @@
+from django.urls import re_path
+
+from . import consumers
+
+http_urlpatterns = [
+    re_path(r'^api/ai-tools/tutor/stream/$', consumers.TutorStreamConsumer()),
+]
@@ -0,0 +1,45 @@
+"""
+Full-text indexes for the saved lesson plan and rubric libraries.
+"""
+from yeneta_backend.fulltext import FullTextIndex, flatten_text
+
+
+def _lesson_plan_document(plan):
+    return {
+        'title': plan.title,
+        'topic': plan.topic,
+        'subject': plan.subject,
+        'tags': flatten_text(plan.tags),
+        'body': ' '.join(flatten_text(value) for value in (
+            plan.objectives, plan.essential_questions, plan.enduring_understandings,
+            plan.materials, plan.five_e_sequence, plan.assessment_plan,
+            plan.differentiation_strategies, plan.homework, plan.extensions,
+        )),
+    }
+
+
+def _rubric_document(rubric):
+    return {
+        'title': rubric.title,
+        'topic': rubric.topic,
+        'subject': rubric.subject,
+        'tags': flatten_text(rubric.tags),
+        'body': ' '.join(flatten_text(value) for value in (
+            rubric.learning_objectives, rubric.criteria,
+        )),
+    }
+
+
+lesson_plan_index = FullTextIndex(
+    'ai_tools_savedlessonplan_fts',
+    columns=('title', 'topic', 'subject', 'tags', 'body'),
+    document=_lesson_plan_document,
+    weights=(10.0, 6.0, 4.0, 6.0, 1.0),
+)
+
+rubric_index = FullTextIndex(
+    'ai_tools_savedrubric_fts',
+    columns=('title', 'topic', 'subject', 'tags', 'body'),
+    document=_rubric_document,
+    weights=(10.0, 6.0, 4.0, 6.0, 1.0),
+)
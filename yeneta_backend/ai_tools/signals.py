@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from ai_tools.export_cache import export_cache
+from ai_tools.models import SavedLessonPlan, SavedRubric, SavedLesson
+from ai_tools.search_index import lesson_plan_index, rubric_index
+
+# Counters saved with update_fields that do not change rendered exports
+NON_CONTENT_FIELDS = {'times_used', 'rating', 'rating_count'}
+
+
+@receiver(post_save, sender=SavedLessonPlan)
+@receiver(post_save, sender=SavedRubric)
+@receiver(post_save, sender=SavedLesson)
+def invalidate_rendered_exports(sender, instance, created, update_fields=None, **kwargs):
+    """Drop cached PDF/DOCX exports when a saved document's content changes."""
+    if created or (update_fields and set(update_fields) <= NON_CONTENT_FIELDS):
+        return
+    export_cache.invalidate(sender._meta.label_lower, instance.pk)
+
+
+@receiver(post_delete, sender=SavedLessonPlan)
+@receiver(post_delete, sender=SavedRubric)
+@receiver(post_delete, sender=SavedLesson)
+def delete_rendered_exports(sender, instance, **kwargs):
+    export_cache.invalidate(sender._meta.label_lower, instance.pk)
+
+
+@receiver(post_save, sender=SavedLessonPlan)
+def index_lesson_plan(sender, instance, update_fields=None, **kwargs):
+    """Keep the lesson plan full-text index in step with saves."""
+    if update_fields and set(update_fields) <= NON_CONTENT_FIELDS:
+        return
+    lesson_plan_index.index(instance)
+
+
+@receiver(post_save, sender=SavedRubric)
+def index_rubric(sender, instance, update_fields=None, **kwargs):
+    """Keep the rubric full-text index in step with saves."""
+    if update_fields and set(update_fields) <= NON_CONTENT_FIELDS:
+        return
+    rubric_index.index(instance)
+
+
+@receiver(post_delete, sender=SavedLessonPlan)
+def unindex_lesson_plan(sender, instance, **kwargs):
+    lesson_plan_index.remove(instance.pk)
+
+
+@receiver(post_delete, sender=SavedRubric)
+def unindex_rubric(sender, instance, **kwargs):
+    rubric_index.remove(instance.pk)
@@ -0,0 +1,262 @@
+"""
+Server-side AI Tutor sessions.
+
+The tutor used to put whatever chat history the client sent into the prompt,
+so prompts (and latency) grew with every exchange. Each conversation is now
+a ``TutorSession`` whose turns are stored on the server. A prompt carries the
+session's rolling summary plus the most recent turns that fit in
+``TUTOR_HISTORY_TOKEN_BUDGET``. Once the unsummarized turns exceed that
+budget, the oldest of them are folded into the summary by one small LLM
+call in a background thread. Only those turns are sent with the previous
+summary, never the whole transcript, so the cost of summarizing stays flat
+as the conversation grows.
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .llm.token_counter import token_counter
+from .models import TutorSession, TutorTurn
+
+logger = logging.getLogger(__name__)
+
+ROLE_LABELS = {'user': 'Student', 'assistant': 'Tutor'}
+
+# Folding brings the unsummarized turns down to this share of the budget, so
+# a summary is generated every few exchanges rather than on every one
+FOLD_TARGET_RATIO = 0.5
+
+# The latest turns are never folded away
+MIN_WINDOW_TURNS = 2
+
+# Upper bound on turns read per prompt, in case folding falls behind
+MAX_WINDOW_TURNS = 40
+
+SUMMARY_MAX_TOKENS = 400
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a tutoring session between a student and an AI tutor. "
+    "Keep the topics covered, what the student understood or struggled with, open questions "
+    "and any preferences the student stated. Be concise and factual."
+)
+
+# Sessions with a fold in progress
+_folding = set()
+_folding_lock = threading.Lock()
+
+
+class TutorSessionService:
+    """Service storing tutor turns and building bounded prompt history."""
+
+    @staticmethod
+    def history_budget() -> int:
+        return getattr(settings, 'TUTOR_HISTORY_TOKEN_BUDGET', 1500)
+
+    # Sessions
+
+    @staticmethod
+    def get_session(user, session_id=None, new: bool = False) -> TutorSession:
+        """
+        The session a tutor request belongs to.
+
+        Args:
+            user: Requesting user
+            session_id: Session chosen by the client, if any
+            new: Start a fresh session
+
+        Returns:
+            The requested session, else the user's session active within
+            ``TUTOR_SESSION_IDLE_MINUTES``, else a new one
+        """
+        if not new:
+            sessions = TutorSession.objects.filter(user=user)
+            if session_id:
+                try:
+                    session = sessions.filter(id=int(session_id)).first()
+                except (TypeError, ValueError):
+                    session = None
+            else:
+                idle = timedelta(minutes=getattr(settings, 'TUTOR_SESSION_IDLE_MINUTES', 120))
+                session = sessions.filter(updated_at__gte=timezone.now() - idle).order_by('-updated_at').first()
+            if session is not None:
+                return session
+        return TutorSession.objects.create(user=user)
+
+    # Turns
+
+    @staticmethod
+    def record_turns(session: TutorSession, turns: List[Tuple[str, str]]) -> List[TutorTurn]:
+        """Append ``(role, content)`` turns to ``session`` in one transaction."""
+        with transaction.atomic():
+            TutorSession.objects.filter(id=session.id).update(
+                turn_count=F('turn_count') + len(turns), updated_at=timezone.now()
+            )
+            session.turn_count = TutorSession.objects.values_list('turn_count', flat=True).get(id=session.id)
+            first = session.turn_count - len(turns) + 1
+            return TutorTurn.objects.bulk_create([
+                TutorTurn(
+                    session=session,
+                    sequence=first + offset,
+                    role=role,
+                    content=content,
+                    token_count=token_counter.count_tokens(content),
+                )
+                for offset, (role, content) in enumerate(turns)
+            ])
+
+    @staticmethod
+    def record_exchange(session: TutorSession, message: str, reply: str) -> None:
+        """
+        Store a student message together with the tutor's reply and fold old
+        turns if the window overflowed. Nothing is stored when no reply was
+        generated, so a failed request never leaves an unanswered turn in
+        the history. Called once a response has been fully generated, so
+        failures are logged rather than raised.
+        """
+        if not reply or not reply.strip():
+            return
+        try:
+            TutorSessionService.record_turns(session, [('user', message), ('assistant', reply)])
+            TutorSessionService.schedule_fold(session)
+        except Exception as e:
+            logger.error(f"Failed to record tutor exchange for session {session.id}: {e}")
+
+    @staticmethod
+    def _unsummarized(session: TutorSession):
+        return session.turns.filter(sequence__gt=session.summarized_through).only(
+            'sequence', 'role', 'content', 'token_count'
+        )
+
+    @staticmethod
+    def window(session: TutorSession) -> List[TutorTurn]:
+        """
+        Most recent unsummarized turns within the token budget, oldest first.
+        The latest turn is always kept, cut down to the budget if it is
+        longer on its own.
+        """
+        budget = TutorSessionService.history_budget()
+        turns = []
+        used = 0
+        for turn in TutorSessionService._unsummarized(session).order_by('-sequence')[:MAX_WINDOW_TURNS]:
+            if used + turn.token_count > budget:
+                if not turns:
+                    turn.content = token_counter.truncate_middle(turn.content, budget)
+                    turns.append(turn)
+                break
+            turns.append(turn)
+            used += turn.token_count
+        turns.reverse()
+        return turns
+
+    @staticmethod
+    def build_context(session: TutorSession) -> str:
+        """Conversation history for the next prompt: rolling summary plus recent turns."""
+        parts = []
+        if session.summary:
+            parts.append(f"Summary of earlier conversation:\n{session.summary}")
+        turns = TutorSessionService.window(session)
+        if turns:
+            parts.append("Recent conversation:\n" + "\n\n".join(
+                f"{ROLE_LABELS[turn.role]}: {turn.content}" for turn in turns
+            ))
+        return "\n\n".join(parts)
+
+    # Rolling summary
+
+    @staticmethod
+    def schedule_fold(session: TutorSession) -> None:
+        """Fold old turns in the background once the window has overflowed."""
+        pending = TutorSessionService._unsummarized(session).aggregate(
+            tokens=Sum('token_count')
+        )['tokens'] or 0
+        if pending <= TutorSessionService.history_budget():
+            return
+        with _folding_lock:
+            if session.id in _folding:
+                return
+            _folding.add(session.id)
+        session_id = session.id
+        transaction.on_commit(lambda: threading.Thread(
+            target=TutorSessionService._fold_in_background,
+            args=(session_id,),
+            name='tutor-summary',
+            daemon=True
+        ).start())
+
+    @staticmethod
+    def _fold_in_background(session_id: int) -> None:
+        try:
+            TutorSessionService.fold(session_id)
+        except Exception as e:
+            logger.error(f"Failed to summarize tutor session {session_id}: {e}")
+        finally:
+            close_old_connections()
+            with _folding_lock:
+                _folding.discard(session_id)
+
+    @staticmethod
+    def build_summary_prompt(summary: str, turns: List[TutorTurn]) -> str:
+        transcript = "\n\n".join(f"{ROLE_LABELS[turn.role]}: {turn.content}" for turn in turns)
+        return f"""Current summary:
+{summary or '(none yet)'}
+
+New conversation to add:
+{transcript}
+
+Rewrite the summary so it also covers the new conversation. Reply with the updated summary only, in at most 200 words."""
+
+    @staticmethod
+    def fold(session_id: int) -> bool:
+        """
+        Fold the oldest unsummarized turns of a session into its summary
+        until the rest fit in half the history budget.
+
+        Returns:
+            Whether the summary was updated
+        """
+        from .llm import llm_router, LLMRequest, TaskType, TaskComplexity, UserRole
+
+        session = TutorSession.objects.select_related('user').get(id=session_id)
+        turns = list(TutorSessionService._unsummarized(session).order_by('sequence'))
+        remaining = sum(turn.token_count for turn in turns)
+        target = TutorSessionService.history_budget() * FOLD_TARGET_RATIO
+
+        to_fold = []
+        for turn in turns[:-MIN_WINDOW_TURNS]:
+            if remaining <= target:
+                break
+            to_fold.append(turn)
+            remaining -= turn.token_count
+        if not to_fold:
+            return False
+
+        llm_request = LLMRequest(
+            prompt=TutorSessionService.build_summary_prompt(session.summary, to_fold),
+            user_id=session.user_id,
+            user_role=UserRole(session.user.role),
+            task_type=TaskType.CONVERSATION_SUMMARY,
+            complexity=TaskComplexity.BASIC,
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            temperature=0.3,
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        response = llm_router.process_request(llm_request)
+        summary = (response.content or '').strip() if response.success else ''
+        if not summary:
+            logger.warning(f"Tutor session {session_id} summary failed: {response.error_message}")
+            return False
+
+        # Guard against a concurrent fold of the same turns
+        updated = TutorSession.objects.filter(
+            id=session.id, summarized_through=session.summarized_through
+        ).update(summary=summary, summarized_through=to_fold[-1].sequence)
+        if updated:
+            logger.info(f"Folded {len(to_fold)} turn(s) into the summary of tutor session {session_id}")
+        return bool(updated)
+
@@ -34,10 +34,13 @@ from .serializers import (
     SavedRubricListSerializer,
     SavedLessonSerializer
 )
+from .export_cache import export_cache
+from .search_index import lesson_plan_index, rubric_index
 from .rubric_rag_enhancer import RubricRAGEnhancer
 from .grader_rag_enhancer import GraderRAGEnhancer
 from .rubric_generator_rag_enhancer import RubricGeneratorRAGEnhancer
 from .tutor_rag_enhancer import TutorRAGEnhancer
+from .tutor_session import TutorSessionService
 from users.models import User
 from communications.models import SharedFileNotification
 from academics.models import StudentGrade
@@ -237,34 +240,31 @@ def clean_lesson_content_response(content: str) -> str:
     return content.strip()
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def tutor_view(request):
-    """AI Tutor endpoint with streaming or JSON response and RAG support."""
+def _prepare_tutor_request(user, data) -> dict:
+    """
+    Build the AI Tutor LLM request: saved configuration, curriculum RAG
+    context, system prompt and the server-side session history. Shared by
+    the sync tutor view and the async streaming consumer.
     
-    message = request.data.get('message', '')
-    use_rag = request.data.get('useRAG', False)
-    context = request.data.get('context', '')
-    stream_response = request.data.get('stream', True)  # Default to streaming response
-    subject = request.data.get('subject', '')  # Optional explicit subject from frontend
-    grade = request.data.get('grade', '')  # Optional explicit grade from frontend
+    Returns:
+        Dict with the LLMRequest, tutor session and RAG status metadata
+    """
+    message = data.get('message', '')
+    use_rag = data.get('useRAG', False)
+    stream_response = data.get('stream', True)  # Default to streaming response
+    subject = data.get('subject', '')  # Optional explicit subject from frontend
+    grade = data.get('grade', '')  # Optional explicit grade from frontend
     # Academic stream parameter (Natural Science/Social Science for Grades 11-12)
     # Frontend sends as 'stream', backend also accepts 'stream_param' for clarity
-    academic_stream = request.data.get('stream_param') or request.data.get('stream')
-    configured_chapter = request.data.get('chapter', '')
-    region = request.data.get('region', None)
-    
-    if not message:
-        return Response(
-            {'error': 'Message is required'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    academic_stream = data.get('stream_param') or data.get('stream')
+    configured_chapter = data.get('chapter', '')
+    region = data.get('region', None)
     
     # Check for saved tutor configuration
     saved_config = None
     try:
         from .models import TutorConfiguration
-        saved_config = TutorConfiguration.objects.filter(user=request.user).first()
+        saved_config = TutorConfiguration.objects.filter(user=user).first()
         if saved_config:
             saved_config.update_usage()  # Track usage
             # Use saved config if frontend didn't provide explicit values
@@ -278,7 +278,7 @@ def tutor_view(request):
                 configured_chapter = saved_config.chapter_input
             if not use_rag and saved_config.use_ethiopian_curriculum:
                 use_rag = True
-            logger.info(f"📚 Using saved tutor configuration for {request.user.username}")
+            logger.info(f"📚 Using saved tutor configuration for {user.username}")
     except Exception as e:
         logger.debug(f"Could not load saved configuration: {e}")
     
@@ -289,7 +289,7 @@ def tutor_view(request):
     rag_message = None
     
     # Get student's grade level - prefer explicit grade from frontend, fallback to user profile
-    student_grade = grade if grade else getattr(request.user, 'grade', None)
+    student_grade = grade if grade else getattr(user, 'grade', None)
 
     if use_rag:
         try:
@@ -299,11 +299,11 @@ def tutor_view(request):
 
             
             if not student_grade:
-                logger.warning(f"⚠️ Student {request.user.username} has no grade level set")
+                logger.warning(f"⚠️ Student {user.username} has no grade level set")
                 rag_message = "Your grade level is not set. Please select a grade or update your profile."
                 rag_status = 'fallback'
             else:
-                logger.info(f"RAG enabled for AI Tutor: Student={request.user.username}, Grade={student_grade}, Subject={subject or 'auto-detect'}")
+                logger.info(f"RAG enabled for AI Tutor: Student={user.username}, Grade={student_grade}, Subject={subject or 'auto-detect'}")
                 
                 # Analyze query for better retrieval
                 query_analysis = TutorRAGEnhancer.analyze_query_intent(message)
@@ -522,20 +522,62 @@ def tutor_view(request):
     else:
         logger.info(f"💬 Tutor request without RAG (disabled)")
 
+    # Conversation history comes from the server-side session (rolling
+    # summary plus recent turns), not from the client, so it stays bounded
+    tutor_session = TutorSessionService.get_session(
+        user, data.get('sessionId'), new=bool(data.get('newSession'))
+    )
+    history = TutorSessionService.build_context(tutor_session)
+    if history:
+        # The streaming generators ignore context_text, so history rides in the system prompt
+        enhanced_system_prompt += f"\n\n=== CONVERSATION SO FAR ===\n{history}\n=== END CONVERSATION ==="
+
     # Create LLM request
     llm_request = LLMRequest(
         prompt=message,
-        user_id=request.user.id,
-        user_role=UserRole(request.user.role),
+        user_id=user.id,
+        user_role=UserRole(user.role),
         task_type=TaskType.TUTORING,
         complexity=TaskComplexity.MEDIUM,
         system_prompt=enhanced_system_prompt,
         temperature=0.7,
         max_tokens=1500,  # Increased for more detailed explanations
         stream=stream_response,
-        context_documents=[context] if context else None,
     )
     
+    return {
+        'message': message,
+        'tutor_session': tutor_session,
+        'subject': subject,
+        'stream_response': stream_response,
+        'llm_request': llm_request,
+        'rag_status': rag_status,
+        'rag_message': rag_message,
+        'curriculum_sources': curriculum_sources,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def tutor_view(request):
+    """AI Tutor endpoint with streaming or JSON response and RAG support."""
+    
+    message = request.data.get('message', '')
+    if not message:
+        return Response(
+            {'error': 'Message is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    prepared = _prepare_tutor_request(request.user, request.data)
+    subject = prepared['subject']
+    stream_response = prepared['stream_response']
+    llm_request = prepared['llm_request']
+    rag_status = prepared['rag_status']
+    rag_message = prepared['rag_message']
+    curriculum_sources = prepared['curriculum_sources']
+    tutor_session = prepared['tutor_session']
+    
     # Generate alert if student message indicates issues (only for students)
     tutor_response_content = ""
     if request.user.role == 'Student':
@@ -567,14 +609,19 @@ def tutor_view(request):
     if stream_response:
         # Stream response with RAG metadata in headers
         def generate():
+            reply = []
             try:
                 for chunk in llm_router.process_request_stream(llm_request):
+                    reply.append(chunk)
                     yield chunk
             except Exception as e:
                 logger.error(f"❌ AI Tutor streaming error: {e}", exc_info=True)
                 yield f"\n\n⚠️ Error: Unable to generate response. Please try again."
+                return
+            TutorSessionService.record_exchange(tutor_session, message, ''.join(reply))
         
         response = StreamingHttpResponse(generate(), content_type='text/plain')
+        response['X-Tutor-Session'] = str(tutor_session.id)
         # Add RAG metadata to response headers
         response['X-RAG-Status'] = rag_status
         if rag_status == 'success' and curriculum_sources:
@@ -600,8 +647,12 @@ def tutor_view(request):
                     'latency_ms': 0
                 })()
             
+            if getattr(temp_response, 'success', True):
+                TutorSessionService.record_exchange(tutor_session, message, temp_response.content)
+            
             return Response({
                 'message': message,
+                'session_id': tutor_session.id,
                 'response': temp_response.content if hasattr(temp_response, 'content') else tutor_response_content,
                 'model': str(temp_response.model) if hasattr(temp_response, 'model') else 'cached',
                 'input_tokens': temp_response.input_tokens if hasattr(temp_response, 'input_tokens') else 0,
@@ -2907,6 +2958,11 @@ def grade_submission_view(request):
 
 
 
+# The authenticity prompt analyzes the first 4000 characters; extract a few
+# times that so the reported length stays meaningful without reading whole books
+AUTHENTICITY_TEXT_BUDGET = 20000
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def check_authenticity_view(request):
@@ -2931,7 +2987,7 @@ def check_authenticity_view(request):
                 # Prefer file content, fallback to description
                 if student_assignment.file:
                     from .file_utils import extract_text_from_file
-                    extracted_text, error = extract_text_from_file(student_assignment.file)
+                    extracted_text, error = extract_text_from_file(student_assignment.file, max_chars=AUTHENTICITY_TEXT_BUDGET)
                     if error:
                         return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
                     text_to_check = extracted_text
@@ -2950,7 +3006,7 @@ def check_authenticity_view(request):
                 # If text is empty, try to extract from file
                 if not text_to_check and submission.submitted_file:
                     from .file_utils import extract_text_from_file
-                    extracted_text, error = extract_text_from_file(submission.submitted_file)
+                    extracted_text, error = extract_text_from_file(submission.submitted_file, max_chars=AUTHENTICITY_TEXT_BUDGET)
                     if error:
                         return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
                     text_to_check = extracted_text
@@ -2968,7 +3024,7 @@ def check_authenticity_view(request):
     # Case 2: Check uploaded file
     elif uploaded_file:
         from .file_utils import extract_text_from_file
-        extracted_text, error = extract_text_from_file(uploaded_file)
+        extracted_text, error = extract_text_from_file(uploaded_file, max_chars=AUTHENTICITY_TEXT_BUDGET)
         if error:
             return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         text_to_check = extracted_text
@@ -3282,6 +3338,7 @@ def system_status_view(request):
         rag_stats = rag_service.get_stats()
         serp_stats = serp_service.get_stats()
         cost_summary = cost_tracker.get_analytics_summary()
+        coalescing_stats = llm_router.get_coalescing_statistics()
         
         system_status_data = {
             'timestamp': json.dumps(None),  # Will be replaced with actual timestamp
@@ -3309,6 +3366,11 @@ def system_status_view(request):
                 'budget_percentage_used': cost_summary.get('budget_percentage_used', 0.0),
                 'total_requests': cost_summary.get('total_requests', 0),
             },
+            'coalescing': {
+                'enabled': coalescing_stats.get('enabled', False),
+                'coalesced_requests': coalescing_stats.get('coalesced_requests', 0),
+                'in_flight': coalescing_stats.get('in_flight', 0),
+            },
             'health': {
                 'ollama': 'healthy' if ollama_status.get('available') else 'unavailable',
                 'rag': 'healthy' if rag_stats.get('enabled') and rag_stats.get('vector_store', {}).get('total_chunks', 0) > 0 else 'limited',
@@ -4155,16 +4217,20 @@ class SavedLessonPlanViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(grade=grade)
         if subject:
             queryset = queryset.filter(subject__icontains=subject)
+        if my_plans == 'true':
+            queryset = queryset.filter(created_by=user)
+        if public_only == 'true':
+            queryset = queryset.filter(is_public=True)
         if search:
+            # Ranked full-text search; icontains scan when FTS5 is unavailable
+            ranked = lesson_plan_index.search(queryset, search)
+            if ranked is not None:
+                return ranked
             queryset = queryset.filter(
                 Q(title__icontains=search) |
                 Q(topic__icontains=search) |
                 Q(tags__contains=[search])
             )
-        if my_plans == 'true':
-            queryset = queryset.filter(created_by=user)
-        if public_only == 'true':
-            queryset = queryset.filter(is_public=True)
         
         return queryset.order_by('-created_at')
     
@@ -4221,7 +4287,12 @@ class SavedLessonPlanViewSet(viewsets.ModelViewSet):
     def export_pdf(self, request, pk=None):
         """Export lesson plan as PDF"""
         lesson_plan = self.get_object()
-        
+        return export_cache.respond(
+            lesson_plan, 'pdf', lambda: self._export_plan_as_pdf(lesson_plan),
+            size_hint=_lesson_plan_size(lesson_plan), request=request
+        )
+
+    def _export_plan_as_pdf(self, lesson_plan):
         try:
             from reportlab.lib.pagesizes import letter, A4
             from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -4399,11 +4470,17 @@ class SavedLessonPlanViewSet(viewsets.ModelViewSet):
         export_format = request.query_params.get('format', 'pdf').lower()
         
         if export_format == 'pdf':
-            return self.export_pdf(request, pk)
+            return export_cache.respond(
+                lesson_plan, 'pdf', lambda: self._export_plan_as_pdf(lesson_plan),
+                size_hint=_lesson_plan_size(lesson_plan), request=request
+            )
         elif export_format == 'docx':
             # Implement DOCX export for lesson plan
             # For now, fallback to text or implement simple docx
-            return self._export_plan_as_docx(lesson_plan)
+            return export_cache.respond(
+                lesson_plan, 'docx', lambda: self._export_plan_as_docx(lesson_plan),
+                size_hint=_lesson_plan_size(lesson_plan), request=request
+            )
         else:
             return self._export_plan_as_txt(lesson_plan)
 
@@ -4939,16 +5016,20 @@ class SavedRubricViewSet(viewsets.ModelViewSet):
         if rubric_type:
             queryset = queryset.filter(rubric_type=rubric_type)
         
+        if my_rubrics == 'true':
+            queryset = queryset.filter(created_by=user)
+        
         if search:
+            # Ranked full-text search; icontains scan when FTS5 is unavailable
+            ranked = rubric_index.search(queryset, search)
+            if ranked is not None:
+                return ranked
             queryset = queryset.filter(
                 Q(title__icontains=search) |
                 Q(topic__icontains=search) |
                 Q(subject__icontains=search)
             )
         
-        if my_rubrics == 'true':
-            queryset = queryset.filter(created_by=user)
-        
         return queryset.order_by('-created_at')
     
     def get_serializer_class(self):
@@ -5042,7 +5123,12 @@ class SavedRubricViewSet(viewsets.ModelViewSet):
     def export_pdf(self, request, pk=None):
         """Export rubric as PDF"""
         rubric = self.get_object()
-        
+        return export_cache.respond(
+            rubric, 'pdf', lambda: self._export_rubric_table_pdf(rubric),
+            size_hint=_rubric_size(rubric), request=request
+        )
+
+    def _export_rubric_table_pdf(self, rubric):
         try:
             from reportlab.lib.pagesizes import letter, A4
             from reportlab.lib import colors
@@ -5248,10 +5334,17 @@ class SavedRubricViewSet(viewsets.ModelViewSet):
             'alignment_score': rubric.alignment_score,
         }
         
+        # Keyed apart from export_pdf, which renders a different layout
         if export_format == 'pdf':
-            return _export_rubric_as_pdf(rubric_data)
+            return export_cache.respond(
+                rubric, 'export-pdf', lambda: _export_rubric_as_pdf(rubric_data),
+                size_hint=_rubric_size(rubric), request=request
+            )
         elif export_format == 'docx':
-            return _export_rubric_as_docx(rubric_data)
+            return export_cache.respond(
+                rubric, 'export-docx', lambda: _export_rubric_as_docx(rubric_data),
+                size_hint=_rubric_size(rubric), request=request
+            )
         else:  # txt
             # Generate text content
             text_content = f"{rubric.title}\n"
@@ -5287,6 +5380,19 @@ class SavedRubricViewSet(viewsets.ModelViewSet):
 
 
 
+def _lesson_plan_size(plan):
+    """Approximate rendered content size of a lesson plan, in characters."""
+    return len(json.dumps([
+        plan.objectives, plan.essential_questions, plan.materials, plan.five_e_sequence,
+        plan.assessment_plan, plan.differentiation_strategies, plan.homework, plan.reflection_prompts,
+    ], default=str))
+
+
+def _rubric_size(rubric):
+    """Approximate rendered content size of a rubric, in characters."""
+    return len(json.dumps([rubric.learning_objectives, rubric.criteria], default=str))
+
+
 def _export_lesson_as_pdf(lesson):
     """Helper function to export lesson as PDF"""
     try:
@@ -5512,9 +5618,13 @@ class SavedLessonViewSet(viewsets.ModelViewSet):
         export_format = request.query_params.get('format', 'pdf').lower()
         
         if export_format == 'pdf':
-            return _export_lesson_as_pdf(lesson)
+            return export_cache.respond(
+                lesson, 'pdf', lambda: _export_lesson_as_pdf(lesson), size_hint=len(lesson.content or '')
+            )
         elif export_format == 'docx':
-            return _export_lesson_as_docx(lesson)
+            return export_cache.respond(
+                lesson, 'docx', lambda: _export_lesson_as_docx(lesson), size_hint=len(lesson.content or '')
+            )
         else:
             return _export_lesson_as_txt(lesson)
 
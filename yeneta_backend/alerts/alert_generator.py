@@ -3,13 +3,85 @@ Alert Generation Service for Smart Alerts
 Monitors student interactions and generates alerts based on patterns and triggers.
 """
 import logging
-from typing import Dict, List, Optional
+import re
+from typing import Dict, Iterable, List, Optional, Set
 from django.utils import timezone
 from .models import SmartAlert
 
 logger = logging.getLogger(__name__)
 
 
+class KeywordMatcher:
+    """
+    Finds every keyword of every category in one pass over a message.
+
+    All keywords are compiled into a single regex shaped like a trie
+    (shared prefixes are factored out), inside a lookahead so overlapping
+    hits ("don't understand" and "understand") are all found. The cost per
+    message depends on its length, not on how many keywords are listed, so
+    adding languages does not slow scoring down. Keywords match whole words;
+    a trailing ``*`` makes a keyword a stem that also matches longer words
+    (``abus*`` matches "abused", "abusive").
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Iterable[str]]):
+        """
+        Args:
+            keyword_sets: Mapping of category name to its keywords
+        """
+        self._categories: Dict[str, Set[str]] = {}
+        trie: Dict = {}
+        for category, keywords in keyword_sets.items():
+            for keyword in keywords:
+                keyword = self.normalize(keyword.strip())
+                stem = keyword.endswith('*')
+                keyword = keyword.rstrip('*')
+                if not keyword:
+                    continue
+                self._categories.setdefault(keyword, set()).add(category)
+                node = trie
+                for char in keyword:
+                    node = node.setdefault(char, {})
+                # A stem wins over the whole word when both are listed
+                node[''] = node.get('', False) or stem
+
+        self._pattern = re.compile(r'(?<!\w)(?=(' + self._trie_pattern(trie) + '))') if trie else None
+
+    @staticmethod
+    def _trie_pattern(node: Dict) -> str:
+        """Regex for a trie node, preferring the longest keyword."""
+        branches = [
+            re.escape(char) + KeywordMatcher._trie_pattern(child)
+            for char, child in sorted(node.items()) if char != ''
+        ]
+        if '' in node:
+            branches.append('' if node[''] else r'(?!\w)')
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase and fold typographic apostrophes typed on phones."""
+        return text.lower().replace('\u2019', "'").replace('\u02bc', "'")
+
+    def scan(self, message: str) -> Dict[str, Set[str]]:
+        """
+        Distinct keywords found in ``message``, grouped by category.
+
+        Returns:
+            Mapping of category name to the keywords of it that occur
+        """
+        found: Dict[str, Set[str]] = {}
+        if self._pattern is None or not message:
+            return found
+        for match in self._pattern.finditer(self.normalize(message)):
+            keyword = match.group(1)
+            for category in self._categories.get(keyword, ()):
+                found.setdefault(category, set()).add(keyword)
+        return found
+
+
 class AlertGenerator:
     """Service for generating smart alerts from student interactions."""
     
@@ -22,16 +94,69 @@ class AlertGenerator:
     ]
     
     POSITIVE_KEYWORDS = [
-        'understand', 'got it', 'makes sense', 'clear', 'easy',
-        'interesting', 'fun', 'enjoy', 'love', 'excited', 'happy',
+        'understand*', 'got it', 'makes sense', 'clear', 'easy',
+        'interesting', 'fun', 'enjoy*', 'love*', 'excited', 'happy',
         'confident', 'ready', 'prepared', 'thank you', 'helpful'
     ]
     
     EMOTIONAL_DISTRESS_KEYWORDS = [
-        'depressed', 'suicide', 'kill myself', 'hurt myself', 'self-harm',
-        'abuse', 'bullied', 'scared', 'afraid', 'threatened', 'unsafe'
+        'depressed', 'suicid*', 'kill myself', 'hurt myself', 'self-harm*',
+        'abus*', 'bullied', 'scared', 'afraid', 'threaten*', 'unsafe'
     ]
     
+    # Words that make a negative message an academic rather than behavioral alert
+    ACADEMIC_KEYWORDS = ['understand*', 'difficult', 'hard', 'confused']
+    
+    # Keywords of the other languages students write in, by language and
+    # category ('negative', 'positive', 'distress', 'academic'). Stems (``*``)
+    # suit the suffixing Amharic and Afaan Oromo words.
+    LANGUAGE_KEYWORDS = {
+        'am': {
+            'negative': ['አልገባኝም', 'ግራ ገባኝ', 'ከባድ', 'አቃተኝ', 'ፈራሁ', 'አዝኛለሁ', 'ብቸኝነት*', 'እርዱኝ'],
+            'positive': ['ገባኝ', 'ቀላል', 'ደስ ብሎኛል', 'ደስተኛ', 'አመሰግናለሁ'],
+            'distress': ['ራሴን ማጥፋት', 'ራሴን መግደል', 'ራሴን እጎዳለሁ', 'ፈራሁ'],
+            'academic': ['አልገባኝም', 'ከባድ', 'ግራ ገባኝ'],
+        },
+        'om': {
+            'negative': ['hin hubanne', 'hin hubadhu', 'rakkisaa', 'jabaa', 'sodaa*', 'gadd*', 'na gargaaraa'],
+            'positive': ['hubadhe', 'salphaa', 'gammad*', 'galatoomi'],
+            'distress': ['of ajjeesuu', 'of miidhuu', 'sodaa*'],
+            'academic': ['hin hubanne', 'hin hubadhu', 'rakkisaa'],
+        },
+    }
+    
+    _matcher: Optional[KeywordMatcher] = None
+    
+    @classmethod
+    def keyword_matcher(cls) -> KeywordMatcher:
+        """The compiled matcher over every category and language, built once."""
+        if cls._matcher is None:
+            keyword_sets = {
+                'negative': list(cls.NEGATIVE_KEYWORDS),
+                'positive': list(cls.POSITIVE_KEYWORDS),
+                'distress': list(cls.EMOTIONAL_DISTRESS_KEYWORDS),
+                'academic': list(cls.ACADEMIC_KEYWORDS),
+            }
+            for categories in cls.LANGUAGE_KEYWORDS.values():
+                for category, keywords in categories.items():
+                    keyword_sets.setdefault(category, []).extend(keywords)
+            cls._matcher = KeywordMatcher(keyword_sets)
+        return cls._matcher
+    
+    @classmethod
+    def register_keywords(cls, language: str, keyword_sets: Dict[str, List[str]]) -> None:
+        """
+        Add keywords for a language and recompile the matcher.
+        
+        Args:
+            language: Language code, e.g. 'am' or 'om'
+            keyword_sets: Mapping of category to keywords
+        """
+        categories = cls.LANGUAGE_KEYWORDS.setdefault(language, {})
+        for category, keywords in keyword_sets.items():
+            categories.setdefault(category, []).extend(keywords)
+        cls._matcher = None
+    
     @staticmethod
     def analyze_message_sentiment(message: str) -> tuple[str, str, bool]:
         """
@@ -40,20 +165,19 @@ class AlertGenerator:
         Returns:
             tuple: (sentiment, category, requires_immediate_attention)
         """
-        message_lower = message.lower()
+        found = AlertGenerator.keyword_matcher().scan(message)
         
         # Check for emotional distress (highest priority)
-        for keyword in AlertGenerator.EMOTIONAL_DISTRESS_KEYWORDS:
-            if keyword in message_lower:
-                return ('Negative', 'Emotional', True)
+        if found.get('distress'):
+            return ('Negative', 'Emotional', True)
         
         # Count positive and negative indicators
-        negative_count = sum(1 for keyword in AlertGenerator.NEGATIVE_KEYWORDS if keyword in message_lower)
-        positive_count = sum(1 for keyword in AlertGenerator.POSITIVE_KEYWORDS if keyword in message_lower)
+        negative_count = len(found.get('negative', ()))
+        positive_count = len(found.get('positive', ()))
         
         # Determine sentiment
         if negative_count > positive_count and negative_count >= 2:
-            category = 'Academic' if any(word in message_lower for word in ['understand', 'difficult', 'hard', 'confused']) else 'Behavioral'
+            category = 'Academic' if found.get('academic') else 'Behavioral'
             requires_attention = negative_count >= 3
             return ('Negative', category, requires_attention)
         elif positive_count > negative_count:
@@ -0,0 +1,299 @@
+"""
+Background AI analysis of smart alerts.
+
+Alerts used to be analyzed only when a counselor pressed "Analyze", which
+held the request open for a full LLM round trip per alert. New alerts are
+now queued for analysis once their transaction commits. A background worker
+thread drains the queue, critical alerts (distress keywords, immediate
+attention or Critical priority) first, sends several alerts to the LLM in
+one structured request and writes the results back in one transaction.
+Each alert is re-read after the LLM call and updated only if it has not
+changed since, so edits made during the round trip are never overwritten.
+Alerts created before this existed, or left unanalyzed after a failed
+batch, are picked up by ``manage.py analyze_pending_alerts``.
+"""
+import itertools
+import json
+import logging
+import queue
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SmartAlert
+
+logger = logging.getLogger(__name__)
+
+# Queue priorities; lower is analyzed first
+CRITICAL = 0
+NORMAL = 1
+BARRIER = 2
+
+# Closed alerts are not worth an LLM call
+CLOSED_STATUSES = ['Resolved', 'Dismissed']
+
+SEVERITY_ORDER = ['Low', 'Medium', 'High', 'Critical']
+
+# Fields written back by a batch
+ANALYSIS_FIELDS = [
+    'sentiment', 'severity', 'analysis', 'recommended_actions',
+    'requires_immediate_attention', 'suggested_response', 'priority', 'updated_at',
+]
+
+SYSTEM_PROMPT = (
+    "You are an expert educational psychologist analyzing student alerts. "
+    "Provide thoughtful, actionable recommendations."
+)
+
+
+def pending_alerts():
+    """Open alerts that have not been analyzed by the AI yet."""
+    return SmartAlert.objects.filter(
+        Q(sentiment='Unknown') | Q(analysis__isnull=True) | Q(analysis='')
+    ).exclude(status__in=CLOSED_STATUSES)
+
+
+def is_critical(alert: SmartAlert) -> bool:
+    """Whether an alert jumps the analysis queue."""
+    from .alert_generator import AlertGenerator
+
+    if alert.requires_immediate_attention or alert.priority == 'Critical':
+        return True
+    return bool(AlertGenerator.keyword_matcher().scan(alert.message_content or '').get('distress'))
+
+
+class AlertAnalysisService:
+    """Batched LLM analysis of smart alerts."""
+
+    @staticmethod
+    def build_prompt(alerts: List[SmartAlert]) -> str:
+        """One prompt asking for a JSON analysis of every alert in the batch."""
+        blocks = '\n\n'.join(
+            f"Alert ID: {alert.id}\n"
+            f"Student: {alert.student.username}\n"
+            f"Message: {alert.message_content}\n"
+            f"Category: {alert.category}\n"
+            f"Source: {alert.source}"
+            for alert in alerts
+        )
+        return f"""Analyze each of the following {len(alerts)} student alerts independently:
+
+{blocks}
+
+Provide a JSON array with one object per alert:
+[
+    {{
+        "id": <Alert ID>,
+        "sentiment": "Positive/Neutral/Negative",
+        "severity": "Low/Medium/High/Critical",
+        "analysis": "Brief analysis of the situation",
+        "recommendedActions": ["action 1", "action 2"],
+        "requiresImmediateAttention": false,
+        "suggestedResponse": "Suggested response for teacher/admin"
+    }}
+]
+
+Be sensitive, professional, and provide actionable recommendations."""
+
+    @staticmethod
+    def parse_results(content: str) -> Dict[int, Dict]:
+        """
+        Extract per-alert results from the LLM output.
+
+        Returns:
+            Dictionary mapping alert id to its analysis
+        """
+        content = re.sub(r'```(?:json)?', '', content or '')
+        match = re.search(r'\[.*\]', content, re.DOTALL) or re.search(r'\{.*\}', content, re.DOTALL)
+        if not match:
+            return {}
+        try:
+            data = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse batched alert analysis: {e}")
+            return {}
+
+        if isinstance(data, dict):
+            data = data.get('alerts', [data])
+        results = {}
+        for item in data if isinstance(data, list) else []:
+            try:
+                results[int(item['id'])] = item
+            except (KeyError, TypeError, ValueError):
+                continue
+        return results
+
+    @staticmethod
+    def apply_result(alert: SmartAlert, result: Dict) -> None:
+        """
+        Copy one analysis onto an alert without saving it.
+
+        Unlike a counselor-requested analysis, the status is left alone, and
+        the priority and attention flag are only ever raised so a keyword
+        hit is never downgraded by the model.
+        """
+        sentiment = result.get('sentiment')
+        alert.sentiment = sentiment if sentiment in dict(SmartAlert.SENTIMENT_CHOICES) else 'Neutral'
+        severity = result.get('severity')
+        alert.severity = severity if severity in SEVERITY_ORDER else 'Medium'
+        alert.analysis = result.get('analysis') or ''
+        actions = result.get('recommendedActions')
+        alert.recommended_actions = actions if isinstance(actions, list) else []
+        alert.requires_immediate_attention = (
+            alert.requires_immediate_attention or bool(result.get('requiresImmediateAttention'))
+        )
+        alert.suggested_response = result.get('suggestedResponse') or ''
+        current = SEVERITY_ORDER.index(alert.priority) if alert.priority in SEVERITY_ORDER else 0
+        if SEVERITY_ORDER.index(alert.severity) > current:
+            alert.priority = alert.severity
+        alert.updated_at = timezone.now()
+
+    @staticmethod
+    def analyze_batch(alert_ids: Iterable[int], force: bool = False) -> int:
+        """
+        Analyze alerts with one LLM request and save the results in bulk.
+
+        Args:
+            alert_ids: Alerts to analyze
+            force: Re-analyze alerts that already have an analysis
+
+        Returns:
+            Number of alerts updated
+        """
+        from ai_tools.llm import llm_router, LLMRequest, TaskType, TaskComplexity, UserRole
+        from .services import AlertStatisticsService
+
+        alert_ids = list(dict.fromkeys(alert_ids))
+        alerts = SmartAlert.objects.select_related('student').filter(id__in=alert_ids)
+        if not force:
+            alerts = alerts.filter(id__in=pending_alerts().values('id'))
+        alerts = sorted(alerts, key=lambda alert: (not is_critical(alert), alert.created_at))
+        if not alerts:
+            return 0
+
+        llm_request = LLMRequest(
+            prompt=AlertAnalysisService.build_prompt(alerts),
+            user_id=0,  # System request
+            user_role=UserRole.SYSTEM,
+            task_type=TaskType.ALERT_ANALYSIS,
+            complexity=TaskComplexity.ADVANCED,
+            system_prompt=SYSTEM_PROMPT,
+            temperature=0.4,
+            max_tokens=min(600 * len(alerts) + 200, 8000),
+        )
+        response = llm_router.process_request(llm_request)
+        if not response.success:
+            logger.error(f"Batched analysis of {len(alerts)} alert(s) failed: {response.error_message}")
+            return 0
+
+        results = AlertAnalysisService.parse_results(response.content)
+        answered = [alert.id for alert in alerts if alert.id in results]
+        missing = len(alerts) - len(answered)
+        if missing:
+            logger.warning(f"Batched analysis returned no result for {missing} alert(s); they stay pending")
+
+        analyzed = 0
+        with transaction.atomic():
+            # Apply results to the current rows, not the ones read before the LLM call
+            current = SmartAlert.objects.select_for_update().filter(id__in=answered)
+            if not force:
+                current = current.filter(id__in=pending_alerts().values('id'))
+            for alert in current:
+                previous = alert.updated_at
+                AlertAnalysisService.apply_result(alert, results[alert.id])
+                # Skip alerts edited since they were read above
+                analyzed += SmartAlert.objects.filter(id=alert.id, updated_at=previous).update(
+                    **{field: getattr(alert, field) for field in ANALYSIS_FIELDS}
+                )
+
+        if analyzed:
+            # update() sends no post_save, so retire cached statistics here
+            AlertStatisticsService.invalidate('alerts')
+        skipped = len(answered) - analyzed
+        if skipped:
+            logger.info(f"Skipped {skipped} alert(s) analyzed or closed during the request")
+        logger.info(f"Analyzed {analyzed} alert(s) in one request")
+        return analyzed
+
+
+class AlertAnalysisQueue:
+    """Priority queue of alerts analyzed off the request path."""
+
+    def __init__(self, batch_size: Optional[int] = None, batch_window: Optional[float] = None):
+        """
+        Args:
+            batch_size: Maximum alerts sent in one LLM request
+            batch_window: Seconds to wait for more alerts before analyzing
+        """
+        self.batch_size = batch_size or getattr(settings, 'ALERT_ANALYSIS_BATCH_SIZE', 8)
+        self.batch_window = batch_window if batch_window is not None else getattr(
+            settings, 'ALERT_ANALYSIS_BATCH_WINDOW', 2.0
+        )
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.analyzed = 0
+
+    # Producer API
+
+    def enqueue(self, alert: SmartAlert, force: bool = False) -> None:
+        """Queue ``alert`` for analysis once the current transaction commits."""
+        priority = CRITICAL if is_critical(alert) else NORMAL
+        alert_id = alert.id
+        transaction.on_commit(lambda: self._put((priority, next(self._sequence), alert_id, force)))
+
+    def _put(self, item: Tuple) -> None:
+        self._ensure_worker()
+        self._queue.put(item)
+
+    def flush(self, timeout: float = 60.0) -> None:
+        """Block until every alert queued so far has been analyzed."""
+        done = threading.Event()
+        self._put((BARRIER, next(self._sequence), done, False))
+        done.wait(timeout)
+
+    # Worker
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='alert-analysis', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size and batch[-1][0] != BARRIER:
+                    batch.append(self._queue.get(timeout=self.batch_window))
+            except queue.Empty:
+                pass
+
+            barriers = [item[2] for item in batch if item[0] == BARRIER]
+            items = [item for item in batch if item[0] != BARRIER]
+            try:
+                forced = [alert_id for _, _, alert_id, force in items if force]
+                regular = [alert_id for _, _, alert_id, force in items if not force]
+                if forced:
+                    self.analyzed += AlertAnalysisService.analyze_batch(forced, force=True)
+                if regular:
+                    self.analyzed += AlertAnalysisService.analyze_batch(regular)
+            except Exception as e:
+                logger.error(f"Background analysis failed for {len(items)} alert(s): {e}")
+            finally:
+                close_old_connections()
+                for barrier in barriers:
+                    barrier.set()
+
+
+alert_analysis_queue = AlertAnalysisQueue()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from alerts.analysis_queue import AlertAnalysisService, is_critical, pending_alerts
+
+
+class Command(BaseCommand):
+    help = 'Analyze open smart alerts that have no AI analysis yet, critical ones first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=8, help='Alerts sent in one LLM request')
+        parser.add_argument('--limit', type=int, default=None, help='Analyze at most this many alerts')
+
+    def handle(self, *args, **options):
+        alerts = list(pending_alerts().only(
+            'id', 'message_content', 'priority', 'requires_immediate_attention', 'created_at'
+        ))
+        alerts.sort(key=lambda alert: (not is_critical(alert), alert.created_at))
+        if options['limit'] is not None:
+            alerts = alerts[:options['limit']]
+
+        if not alerts:
+            self.stdout.write('No pending alerts.')
+            return
+
+        self.stdout.write(f'Analyzing {len(alerts)} pending alert(s)...')
+        batch_size = max(1, options['batch_size'])
+        analyzed = 0
+        for start in range(0, len(alerts), batch_size):
+            batch = [alert.id for alert in alerts[start:start + batch_size]]
+            analyzed += AlertAnalysisService.analyze_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Analyzed {analyzed} alert(s); {len(alerts) - analyzed} still pending'
+        ))
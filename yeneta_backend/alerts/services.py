@@ -0,0 +1,156 @@
+"""
+Alert and feedback statistics for the dashboards.
+
+Every dashboard refresh used to run one COUNT per status, priority,
+sentiment, category and assignment bucket. Statistics are now folded from a
+single grouped aggregate (one row per combination of the counted fields and
+assignee) and cached briefly per role: Admins and Teachers share one entry
+per role, since "assigned to me" is picked out of the cached rows. Requests
+filtered with ``assigned_to_me``, and Parents and Students, who see
+different alerts, get an entry per user. Saving or deleting an
+alert or feedback bumps a version in the shared cache, which retires every
+cached entry at once.
+"""
+
+import hashlib
+import logging
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached statistics entry is served; bounds staleness after writes
+# that bypass model signals (QuerySet.update, cascades)
+STATS_CACHE_TIMEOUT = 60
+
+
+class AlertStatisticsService:
+    """Service computing and caching alert/feedback statistics."""
+
+    VERSION_KEY = 'alert_stats_version:{kind}'
+
+    # Fields broken down in each statistics response
+    ALERT_FIELDS = ('status', 'priority', 'sentiment', 'category')
+    FEEDBACK_FIELDS = ('status', 'priority', 'category')
+
+    @staticmethod
+    def _version(kind: str) -> int:
+        key = AlertStatisticsService.VERSION_KEY.format(kind=kind)
+        version = cache.get(key)
+        if version is None:
+            # Time based, so an evicted version never repeats an older one
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def invalidate(kind: str) -> None:
+        """Retire every cached statistics entry of ``kind`` ('alerts' or 'feedback')."""
+        key = AlertStatisticsService.VERSION_KEY.format(kind=kind)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+
+    @staticmethod
+    def _grouped_rows(queryset, fields: Sequence[str]) -> List[tuple]:
+        """One aggregate query: a count per combination of ``fields`` and assignee."""
+        return list(
+            queryset.order_by()
+            .values_list(*fields, 'assigned_to_id')
+            .annotate(count=Count('id'))
+        )
+
+    @staticmethod
+    def _cached_rows(kind: str, request, queryset, fields: Sequence[str]) -> List[tuple]:
+        """Grouped rows for the request's role and filters, from the cache when fresh."""
+        user = request.user
+        # Admins and Teachers see the same alerts unless filtered to their own
+        # assignments; everyone else only their own
+        shared = user.role in ['Admin', 'Teacher'] and request.query_params.get('assigned_to_me') != 'true'
+        audience = user.role if shared else f'{user.role}:{user.id}'
+        params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.items()))
+        digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+        cache_key = f'{kind}_stats:{audience}:{digest}:v{AlertStatisticsService._version(kind)}'
+
+        rows = cache.get(cache_key)
+        if rows is None:
+            rows = AlertStatisticsService._grouped_rows(queryset, fields)
+            cache.set(cache_key, rows, STATS_CACHE_TIMEOUT)
+        return rows
+
+    @staticmethod
+    def _fold(rows: List[tuple], fields: Sequence[str], user) -> Tuple[Dict, Dict]:
+        """
+        Turn grouped rows into totals and per-field breakdowns.
+
+        Returns:
+            ({'total', 'unassigned', 'assigned_to_me'}, {field: {value: count}})
+        """
+        breakdowns = {field: {} for field in fields}
+        stats = {'total': 0, 'unassigned': 0, 'assigned_to_me': 0}
+
+        for row in rows:
+            *values, assigned_to_id, count = row
+            stats['total'] += count
+            for field, value in zip(fields, values):
+                breakdowns[field][value] = breakdowns[field].get(value, 0) + count
+            if assigned_to_id is None:
+                stats['unassigned'] += count
+            elif assigned_to_id == user.id:
+                stats['assigned_to_me'] += count
+
+        if user.role not in ['Admin', 'Teacher']:
+            stats['assigned_to_me'] = 0
+
+        # Same key order as the GROUP BY results the endpoints used to return
+        return stats, {field: dict(sorted(counts.items())) for field, counts in breakdowns.items()}
+
+    @staticmethod
+    def alert_statistics(request, queryset) -> Dict:
+        """
+        Statistics of the alerts in ``queryset`` as seen by the requesting user.
+
+        Args:
+            request: Request whose user and query parameters built ``queryset``
+            queryset: Role- and filter-restricted SmartAlert queryset
+        """
+        fields = AlertStatisticsService.ALERT_FIELDS + ('requires_immediate_attention',)
+        rows = AlertStatisticsService._cached_rows('alerts', request, queryset, fields)
+        totals, breakdowns = AlertStatisticsService._fold(rows, fields, request.user)
+
+        return {
+            'total': totals['total'],
+            'by_status': breakdowns['status'],
+            'by_priority': breakdowns['priority'],
+            'by_sentiment': breakdowns['sentiment'],
+            'by_category': breakdowns['category'],
+            'requires_attention': breakdowns['requires_immediate_attention'].get(True, 0),
+            'unassigned': totals['unassigned'],
+            'assigned_to_me': totals['assigned_to_me'],
+        }
+
+    @staticmethod
+    def feedback_statistics(request, queryset) -> Dict:
+        """
+        Statistics of the feedback in ``queryset`` as seen by the requesting user.
+
+        Args:
+            request: Request whose user and query parameters built ``queryset``
+            queryset: Role- and filter-restricted StudentFeedback queryset
+        """
+        fields = AlertStatisticsService.FEEDBACK_FIELDS
+        rows = AlertStatisticsService._cached_rows('feedback', request, queryset, fields)
+        totals, breakdowns = AlertStatisticsService._fold(rows, fields, request.user)
+
+        return {
+            'total': totals['total'],
+            'by_status': breakdowns['status'],
+            'by_priority': breakdowns['priority'],
+            'by_category': breakdowns['category'],
+            'unassigned': totals['unassigned'],
+            'assigned_to_me': totals['assigned_to_me'],
+        }
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SmartAlert, StudentFeedback
+from .services import AlertStatisticsService
+from .analysis_queue import alert_analysis_queue
+
+
+@receiver(post_save, sender=SmartAlert)
+@receiver(post_delete, sender=SmartAlert)
+def alert_changed_handler(sender, instance, **kwargs):
+    """Cached alert statistics no longer match once an alert is written."""
+    AlertStatisticsService.invalidate('alerts')
+
+
+@receiver(post_save, sender=SmartAlert)
+def alert_created_handler(sender, instance, created, **kwargs):
+    """Queue new alerts for AI analysis so counselors open them analyzed."""
+    if created and not instance.analysis and getattr(settings, 'ALERT_AUTO_ANALYSIS', False):
+        alert_analysis_queue.enqueue(instance)
+
+
+@receiver(post_save, sender=StudentFeedback)
+@receiver(post_delete, sender=StudentFeedback)
+def feedback_changed_handler(sender, instance, **kwargs):
+    """Cached feedback statistics no longer match once feedback is written."""
+    AlertStatisticsService.invalidate('feedback')
@@ -2,18 +2,19 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Count
 from django.utils import timezone
+from yeneta_backend.pagination import CursorPaginatedListMixin
 from .models import SmartAlert, StudentFeedback
 from .serializers import SmartAlertSerializer, StudentFeedbackSerializer
 
 
-class SmartAlertViewSet(viewsets.ModelViewSet):
+class SmartAlertViewSet(CursorPaginatedListMixin, viewsets.ModelViewSet):
     """ViewSet for managing smart alerts."""
     
     queryset = SmartAlert.objects.all()
     serializer_class = SmartAlertSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         queryset = SmartAlert.objects.select_related('student', 'assigned_to')
@@ -106,7 +107,14 @@ class SmartAlertViewSet(viewsets.ModelViewSet):
                 {'error': 'Alert has already been analyzed. Use force_reanalysis=true to re-analyze.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+
+        # Queue for the background analyzer instead of waiting on the LLM
+        if request.data.get('background'):
+            from .analysis_queue import alert_analysis_queue
+            alert_analysis_queue.enqueue(alert, force=bool(request.data.get('force_reanalysis')))
+            serializer = self.get_serializer(alert)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
         # Import here to avoid circular imports
         from ai_tools.llm import llm_router, LLMRequest, TaskType, TaskComplexity, UserRole
         import json
@@ -281,20 +289,8 @@ Be sensitive, professional, and provide actionable recommendations."""
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get alert statistics."""
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total': queryset.count(),
-            'by_status': dict(queryset.values_list('status').annotate(count=Count('id'))),
-            'by_priority': dict(queryset.values_list('priority').annotate(count=Count('id'))),
-            'by_sentiment': dict(queryset.values_list('sentiment').annotate(count=Count('id'))),
-            'by_category': dict(queryset.values_list('category').annotate(count=Count('id'))),
-            'requires_attention': queryset.filter(requires_immediate_attention=True).count(),
-            'unassigned': queryset.filter(assigned_to__isnull=True).count(),
-            'assigned_to_me': queryset.filter(assigned_to=request.user).count() if request.user.role in ['Admin', 'Teacher'] else 0,
-        }
-        
-        return Response(stats)
+        from .services import AlertStatisticsService
+        return Response(AlertStatisticsService.alert_statistics(request, self.get_queryset()))
 
 
 class StudentFeedbackViewSet(viewsets.ModelViewSet):
@@ -367,15 +363,5 @@ class StudentFeedbackViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get feedback statistics."""
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total': queryset.count(),
-            'by_status': dict(queryset.values_list('status').annotate(count=Count('id')).values_list('status', 'count')),
-            'by_priority': dict(queryset.values_list('priority').annotate(count=Count('id')).values_list('priority', 'count')),
-            'by_category': dict(queryset.values_list('category').annotate(count=Count('id')).values_list('category', 'count')),
-            'unassigned': queryset.filter(assigned_to__isnull=True).count(),
-            'assigned_to_me': queryset.filter(assigned_to=request.user).count() if request.user.role in ['Admin', 'Teacher'] else 0,
-        }
-        
-        return Response(stats)
+        from .services import AlertStatisticsService
+        return Response(AlertStatisticsService.feedback_statistics(request, self.get_queryset()))
@@ -126,6 +126,10 @@ class EngagementSession(models.Model):
             self.calculate_metrics()
             self.save()
 
+            # Fold the finished session into the materialized daily rollups
+            from .engagement_service import EngagementService
+            EngagementService.refresh_rollups_for_session(self)
+
 
 class EngagementSnapshot(models.Model):
     """Model for storing individual engagement detection snapshots."""
@@ -207,3 +211,48 @@ class EngagementSummary(models.Model):
         if self.hour is not None:
             return f"Summary for {self.date} {self.hour}:00"
         return f"Summary for {self.date}"
+
+
+class StudentEngagementSummary(models.Model):
+    """Materialized per-student, per-subject daily engagement rollup."""
+    
+    student = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='engagement_summaries',
+        limit_choices_to={'role': 'Student'}
+    )
+    date = models.DateField()
+    subject = models.CharField(max_length=100, blank=True, default='')
+    
+    total_sessions = models.IntegerField(default=0)
+    total_duration_seconds = models.IntegerField(default=0)
+    total_detections = models.IntegerField(default=0)
+    
+    # Expression distribution (summed counts across the day's sessions)
+    happy_count = models.IntegerField(default=0)
+    neutral_count = models.IntegerField(default=0)
+    sad_count = models.IntegerField(default=0)
+    angry_count = models.IntegerField(default=0)
+    fearful_count = models.IntegerField(default=0)
+    disgusted_count = models.IntegerField(default=0)
+    surprised_count = models.IntegerField(default=0)
+    unknown_count = models.IntegerField(default=0)
+    
+    average_engagement_score = models.FloatField(default=0.0)
+    attention_required_percentage = models.FloatField(default=0.0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'student_engagement_summaries'
+        ordering = ['-date', 'subject']
+        unique_together = ['student', 'date', 'subject']
+        indexes = [
+            models.Index(fields=['student', '-date']),
+            models.Index(fields=['-date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.subject or 'General'} on {self.date}"
@@ -5,12 +5,18 @@ Handles business logic for tracking and analyzing student engagement
 import logging
 from typing import Dict, List, Optional
 from django.utils import timezone
-from django.db.models import Avg, Sum, Count, Q
+from django.db import transaction
+from django.db.models import Avg, Sum, Count, Q, Value
+from django.db.models.functions import Coalesce, TruncDate
 from datetime import datetime, timedelta
-from .engagement_models import EngagementSession, EngagementSnapshot, EngagementSummary
+from .engagement_models import (
+    EngagementSession, EngagementSnapshot, EngagementSummary, StudentEngagementSummary
+)
 
 logger = logging.getLogger(__name__)
 
+EXPRESSIONS = ['happy', 'neutral', 'sad', 'angry', 'fearful', 'disgusted', 'surprised', 'unknown']
+
 
 class EngagementService:
     """Service for managing engagement monitoring data."""
@@ -181,7 +187,11 @@ class EngagementService:
             Dict with session statistics
         """
         session.calculate_metrics()
-        
+        return EngagementService._session_statistics(session)
+    
+    @staticmethod
+    def _session_statistics(session: EngagementSession) -> Dict:
+        """Build the statistics dict from a session's stored metrics."""
         return {
             'session_id': session.id,
             'student': session.student.username,
@@ -189,19 +199,69 @@ class EngagementService:
             'engagement_score': session.engagement_score,
             'dominant_expression': session.dominant_expression,
             'expression_distribution': {
-                'happy': session.happy_count,
-                'neutral': session.neutral_count,
-                'sad': session.sad_count,
-                'angry': session.angry_count,
-                'fearful': session.fearful_count,
-                'disgusted': session.disgusted_count,
-                'surprised': session.surprised_count,
-                'unknown': session.unknown_count
+                expression: getattr(session, f'{expression}_count') for expression in EXPRESSIONS
             },
             'attention_percentage': session.attention_percentage,
             'person_detected_percentage': session.person_detected_percentage
         }
     
+    @staticmethod
+    def _rollup_aggregates(include_students: bool = True) -> Dict:
+        """
+        Aggregate expressions that compute every daily metric in one query.
+        
+        Args:
+            include_students: Whether to count distinct students
+        
+        Returns:
+            Dict of aggregate name -> expression
+        """
+        aggregates = {
+            'total_sessions': Count('id'),
+            'total_duration': Sum('duration_seconds'),
+            'total_detections': Sum('total_detections'),
+            'avg_engagement_score': Avg('engagement_score'),
+            'avg_attention_percentage': Avg('attention_percentage'),
+        }
+        if include_students:
+            aggregates['total_students'] = Count('student', distinct=True)
+        for expression in EXPRESSIONS:
+            aggregates[f'{expression}_sum'] = Sum(f'{expression}_count')
+        return aggregates
+    
+    @staticmethod
+    def _daily_summary_values(row: Dict) -> Dict:
+        """Map one aggregate row onto EngagementSummary field values."""
+        total_sessions = row['total_sessions'] or 0
+        total_duration = row['total_duration'] or 0
+        total_detections = row['total_detections'] or 1
+        
+        values = {
+            'total_sessions': total_sessions,
+            'total_students': row['total_students'] or 0,
+            'total_duration_seconds': total_duration,
+            'average_duration_seconds': total_duration // total_sessions if total_sessions > 0 else 0,
+            'average_engagement_score': row['avg_engagement_score'] or 0,
+            'attention_required_percentage': row['avg_attention_percentage'] or 0,
+        }
+        for expression in EXPRESSIONS:
+            values[f'{expression}_percentage'] = ((row[f'{expression}_sum'] or 0) / total_detections) * 100
+        return values
+    
+    @staticmethod
+    def _student_summary_values(row: Dict) -> Dict:
+        """Map one aggregate row onto StudentEngagementSummary field values."""
+        values = {
+            'total_sessions': row['total_sessions'] or 0,
+            'total_duration_seconds': row['total_duration'] or 0,
+            'total_detections': row['total_detections'] or 0,
+            'average_engagement_score': row['avg_engagement_score'] or 0,
+            'attention_required_percentage': row['avg_attention_percentage'] or 0,
+        }
+        for expression in EXPRESSIONS:
+            values[f'{expression}_count'] = row[f'{expression}_sum'] or 0
+        return values
+    
     @staticmethod
     def generate_daily_summary(date: datetime.date = None) -> EngagementSummary:
         """
@@ -216,95 +276,214 @@ class EngagementService:
         if date is None:
             date = timezone.now().date()
         
-        # Get all sessions for the date
-        sessions = EngagementSession.objects.filter(
+        # Only completed sessions contribute to the rollup
+        row = EngagementSession.objects.filter(
             started_at__date=date,
-            is_active=False  # Only completed sessions
-        )
+            is_active=False
+        ).aggregate(**EngagementService._rollup_aggregates())
         
-        if not sessions.exists():
+        if not row['total_sessions']:
             logger.info(f"No sessions found for {date}")
             return None
         
-        # Calculate aggregates
-        total_sessions = sessions.count()
-        total_students = sessions.values('student').distinct().count()
-        total_duration = sessions.aggregate(Sum('duration_seconds'))['duration_seconds__sum'] or 0
-        avg_duration = total_duration // total_sessions if total_sessions > 0 else 0
-        
-        # Calculate expression percentages
-        total_detections = sessions.aggregate(Sum('total_detections'))['total_detections__sum'] or 1
-        
-        expression_sums = {
-            'happy': sessions.aggregate(Sum('happy_count'))['happy_count__sum'] or 0,
-            'neutral': sessions.aggregate(Sum('neutral_count'))['neutral_count__sum'] or 0,
-            'sad': sessions.aggregate(Sum('sad_count'))['sad_count__sum'] or 0,
-            'angry': sessions.aggregate(Sum('angry_count'))['angry_count__sum'] or 0,
-            'fearful': sessions.aggregate(Sum('fearful_count'))['fearful_count__sum'] or 0,
-            'disgusted': sessions.aggregate(Sum('disgusted_count'))['disgusted_count__sum'] or 0,
-            'surprised': sessions.aggregate(Sum('surprised_count'))['surprised_count__sum'] or 0,
-            'unknown': sessions.aggregate(Sum('unknown_count'))['unknown_count__sum'] or 0,
-        }
-        
-        # Calculate averages
-        avg_engagement_score = sessions.aggregate(Avg('engagement_score'))['engagement_score__avg'] or 0
-        avg_attention_percentage = sessions.aggregate(Avg('attention_percentage'))['attention_percentage__avg'] or 0
-        
-        # Create or update summary
         summary, created = EngagementSummary.objects.update_or_create(
             date=date,
             hour=None,  # Daily summary
-            defaults={
-                'total_sessions': total_sessions,
-                'total_students': total_students,
-                'total_duration_seconds': total_duration,
-                'average_duration_seconds': avg_duration,
-                'happy_percentage': (expression_sums['happy'] / total_detections) * 100,
-                'neutral_percentage': (expression_sums['neutral'] / total_detections) * 100,
-                'sad_percentage': (expression_sums['sad'] / total_detections) * 100,
-                'angry_percentage': (expression_sums['angry'] / total_detections) * 100,
-                'fearful_percentage': (expression_sums['fearful'] / total_detections) * 100,
-                'disgusted_percentage': (expression_sums['disgusted'] / total_detections) * 100,
-                'surprised_percentage': (expression_sums['surprised'] / total_detections) * 100,
-                'unknown_percentage': (expression_sums['unknown'] / total_detections) * 100,
-                'average_engagement_score': avg_engagement_score,
-                'attention_required_percentage': avg_attention_percentage
-            }
+            defaults=EngagementService._daily_summary_values(row)
         )
         
         logger.info(f"{'Created' if created else 'Updated'} daily summary for {date}")
         return summary
     
     @staticmethod
-    def get_student_engagement_history(student, days: int = 7) -> List[Dict]:
+    def generate_student_summary(student, date: datetime.date, subject: Optional[str] = None) -> Optional[StudentEngagementSummary]:
+        """
+        Generate the per-student, per-subject summary for a single day.
+        
+        Args:
+            student: User object (student)
+            date: Date to summarize
+            subject: Subject of the sessions (blank for unspecified)
+        
+        Returns:
+            StudentEngagementSummary object, or None if no sessions remain
+        """
+        subject = subject or ''
+        sessions = EngagementSession.objects.filter(
+            student=student,
+            started_at__date=date,
+            is_active=False
+        )
+        if subject:
+            sessions = sessions.filter(subject=subject)
+        else:
+            sessions = sessions.filter(Q(subject__isnull=True) | Q(subject=''))
+        
+        row = sessions.aggregate(**EngagementService._rollup_aggregates(include_students=False))
+        
+        if not row['total_sessions']:
+            StudentEngagementSummary.objects.filter(student=student, date=date, subject=subject).delete()
+            return None
+        
+        summary, _ = StudentEngagementSummary.objects.update_or_create(
+            student=student,
+            date=date,
+            subject=subject,
+            defaults=EngagementService._student_summary_values(row)
+        )
+        return summary
+    
+    @staticmethod
+    def refresh_rollups_for_session(session: EngagementSession) -> None:
+        """
+        Incrementally refresh the rollups touched by a finished session.
+        
+        Only the session's day and its (student, subject, day) row are
+        recomputed, each with a single aggregate query.
+        
+        Args:
+            session: EngagementSession object that has just ended
+        """
+        try:
+            date = timezone.localtime(session.started_at).date()
+            EngagementService.generate_daily_summary(date)
+            EngagementService.generate_student_summary(session.student, date, session.subject)
+        except Exception as e:
+            logger.error(f"Failed to refresh engagement rollups for session #{session.id}: {e}")
+    
+    @staticmethod
+    def backfill_summaries(start_date: datetime.date, end_date: datetime.date = None, force: bool = False) -> int:
+        """
+        Materialize daily and per-student summaries for a date range in bulk.
+        
+        Each table is checked separately: a day is skipped for the daily
+        summaries if it has one, and for the per-student summaries if it has
+        any, unless ``force`` is set. Missing days are computed with one
+        grouped query per table and written with ``bulk_create``.
+        
+        Args:
+            start_date: First day to materialize (inclusive)
+            end_date: Last day to materialize (inclusive, defaults to today)
+            force: Recompute days that already have a summary
+        
+        Returns:
+            Number of days materialized
+        """
+        if end_date is None:
+            end_date = timezone.now().date()
+        
+        sessions = EngagementSession.objects.filter(
+            started_at__date__gte=start_date,
+            started_at__date__lte=end_date,
+            is_active=False
+        ).annotate(day=TruncDate('started_at'))
+        
+        session_days = set(sessions.values_list('day', flat=True).distinct())
+        daily_days = set(session_days)
+        student_days = set(session_days)
+        if not force:
+            # Days rolled up before per-student summaries existed only have
+            # the daily row, so each table gets its own missing days
+            daily_days -= set(EngagementSummary.objects.filter(
+                date__in=session_days,
+                hour__isnull=True
+            ).values_list('date', flat=True))
+            student_days -= set(StudentEngagementSummary.objects.filter(
+                date__in=session_days
+            ).values_list('date', flat=True).distinct())
+        
+        if not daily_days and not student_days:
+            return 0
+        
+        daily_rows = sessions.filter(day__in=daily_days).values('day').annotate(
+            **EngagementService._rollup_aggregates()
+        )
+        student_rows = sessions.filter(day__in=student_days).annotate(
+            subject_key=Coalesce('subject', Value(''))
+        ).values('day', 'student_id', 'subject_key').annotate(
+            **EngagementService._rollup_aggregates(include_students=False)
+        )
+        
+        with transaction.atomic():
+            EngagementSummary.objects.filter(date__in=daily_days, hour__isnull=True).delete()
+            StudentEngagementSummary.objects.filter(date__in=student_days).delete()
+            
+            EngagementSummary.objects.bulk_create([
+                EngagementSummary(date=row['day'], hour=None, **EngagementService._daily_summary_values(row))
+                for row in daily_rows
+            ])
+            StudentEngagementSummary.objects.bulk_create([
+                StudentEngagementSummary(
+                    student_id=row['student_id'],
+                    date=row['day'],
+                    subject=row['subject_key'],
+                    **EngagementService._student_summary_values(row)
+                )
+                for row in student_rows
+            ], batch_size=500)
+        
+        materialized = len(daily_days | student_days)
+        logger.info(f"Materialized engagement summaries for {materialized} day(s)")
+        return materialized
+    
+    @staticmethod
+    def get_student_engagement_history(student, days: int = 7, group_by: Optional[str] = None) -> List[Dict]:
         """
         Get engagement history for a student.
         
+        Completed sessions already carry their final metrics (computed in
+        ``end_session``), so they are read as-is instead of being
+        recalculated. With ``group_by='day'`` the history is served from the
+        materialized per-student, per-subject daily summaries, kept current
+        as sessions end and by ``manage.py materialize_engagement_summaries``.
+        
         Args:
             student: User object
             days: Number of days to look back
+            group_by: None for per-session history, 'day' for daily rollups
         
         Returns:
-            List of session summaries
+            List of session summaries or daily rollups
         """
+        if group_by == 'day':
+            start_date = timezone.now().date() - timedelta(days=days)
+            summaries = StudentEngagementSummary.objects.filter(
+                student=student,
+                date__gte=start_date
+            ).order_by('-date', 'subject')
+            
+            return [
+                {
+                    'date': summary.date.isoformat(),
+                    'subject': summary.subject,
+                    'total_sessions': summary.total_sessions,
+                    'duration_minutes': summary.total_duration_seconds / 60,
+                    'engagement_score': summary.average_engagement_score,
+                    'attention_percentage': summary.attention_required_percentage,
+                    'expression_distribution': {
+                        expression: getattr(summary, f'{expression}_count') for expression in EXPRESSIONS
+                    },
+                }
+                for summary in summaries
+            ]
+        
         start_date = timezone.now() - timedelta(days=days)
         sessions = EngagementSession.objects.filter(
             student=student,
             started_at__gte=start_date,
             is_active=False
-        ).order_by('-started_at')
+        ).select_related('student').order_by('-started_at')
         
-        history = []
-        for session in sessions:
-            history.append(EngagementService.get_session_statistics(session))
-        
-        return history
+        return [EngagementService._session_statistics(session) for session in sessions]
     
     @staticmethod
     def get_engagement_trends(days: int = 7) -> List[Dict]:
         """
         Get engagement trends over time.
         
+        Reads the materialized daily summaries, kept current as sessions end
+        and by ``manage.py materialize_engagement_summaries``.
+        
         Args:
             days: Number of days to look back
         
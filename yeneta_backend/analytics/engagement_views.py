@@ -17,16 +17,18 @@ from .engagement_serializers import (
     EngagementSummarySerializer
 )
 from .engagement_service import EngagementService
+from yeneta_backend.pagination import CursorPaginatedListMixin
 
 logger = logging.getLogger(__name__)
 
 
-class EngagementSessionViewSet(viewsets.ModelViewSet):
+class EngagementSessionViewSet(CursorPaginatedListMixin, viewsets.ModelViewSet):
     """ViewSet for managing engagement sessions."""
     
     queryset = EngagementSession.objects.all()
     serializer_class = EngagementSessionSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-started_at'
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -159,9 +161,15 @@ def engagement_trends_view_enhanced(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def student_engagement_history_view(request):
-    """Get engagement history for a specific student."""
+    """
+    Get engagement history for a specific student.
+    
+    Pass ``group_by=day`` to get per-day, per-subject rollups from the
+    materialized summaries instead of the per-session list.
+    """
     student_id = request.query_params.get('student_id')
     days = int(request.query_params.get('days', 7))
+    group_by = request.query_params.get('group_by')
     
     if not student_id:
         # If no student_id provided and user is a student, use their own ID
@@ -194,7 +202,7 @@ def student_engagement_history_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    history = EngagementService.get_student_engagement_history(student, days)
+    history = EngagementService.get_student_engagement_history(student, days, group_by)
     return Response(history)
 
 
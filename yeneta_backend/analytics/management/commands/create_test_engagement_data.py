@@ -6,7 +6,7 @@ from django.utils import timezone
 from datetime import timedelta
 import random
 
-from analytics.engagement_models import EngagementSession, EngagementSnapshot
+from analytics.engagement_models import EngagementSession, EngagementSnapshot, EngagementSummary
 from analytics.engagement_service import EngagementService
 from users.models import User
 
@@ -90,12 +90,11 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'\nSuccessfully created {sessions_created} test sessions!'))
         
-        # Generate daily summaries
+        # Generate daily and per-student summaries
         self.stdout.write('\nGenerating daily summaries...')
-        for day in range(7):
-            date = (timezone.now() - timedelta(days=day)).date()
-            summary = EngagementService.generate_daily_summary(date)
-            if summary:
-                self.stdout.write(f"  Summary for {date}: {summary.total_sessions} sessions, avg score: {summary.average_engagement_score:.1f}")
+        start_date = (timezone.now() - timedelta(days=6)).date()
+        EngagementService.backfill_summaries(start_date, force=True)
+        for summary in EngagementSummary.objects.filter(date__gte=start_date, hour__isnull=True).order_by('-date'):
+            self.stdout.write(f"  Summary for {summary.date}: {summary.total_sessions} sessions, avg score: {summary.average_engagement_score:.1f}")
         
         self.stdout.write(self.style.SUCCESS('\nTest engagement data created successfully!'))
@@ -0,0 +1,38 @@
+"""
+Management command to materialize engagement rollups.
+
+Intended to run on a schedule (e.g. nightly cron) so that days whose
+sessions were never folded in incrementally still get summaries.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import datetime, timedelta
+
+from analytics.engagement_service import EngagementService
+
+
+class Command(BaseCommand):
+    help = 'Backfill daily and per-student engagement summaries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Number of days to look back (default: 7)')
+        parser.add_argument('--start', type=str, help='Start date (YYYY-MM-DD), overrides --days')
+        parser.add_argument('--end', type=str, help='End date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--force', action='store_true', help='Recompute days that already have summaries')
+
+    def handle(self, *args, **options):
+        try:
+            if options['start']:
+                start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            else:
+                start_date = timezone.now().date() - timedelta(days=options['days'])
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        days = EngagementService.backfill_summaries(start_date, end_date, force=options['force'])
+
+        if days:
+            self.stdout.write(self.style.SUCCESS(f'Materialized engagement summaries for {days} day(s)'))
+        else:
+            self.stdout.write('Engagement summaries are up to date')
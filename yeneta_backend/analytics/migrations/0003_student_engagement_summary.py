@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('analytics', '0002_engagementsession_engagementsummary_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentEngagementSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('subject', models.CharField(blank=True, default='', max_length=100)),
+                ('total_sessions', models.IntegerField(default=0)),
+                ('total_duration_seconds', models.IntegerField(default=0)),
+                ('total_detections', models.IntegerField(default=0)),
+                ('happy_count', models.IntegerField(default=0)),
+                ('neutral_count', models.IntegerField(default=0)),
+                ('sad_count', models.IntegerField(default=0)),
+                ('angry_count', models.IntegerField(default=0)),
+                ('fearful_count', models.IntegerField(default=0)),
+                ('disgusted_count', models.IntegerField(default=0)),
+                ('surprised_count', models.IntegerField(default=0)),
+                ('unknown_count', models.IntegerField(default=0)),
+                ('average_engagement_score', models.FloatField(default=0.0)),
+                ('attention_required_percentage', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(limit_choices_to={'role': 'Student'}, on_delete=django.db.models.deletion.CASCADE, related_name='engagement_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'student_engagement_summaries',
+                'ordering': ['-date', 'subject'],
+                'indexes': [models.Index(fields=['student', '-date'], name='student_eng_student_397cc3_idx'), models.Index(fields=['-date'], name='student_eng_date_c3786d_idx')],
+                'unique_together': {('student', 'date', 'subject')},
+            },
+        ),
+    ]
@@ -2,7 +2,9 @@ from django.db import models
 from django.conf import settings
 
 # Import engagement monitoring models
-from .engagement_models import EngagementSession, EngagementSnapshot, EngagementSummary
+from .engagement_models import (
+    EngagementSession, EngagementSnapshot, EngagementSummary, StudentEngagementSummary
+)
 
 
 class EngagementTrend(models.Model):
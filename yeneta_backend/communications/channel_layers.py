@@ -0,0 +1,405 @@
+"""
+SQLite-backed channel layer for multi-process deployments without Redis.
+
+``InMemoryChannelLayer`` only reaches sockets held by the same process, so
+notifications sent from a signal in one ASGI worker never arrive at clients
+connected to another. This layer keeps messages and group memberships in a
+shared SQLite file (WAL mode) so every worker on the host sees them.
+
+Delivery is batched in both directions:
+- ``group_send`` / ``group_send_many`` write every recipient's message in a
+  single transaction
+- receivers drain up to ``batch_size`` messages per poll for all of the
+  process-local channels at once and buffer them in memory. The poll runs
+  in its own task, so a receiver cancelled mid-poll (a socket disconnecting)
+  never drops the messages fetched for the other channels
+
+Configure with::
+
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'communications.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {'path': BASE_DIR / 'channel_layer.sqlite3'},
+        },
+    }
+"""
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import string
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    inbox TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_inbox ON channel_messages (inbox, id);
+CREATE INDEX IF NOT EXISTS channel_messages_channel ON channel_messages (channel);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    grp TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    joined REAL NOT NULL,
+    PRIMARY KEY (grp, channel)
+);
+CREATE INDEX IF NOT EXISTS channel_groups_channel ON channel_groups (channel);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """
+    Channel layer that shares messages and groups across processes through
+    a local SQLite database file.
+    """
+
+    extensions = ["groups", "flush"]
+
+    def __init__(
+        self,
+        path=None,
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        poll_interval=0.05,
+        max_poll_interval=0.5,
+        batch_size=100,
+        cleanup_interval=10,
+        **kwargs,
+    ):
+        super().__init__(
+            expiry=expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs,
+        )
+        if path is None:
+            from django.conf import settings
+            path = settings.BASE_DIR / 'channel_layer.sqlite3'
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.batch_size = batch_size
+        self.cleanup_interval = cleanup_interval
+
+        # Every process gets its own inbox for process-local channels
+        self.client_prefix = uuid.uuid4().hex[:12]
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Connections of every thread, so close() can reach worker threads'
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._generation = 0
+        self._buffers: Dict[str, deque] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last_cleanup = 0.0
+
+    # Connection handling
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'generation', None) != self._generation:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._connections_lock:
+                self._connections.append(conn)
+            self._local.conn = conn
+            self._local.generation = self._generation
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    async def _run(self, func, *args):
+        """Run a blocking database call off the event loop."""
+        return await asyncio.to_thread(func, *args)
+
+    def _inbox_for(self, channel: str) -> str:
+        """Process-local channels share their process inbox; others are their own inbox."""
+        if "!" in channel:
+            return self.non_local_name(channel)
+        return channel
+
+    # Blocking primitives
+
+    def _deliver(self, messages: List[Tuple[str, dict]], strict: bool) -> int:
+        """
+        Insert messages for many channels in one transaction.
+
+        Channels at capacity raise ChannelFull when ``strict`` is set (direct
+        sends) and are silently skipped otherwise (group sends).
+        """
+        if not messages:
+            return 0
+        conn = self._connection()
+        now = time.time()
+        channels = list({channel for channel, _ in messages})
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            pending: Dict[str, int] = {}
+            for start in range(0, len(channels), 500):
+                chunk = channels[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f'SELECT channel, COUNT(*) FROM channel_messages '
+                    f'WHERE channel IN ({placeholders}) AND expires >= ? GROUP BY channel',
+                    (*chunk, now),
+                ).fetchall()
+                pending.update(rows)
+
+            rows = []
+            for channel, message in messages:
+                if pending.get(channel, 0) >= self.get_capacity(channel):
+                    if strict:
+                        raise ChannelFull(channel)
+                    continue
+                pending[channel] = pending.get(channel, 0) + 1
+                rows.append((channel, self._inbox_for(channel), now + self.expiry, json.dumps(message)))
+
+            conn.executemany(
+                'INSERT INTO channel_messages (channel, inbox, expires, body) VALUES (?, ?, ?, ?)',
+                rows,
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+    def _fetch(self, inbox: str) -> List[Tuple[str, float, str]]:
+        """Atomically take up to ``batch_size`` pending messages from an inbox."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, channel, expires, body FROM channel_messages '
+                'WHERE inbox = ? ORDER BY id LIMIT ?',
+                (inbox, self.batch_size),
+            ).fetchall()
+            if rows:
+                conn.execute(
+                    f"DELETE FROM channel_messages WHERE id IN ({','.join('?' * len(rows))})",
+                    [row[0] for row in rows],
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return [(channel, expires, body) for _, channel, expires, body in rows]
+
+    def _group_channels(self, groups: Iterable[str]) -> Dict[str, List[str]]:
+        """Return the live members of each group."""
+        conn = self._connection()
+        groups = list(groups)
+        members: Dict[str, List[str]] = {group: [] for group in groups}
+        cutoff = time.time() - self.group_expiry
+        for start in range(0, len(groups), 500):
+            chunk = groups[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for group, channel in conn.execute(
+                f'SELECT grp, channel FROM channel_groups WHERE grp IN ({placeholders}) AND joined >= ?',
+                (*chunk, cutoff),
+            ):
+                members[group].append(channel)
+        return members
+
+    def _execute(self, sql: str, params: tuple = ()):
+        self._connection().execute(sql, params)
+
+    def _clean_expired(self):
+        """
+        Delete expired messages and memberships. A channel whose message
+        expired undelivered is assumed dead and leaves all of its groups.
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'DELETE FROM channel_groups WHERE channel IN '
+                '(SELECT DISTINCT channel FROM channel_messages WHERE expires < ?)',
+                (now,),
+            )
+            conn.execute('DELETE FROM channel_messages WHERE expires < ?', (now,))
+            conn.execute('DELETE FROM channel_groups WHERE joined < ?', (now - self.group_expiry,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        """
+        Send a message onto a (general or specific) channel.
+        """
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        await self._run(self._deliver, [(channel, message)], True)
+
+    async def receive(self, channel):
+        """
+        Receive the first message that arrives on the channel.
+
+        Messages for all process-local channels are drained from the shared
+        inbox in batches and buffered, so one poll serves every socket held
+        by this process.
+        """
+        self.require_valid_channel_name(channel)
+        inbox = self._inbox_for(channel)
+        delay = self.poll_interval
+
+        while True:
+            message = self._pop_buffered(channel)
+            if message is not None:
+                return message
+
+            # One poll per inbox at a time, shared by every waiting receiver.
+            # Shielded: cancelling this receiver must not abandon a batch
+            # that is already deleted from the database.
+            poller = self._pollers.get(inbox)
+            if poller is None:
+                poller = self._pollers[inbox] = asyncio.ensure_future(self._poll(inbox))
+            fetched = await asyncio.shield(poller)
+
+            if fetched:
+                delay = self.poll_interval
+            else:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_poll_interval)
+
+    async def _poll(self, inbox: str) -> int:
+        """Fetch one batch from ``inbox`` into the per-channel buffers."""
+        try:
+            await self._maybe_clean_expired()
+            fetched = await self._run(self._fetch, inbox)
+            for target, expires, body in fetched:
+                self._buffers.setdefault(target, deque()).append((expires, json.loads(body)))
+            return len(fetched)
+        finally:
+            if self._pollers.get(inbox) is asyncio.current_task():
+                del self._pollers[inbox]
+
+    def _pop_buffered(self, channel):
+        buffer = self._buffers.get(channel)
+        now = time.time()
+        while buffer:
+            expires, message = buffer.popleft()
+            if not buffer:
+                self._buffers.pop(channel, None)
+            if expires >= now:
+                return message
+        return None
+
+    async def _maybe_clean_expired(self):
+        now = time.time()
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        await self._run(self._clean_expired)
+        # Drop buffered messages nobody came back for
+        for channel, buffer in list(self._buffers.items()):
+            if buffer and buffer[-1][0] < now:
+                self._buffers.pop(channel, None)
+
+    async def new_channel(self, prefix="specific"):
+        """
+        Returns a new channel name that can be used by something in our
+        process as a specific channel.
+        """
+        return "%s.%s!%s" % (
+            prefix,
+            self.client_prefix,
+            "".join(random.choice(string.ascii_letters) for i in range(12)),
+        )
+
+    # Flush extension
+
+    async def flush(self):
+        self._buffers = {}
+        await self._run(self._execute, 'DELETE FROM channel_messages')
+        await self._run(self._execute, 'DELETE FROM channel_groups')
+
+    async def close(self):
+        # Threads still holding a closed connection open a new one on next use
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        """
+        Adds the channel name to a group.
+        """
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            'INSERT OR REPLACE INTO channel_groups (grp, channel, joined) VALUES (?, ?, ?)',
+            (group, channel, time.time()),
+        )
+
+    async def group_discard(self, group, channel):
+        self.require_valid_channel_name(channel)
+        self.require_valid_group_name(group)
+        await self._run(
+            self._execute,
+            'DELETE FROM channel_groups WHERE grp = ? AND channel = ?',
+            (group, channel),
+        )
+
+    async def group_send(self, group, message):
+        """
+        Send a message to every channel in a group, in one transaction.
+        """
+        await self.group_send_many([(group, message)])
+
+    async def group_send_many(self, group_messages: List[Tuple[str, dict]]) -> int:
+        """
+        Fan out several (group, message) pairs with a single membership
+        lookup and a single write transaction.
+
+        Returns:
+            Number of channel messages written
+        """
+        for group, message in group_messages:
+            assert isinstance(message, dict), "Message is not a dict"
+            self.require_valid_group_name(group)
+
+        def fan_out():
+            members = self._group_channels({group for group, _ in group_messages})
+            deliveries = [
+                (channel, message)
+                for group, message in group_messages
+                for channel in members.get(group, [])
+            ]
+            return self._deliver(deliveries, False)
+
+        return await self._run(fan_out)
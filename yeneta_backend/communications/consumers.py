@@ -9,20 +9,25 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
 
         self.group_name = self.get_user_group_name(self.user)
-
-        # Join room group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        # Admins also get their own group for per-user events (unread counts)
+        self.group_names = [self.group_name]
+        if self.group_name != f'user_{self.user.id}_notifications':
+            self.group_names.append(f'user_{self.user.id}_notifications')
+
+        # Join room groups
+        for group_name in self.group_names:
+            await self.channel_layer.group_add(
+                group_name,
+                self.channel_name
+            )
 
         await self.accept()
 
     async def disconnect(self, close_code):
-        # Leave room group
-        if hasattr(self, 'group_name'):
+        # Leave room groups
+        for group_name in getattr(self, 'group_names', []):
             await self.channel_layer.group_discard(
-                self.group_name,
+                group_name,
                 self.channel_name
             )
 
@@ -0,0 +1,204 @@
+"""
+Materialized contact graph for "Start New Conversation".
+
+The contacts endpoint used to walk FamilyMembership, Enrollment, Course and
+User on every call, listing every active admin, teacher or parent again
+each time the messaging sidebar refreshed. Each user's reachable contact ids
+are now kept in the shared cache, keyed by two versions: the user's own and a
+global one. Relationship changes (enrollments, family memberships) bump the
+versions of the users whose contacts they alter. Changes that can reach
+anyone (users created or (de)activated, role or parent changes, course
+teacher changes) bump the global version. A request then costs one cache
+read and one primary key lookup.
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Set
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('students', 'teachers', 'admins', 'parents')
+
+# Seconds a materialized contact set is kept; versions make it exact before that
+CONTACTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+PARENT_MEMBER_ROLES = ['Parent', 'Guardian']
+STUDENT_MEMBER_ROLES = ['Student', 'Sibling']
+
+
+class ContactGraphService:
+    """Service computing, caching and invalidating users' contact sets."""
+
+    VERSION_KEY = 'contact_graph_version:{scope}'
+
+    # Versions
+
+    @staticmethod
+    def _versions(user_id: int) -> List[int]:
+        keys = [ContactGraphService.VERSION_KEY.format(scope=scope) for scope in ('global', f'user:{user_id}')]
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # Time based, so an evicted version never repeats an older one
+                cache.add(key, int(time.time() * 1000), timeout=None)
+                versions[key] = cache.get(key)
+        return [versions[key] for key in keys]
+
+    @staticmethod
+    def _bump(scopes: Iterable[str]) -> None:
+        for scope in scopes:
+            key = ContactGraphService.VERSION_KEY.format(scope=scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time() * 1000), timeout=None)
+
+    @staticmethod
+    def invalidate_users(user_ids: Iterable[int]) -> None:
+        """Recompute the contacts of ``user_ids`` once the transaction commits."""
+        scopes = [f'user:{user_id}' for user_id in set(user_ids) if user_id]
+        if scopes:
+            transaction.on_commit(lambda: ContactGraphService._bump(scopes))
+
+    @staticmethod
+    def invalidate_all() -> None:
+        """Recompute every user's contacts once the transaction commits."""
+        transaction.on_commit(lambda: ContactGraphService._bump(['global']))
+
+    # Affected users
+
+    @staticmethod
+    def student_dependents(student_ids: Iterable[int]) -> Set[int]:
+        """
+        Users whose contacts depend on the courses of ``student_ids``: the
+        students, their teachers and their direct and family parents.
+        """
+        from academics.models import Course
+        from users.models import FamilyMembership, User
+
+        student_ids = set(student_ids)
+        if not student_ids:
+            return set()
+        affected = set(student_ids)
+        affected.update(Course.objects.filter(
+            enrollments__student_id__in=student_ids
+        ).values_list('teacher_id', flat=True))
+        affected.update(User.objects.filter(id__in=student_ids).values_list('parent_id', flat=True))
+        affected.update(FamilyMembership.objects.filter(
+            family__members__user_id__in=student_ids,
+            role__in=PARENT_MEMBER_ROLES
+        ).values_list('user_id', flat=True))
+        affected.discard(None)
+        return affected
+
+    # Contact sets
+
+    @staticmethod
+    def compute_contact_ids(user) -> Dict[str, List[int]]:
+        """
+        Contacts reachable by ``user``, by category.
+
+        For Parents: their children, teachers of the children's courses, all
+        active admins and all other active parents. Students: teachers of
+        their courses, their parents and siblings (direct parent and family
+        members) and all active admins. Teachers: students of their courses,
+        those students' parents, all other teachers and all admins. Admins:
+        everyone active.
+        """
+        from academics.models import Course, Enrollment
+        from users.models import FamilyMembership, User
+
+        active = User.objects.filter(is_active=True)
+        ids = {category: set() for category in CATEGORIES}
+
+        if user.role == 'Parent':
+            ids['students'] = set(user.children.filter(role='Student', is_active=True).values_list('id', flat=True))
+            ids['teachers'] = set(active.filter(
+                role='Teacher',
+                id__in=Course.objects.filter(enrollments__student_id__in=ids['students']).values('teacher_id')
+            ).values_list('id', flat=True))
+            ids['admins'] = set(active.filter(role='Admin').values_list('id', flat=True))
+            ids['parents'] = set(active.filter(role='Parent').exclude(id=user.id).values_list('id', flat=True))
+
+        elif user.role == 'Student':
+            ids['teachers'] = set(active.filter(
+                role='Teacher',
+                id__in=Course.objects.filter(enrollments__student=user).values('teacher_id')
+            ).values_list('id', flat=True))
+
+            family_members = list(FamilyMembership.objects.filter(
+                family_id__in=FamilyMembership.objects.filter(user=user).values('family_id')
+            ).exclude(user=user).values_list('user_id', 'role'))
+            parent_ids = {member_id for member_id, role in family_members if role in PARENT_MEMBER_ROLES}
+            if user.parent_id:
+                parent_ids.add(user.parent_id)
+            sibling_ids = {member_id for member_id, role in family_members if role in STUDENT_MEMBER_ROLES}
+
+            ids['parents'] = set(active.filter(id__in=parent_ids, role='Parent').values_list('id', flat=True))
+            ids['students'] = set(active.filter(id__in=sibling_ids, role='Student').values_list('id', flat=True))
+            ids['admins'] = set(active.filter(role='Admin').values_list('id', flat=True))
+
+        elif user.role == 'Teacher':
+            ids['students'] = set(active.filter(
+                role='Student',
+                id__in=Enrollment.objects.filter(course__teacher=user).values('student_id')
+            ).values_list('id', flat=True))
+
+            parent_ids = set(User.objects.filter(id__in=ids['students']).values_list('parent_id', flat=True))
+            parent_ids.update(FamilyMembership.objects.filter(
+                family__members__user_id__in=ids['students'],
+                role__in=PARENT_MEMBER_ROLES
+            ).values_list('user_id', flat=True))
+            parent_ids.discard(None)
+
+            ids['parents'] = set(active.filter(id__in=parent_ids, role='Parent').values_list('id', flat=True))
+            ids['teachers'] = set(active.filter(role='Teacher').exclude(id=user.id).values_list('id', flat=True))
+            ids['admins'] = set(active.filter(role='Admin').values_list('id', flat=True))
+
+        elif user.role == 'Admin':
+            by_role = {'Student': 'students', 'Teacher': 'teachers', 'Admin': 'admins', 'Parent': 'parents'}
+            for contact_id, role in active.filter(role__in=by_role).exclude(
+                role='Admin', id=user.id
+            ).values_list('id', 'role'):
+                ids[by_role[role]].add(contact_id)
+
+        return {category: sorted(contact_ids) for category, contact_ids in ids.items()}
+
+    @staticmethod
+    def get_contact_ids(user) -> Dict[str, List[int]]:
+        """Contact ids of ``user`` by category, from the cache when current."""
+        global_version, user_version = ContactGraphService._versions(user.id)
+        cache_key = f'contacts:{user.id}:{user.role}:g{global_version}:u{user_version}'
+
+        contact_ids = cache.get(cache_key)
+        if contact_ids is None:
+            contact_ids = ContactGraphService.compute_contact_ids(user)
+            cache.set(cache_key, contact_ids, CONTACTS_CACHE_TIMEOUT)
+        return contact_ids
+
+    @staticmethod
+    def get_contacts(user) -> Dict[str, list]:
+        """Serialized contacts of ``user`` by category, loaded in one query."""
+        from users.models import User
+        from users.serializers import UserSerializer
+
+        contact_ids = ContactGraphService.get_contact_ids(user)
+        category_of = {
+            contact_id: category
+            for category, category_ids in contact_ids.items()
+            for contact_id in category_ids
+        }
+
+        contacts = {category: [] for category in CATEGORIES}
+        if category_of:
+            # is_active guards against a deactivation not yet reflected
+            for contact in User.objects.filter(id__in=category_of, is_active=True):
+                contacts[category_of[contact.id]].append(contact)
+
+        return {
+            category: UserSerializer(users, many=True).data
+            for category, users in contacts.items()
+        }
@@ -0,0 +1,94 @@
+"""
+Management command to benchmark channel layer throughput.
+
+Compares the SQLite-backed layer against InMemoryChannelLayer by fanning
+group messages out to a set of subscribed channels and timing how long it
+takes until every subscriber has received every message.
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from communications.channel_layers import SQLiteChannelLayer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark group fan-out throughput of the SQLite and in-memory channel layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Group messages to send (default: 500)')
+        parser.add_argument('--subscribers', type=int, default=10, help='Channels in the group (default: 10)')
+        parser.add_argument('--batch', type=int, default=50, help='Messages per group_send_many call (default: 50)')
+
+    def handle(self, *args, **options):
+        messages = options['messages']
+        subscribers = options['subscribers']
+        batch = options['batch']
+
+        self.stdout.write(
+            f'Fanning out {messages} messages to {subscribers} subscribers '
+            f'({messages * subscribers} deliveries)\n'
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            layers = [
+                ('InMemoryChannelLayer', lambda: InMemoryChannelLayer(capacity=messages)),
+                ('SQLiteChannelLayer', lambda: SQLiteChannelLayer(
+                    path=os.path.join(tmp, 'bench.sqlite3'), capacity=messages
+                )),
+                (f'SQLiteChannelLayer (batched x{batch})', lambda: SQLiteChannelLayer(
+                    path=os.path.join(tmp, 'bench_batched.sqlite3'), capacity=messages
+                )),
+            ]
+
+            results = {}
+            for name, factory in layers:
+                batched = 'batched' in name
+                elapsed = asyncio.run(self._run(factory(), messages, subscribers, batch if batched else 1))
+                deliveries = messages * subscribers
+                results[name] = deliveries / elapsed
+                self.stdout.write(
+                    f'  {name:<36} {elapsed:8.3f}s  {results[name]:10.0f} msg/s'
+                )
+
+        baseline = results['InMemoryChannelLayer']
+        for name, rate in results.items():
+            if name != 'InMemoryChannelLayer':
+                self.stdout.write(f'  {name} runs at {rate / baseline:.1%} of in-memory throughput')
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete'))
+
+    async def _run(self, layer, messages, subscribers, batch):
+        group = 'benchmark_group'
+        channels = [await layer.new_channel() for _ in range(subscribers)]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        async def consume(channel):
+            for _ in range(messages):
+                await layer.receive(channel)
+
+        start = time.perf_counter()
+        consumers = [asyncio.create_task(consume(channel)) for channel in channels]
+
+        if batch > 1:
+            for offset in range(0, messages, batch):
+                count = min(batch, messages - offset)
+                await layer.group_send_many([
+                    (group, {'type': 'notification_message', 'message': {'n': offset + i}})
+                    for i in range(count)
+                ])
+        else:
+            for i in range(messages):
+                await layer.group_send(group, {'type': 'notification_message', 'message': {'n': i}})
+
+        await asyncio.gather(*consumers)
+        elapsed = time.perf_counter() - start
+
+        await layer.flush()
+        await layer.close()
+        return elapsed
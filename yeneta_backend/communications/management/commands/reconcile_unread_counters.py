@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from communications.unread_counters import UnreadCounterService
+
+
+class Command(BaseCommand):
+    help = 'Recompute unread notification and message counters from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only reconcile this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        count = UnreadCounterService.reconcile(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled unread counters of {count} user(s)'))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 23:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def mark_existing_messages_read(apps, schema_editor):
+    """Start every current participant at "read", so history is not all unread."""
+    Conversation = apps.get_model('communications', 'Conversation')
+    ConversationReadState = apps.get_model('communications', 'ConversationReadState')
+    now = timezone.now()
+    through = Conversation.participants.through
+    ConversationReadState.objects.bulk_create(
+        [
+            ConversationReadState(conversation_id=conversation_id, user_id=user_id, last_read_at=now)
+            for conversation_id, user_id in through.objects.values_list('conversation_id', 'user_id')
+        ],
+        batch_size=500,
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0011_directory_fts'),
+        ('communications', '0008_alter_studentassignment_document_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('notifications', models.IntegerField(default=0)),
+                ('file_notifications', models.IntegerField(default=0)),
+                ('messages', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'unread_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='communications.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'conversation_read_states',
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(mark_existing_messages_read, migrations.RunPython.noop),
+    ]
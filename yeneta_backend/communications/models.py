@@ -42,6 +42,10 @@ class Message(models.Model):
     class Meta:
         db_table = 'messages'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a conversation's history
+            models.Index(fields=['conversation', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} at {self.created_at}"
@@ -187,3 +191,51 @@ class Notification(models.Model):
     
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.title}"
+
+
+class ConversationReadState(models.Model):
+    """A participant's read position and unread message count in a conversation."""
+    
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='read_states'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_read_states'
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'conversation_read_states'
+        unique_together = ['conversation', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username} in conversation {self.conversation_id}: {self.unread_count} unread"
+
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized per-user unread counts, maintained on every create and
+    read and periodically reconciled against the source tables.
+    """
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    notifications = models.IntegerField(default=0)
+    file_notifications = models.IntegerField(default=0)
+    messages = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'unread_counters'
+    
+    def __str__(self):
+        return f"Unread counts for user {self.user_id}"
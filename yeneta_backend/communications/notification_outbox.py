@@ -0,0 +1,154 @@
+"""
+Outbox for realtime notifications.
+
+Signal receivers used to call ``async_to_sync(channel_layer.group_send)``
+inside ``post_save``, so every save blocked on one channel-layer round trip
+per recipient (plus a FamilyMembership lookup for parent notifications).
+
+Receivers now only enqueue events once the surrounding transaction has
+committed. A background dispatcher thread drains the queue, resolves family
+recipients for the whole batch in one query, drops duplicate events and
+fans the batch out with as few channel-layer calls as possible.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+PARENT_ROLES = ['Parent', 'Parent/Guardian', 'Guardian']
+
+
+class NotificationOutbox:
+    """Queue of notification events dispatched off the request path."""
+
+    def __init__(self, batch_size: int = 200, batch_window: float = 0.05):
+        """
+        Args:
+            batch_size: Maximum events folded into one dispatch
+            batch_window: Seconds to wait for more events before dispatching
+        """
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dispatched = 0
+        self.coalesced = 0
+
+    # Producer API
+
+    def enqueue(self, group_name: str, message: Dict) -> None:
+        """Send ``message`` to ``group_name`` once the current transaction commits."""
+        self._enqueue_on_commit(('group', group_name, message))
+
+    def enqueue_for_family_parents(self, family_id: int, message: Dict) -> None:
+        """
+        Send ``message`` to every active parent/guardian of a family once the
+        current transaction commits. Recipients are resolved by the dispatcher.
+        """
+        self._enqueue_on_commit(('family', family_id, message))
+
+    def _enqueue_on_commit(self, event: Tuple) -> None:
+        transaction.on_commit(lambda: self._put(event))
+
+    def _put(self, event: Tuple) -> None:
+        self._ensure_dispatcher()
+        self._queue.put(event)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until every queued event has been dispatched."""
+        done = threading.Event()
+        self._put(('barrier', done, None))
+        done.wait(timeout)
+
+    # Dispatcher
+
+    def _ensure_dispatcher(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='notification-outbox', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.batch_window))
+            except queue.Empty:
+                pass
+
+            barriers = [event[1] for event in batch if event[0] == 'barrier']
+            events = [event for event in batch if event[0] != 'barrier']
+            try:
+                if events:
+                    self._dispatch(events)
+            except Exception as e:
+                logger.error(f"Notification dispatch failed for {len(events)} event(s): {e}")
+            finally:
+                close_old_connections()
+                for barrier in barriers:
+                    barrier.set()
+
+    def _dispatch(self, events: List[Tuple]) -> None:
+        group_messages = self._resolve(events)
+
+        # Coalesce identical (group, message) pairs queued by repeated saves
+        unique: Dict[Tuple[str, str], Tuple[str, Dict]] = {}
+        for group_name, message in group_messages:
+            key = (group_name, json.dumps(message, sort_keys=True, default=str))
+            unique.setdefault(key, (group_name, message))
+        self.coalesced += len(group_messages) - len(unique)
+
+        if unique:
+            async_to_sync(self._send)(list(unique.values()))
+            self.dispatched += len(unique)
+
+    def _resolve(self, events: List[Tuple]) -> List[Tuple[str, Dict]]:
+        """Expand family events into per-parent group messages with one query."""
+        group_messages = [(target, message) for kind, target, message in events if kind == 'group']
+
+        family_events = [(target, message) for kind, target, message in events if kind == 'family']
+        if family_events:
+            from users.models import FamilyMembership
+
+            parents_by_family: Dict[int, List[int]] = {}
+            for family_id, user_id in FamilyMembership.objects.filter(
+                family_id__in={family_id for family_id, _ in family_events},
+                role__in=PARENT_ROLES,
+                is_active=True
+            ).values_list('family_id', 'user_id'):
+                parents_by_family.setdefault(family_id, []).append(user_id)
+
+            for family_id, message in family_events:
+                for user_id in parents_by_family.get(family_id, []):
+                    group_messages.append((f'user_{user_id}_notifications', message))
+
+        return group_messages
+
+    async def _send(self, group_messages: List[Tuple[str, Dict]]) -> None:
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        if hasattr(channel_layer, 'group_send_many'):
+            await channel_layer.group_send_many(group_messages)
+        else:
+            await asyncio.gather(*(
+                channel_layer.group_send(group_name, message)
+                for group_name, message in group_messages
+            ))
+
+
+notification_outbox = NotificationOutbox()
@@ -32,11 +32,23 @@ class ConversationSerializer(serializers.ModelSerializer):
     
     participants = UserSerializer(many=True, read_only=True)
     last_message = MessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Conversation
-        fields = ['id', 'participants', 'last_message', 'created_at', 'updated_at']
+        fields = ['id', 'participants', 'last_message', 'unread_count', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def get_unread_count(self, obj):
+        """Unread messages of the requesting user, annotated by the viewset when listing."""
+        unread = getattr(obj, 'unread_count', None)
+        if unread is not None:
+            return unread
+        request = self.context.get('request')
+        if request is None:
+            return 0
+        state = obj.read_states.filter(user=request.user).values_list('unread_count', flat=True).first()
+        return state or 0
 
 
 class SharedFileNotificationSerializer(serializers.ModelSerializer):
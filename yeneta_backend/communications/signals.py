@@ -1,12 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save, post_init, m2m_changed
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from academics.models import TeacherCourseRequest, StudentEnrollmentRequest
+from academics.models import TeacherCourseRequest, StudentEnrollmentRequest, Enrollment, Course
+from users.models import User, FamilyMembership
+from communications.notification_outbox import notification_outbox
+from communications.contact_graph import ContactGraphService
+from communications.models import Conversation, Message, Notification, SharedFileNotification
+from communications.unread_counters import UnreadCounterService
 
 @receiver(post_save, sender=TeacherCourseRequest)
 def course_request_handler(sender, instance, created, **kwargs):
-    channel_layer = get_channel_layer()
     group_name = ''
     message = {}
 
@@ -35,11 +37,10 @@ def course_request_handler(sender, instance, created, **kwargs):
             }
 
     if group_name:
-        async_to_sync(channel_layer.group_send)(group_name, message)
+        notification_outbox.enqueue(group_name, message)
 
 @receiver(post_save, sender=StudentEnrollmentRequest)
 def enrollment_request_handler(sender, instance, created, **kwargs):
-    channel_layer = get_channel_layer()
     group_name = ''
     message = {}
 
@@ -67,31 +68,138 @@ def enrollment_request_handler(sender, instance, created, **kwargs):
                     'data': {'request_id': instance.id, 'status': instance.status}
                 }
             }
-            async_to_sync(channel_layer.group_send)(student_group_name, student_message)
-
-            # Notify parent if family is linked
-            if instance.family:
-                # Get all parent/guardian members of the family
-                from users.models import FamilyMembership
-                parent_members = FamilyMembership.objects.filter(
-                    family=instance.family,
-                    role__in=['Parent', 'Parent/Guardian', 'Guardian'],
-                    is_active=True
-                ).select_related('user')
-                
-                for parent_member in parent_members:
-                    parent_group_name = f'user_{parent_member.user.id}_notifications'
-                    parent_message = {
-                        'type': 'notification_message',
-                        'message': {
-                            'event': 'ENROLLMENT_REQUEST_APPROVED_FOR_CHILD',
-                            'data': {
-                                'student_name': f'{instance.student.first_name} {instance.student.last_name}',
-                                'subject': instance.subject
-                            }
+            notification_outbox.enqueue(student_group_name, student_message)
+
+            # Notify parents if family is linked; the dispatcher resolves the
+            # family's parent/guardian members so the save never waits on them
+            if instance.family_id:
+                parent_message = {
+                    'type': 'notification_message',
+                    'message': {
+                        'event': 'ENROLLMENT_REQUEST_APPROVED_FOR_CHILD',
+                        'data': {
+                            'student_name': f'{instance.student.first_name} {instance.student.last_name}',
+                            'subject': instance.subject
                         }
                     }
-                    async_to_sync(channel_layer.group_send)(parent_group_name, parent_message)
+                }
+                notification_outbox.enqueue_for_family_parents(instance.family_id, parent_message)
 
     if group_name:
-        async_to_sync(channel_layer.group_send)(group_name, message)
+        notification_outbox.enqueue(group_name, message)
+
+
+# Contact graph invalidation
+
+# User fields the contact sets are built from
+CONTACT_USER_FIELDS = {'is_active', 'role', 'parent', 'parent_id'}
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_contacts_handler(sender, instance, **kwargs):
+    affected = ContactGraphService.student_dependents([instance.student_id])
+    # The course's teacher, even once the enrollment is gone
+    affected.update(Course.objects.filter(id=instance.course_id).values_list('teacher_id', flat=True))
+    ContactGraphService.invalidate_users(affected)
+
+
+@receiver(post_save, sender=FamilyMembership)
+@receiver(post_delete, sender=FamilyMembership)
+def family_membership_contacts_handler(sender, instance, **kwargs):
+    member_ids = set(FamilyMembership.objects.filter(family_id=instance.family_id).values_list('user_id', flat=True))
+    member_ids.add(instance.user_id)
+    ContactGraphService.invalidate_users(ContactGraphService.student_dependents(member_ids))
+
+
+@receiver(pre_save, sender=Course)
+def course_teacher_change_handler(sender, instance, **kwargs):
+    if instance.pk:
+        previous = Course.objects.filter(pk=instance.pk).values_list('teacher_id', flat=True).first()
+        instance._contacts_changed = previous is not None and previous != instance.teacher_id
+
+
+@receiver(post_save, sender=Course)
+def course_contacts_handler(sender, instance, created, **kwargs):
+    if getattr(instance, '_contacts_changed', False):
+        ContactGraphService.invalidate_all()
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted_contacts_handler(sender, instance, **kwargs):
+    ContactGraphService.invalidate_all()
+
+
+@receiver(pre_save, sender=User)
+def user_contact_fields_handler(sender, instance, update_fields=None, **kwargs):
+    # Logins save only last_login; skip the lookup for those
+    if not instance.pk or (update_fields and not CONTACT_USER_FIELDS.intersection(update_fields)):
+        return
+    previous = User.objects.filter(pk=instance.pk).values('is_active', 'role', 'parent_id').first()
+    instance._contacts_changed = previous is not None and previous != {
+        'is_active': instance.is_active, 'role': instance.role, 'parent_id': instance.parent_id
+    }
+
+
+@receiver(post_save, sender=User)
+def user_contacts_handler(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_contacts_changed', False):
+        ContactGraphService.invalidate_all()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted_contacts_handler(sender, instance, **kwargs):
+    ContactGraphService.invalidate_all()
+
+
+# Unread counters
+
+@receiver(post_init, sender=Notification)
+@receiver(post_init, sender=SharedFileNotification)
+def notification_loaded_handler(sender, instance, **kwargs):
+    # Read state as loaded, to tell read/unread transitions apart on save
+    instance._was_read = instance.is_read if instance.pk else None
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=SharedFileNotification)
+def notification_unread_handler(sender, instance, created, **kwargs):
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif instance._was_read is None or instance._was_read == instance.is_read:
+        delta = 0
+    else:
+        delta = -1 if instance.is_read else 1
+    instance._was_read = instance.is_read
+    if delta:
+        UnreadCounterService.notification_changed(sender, instance.recipient_id, delta)
+
+
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=SharedFileNotification)
+def notification_deleted_unread_handler(sender, instance, **kwargs):
+    if not instance.is_read:
+        UnreadCounterService.notification_changed(sender, instance.recipient_id, -1)
+
+
+@receiver(post_save, sender=Message)
+def message_unread_handler(sender, instance, created, **kwargs):
+    if created:
+        UnreadCounterService.message_created(instance)
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted_unread_handler(sender, instance, **kwargs):
+    UnreadCounterService.message_deleted(instance)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def conversation_participants_handler(sender, instance, action, pk_set, reverse, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # user.conversations.add(...): instance is the user
+        for conversation_id in pk_set:
+            UnreadCounterService.participants_added(conversation_id, [instance.pk])
+    else:
+        UnreadCounterService.participants_added(instance.pk, pk_set)
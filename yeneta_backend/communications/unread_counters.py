@@ -0,0 +1,245 @@
+"""
+Denormalized unread counters.
+
+Every poll of the notification bell, the shared-file badge and the
+conversation list ran a ``COUNT(*)`` per open tab. Each user now has an
+``UnreadCounter`` row (unread notifications, shared-file notifications and
+messages) and a ``ConversationReadState`` per conversation. They are
+adjusted with atomic ``F()`` updates when items are created, read or
+deleted. Every change is pushed to the user's notification group as an
+``UNREAD_COUNTS`` event, so clients can stop polling. Counters are
+reconciled against the source tables when they are older than
+``RECONCILE_INTERVAL`` and by ``manage.py reconcile_unread_counters``.
+"""
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import (
+    Conversation, ConversationReadState, Message, Notification,
+    SharedFileNotification, UnreadCounter
+)
+from .notification_outbox import notification_outbox
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('notifications', 'file_notifications', 'messages')
+
+# Counters older than this are recomputed from the source tables on read
+RECONCILE_INTERVAL = timedelta(hours=1)
+
+
+class UnreadCounterService:
+    """Service maintaining, reconciling and publishing unread counters."""
+
+    # Reading
+
+    @staticmethod
+    def get_counts(user) -> Dict[str, int]:
+        """Unread counts of ``user``, reconciling first when they are stale."""
+        counter = UnreadCounter.objects.filter(user=user).first()
+        if counter is None or counter.reconciled_at < timezone.now() - RECONCILE_INTERVAL:
+            UnreadCounterService.reconcile([user.id])
+            counter = UnreadCounter.objects.get(user=user)
+        return UnreadCounterService._as_dict(counter)
+
+    @staticmethod
+    def _as_dict(counter: UnreadCounter) -> Dict[str, int]:
+        return {field: getattr(counter, field) for field in COUNTER_FIELDS}
+
+    # Maintenance
+
+    @staticmethod
+    def adjust(user_ids: Iterable[int], field: str, delta: int) -> None:
+        """
+        Atomically add ``delta`` to one counter of several users and push
+        their new counts. Users without a counter row yet are skipped; their
+        first read reconciles them from the source tables.
+        """
+        user_ids = {user_id for user_id in user_ids if user_id}
+        if not user_ids or not delta:
+            return
+        updated = UnreadCounter.objects.filter(user_id__in=user_ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+        if updated:
+            UnreadCounterService.publish(user_ids)
+
+    @staticmethod
+    def notification_changed(model, recipient_id: int, delta: int) -> None:
+        """Record ``delta`` more unread items of a notification model."""
+        field = 'notifications' if model is Notification else 'file_notifications'
+        UnreadCounterService.adjust([recipient_id], field, delta)
+
+    @staticmethod
+    def mark_all_read(queryset, user) -> int:
+        """
+        Mark every unread item of ``queryset`` (the user's notifications or
+        shared-file notifications) as read with one UPDATE.
+
+        Returns:
+            Number of items marked read
+        """
+        field = 'notifications' if queryset.model is Notification else 'file_notifications'
+        with transaction.atomic():
+            marked = queryset.filter(is_read=False).update(is_read=True, read_at=timezone.now())
+            UnreadCounterService.adjust([user.id], field, -marked)
+        return marked
+
+    @staticmethod
+    def message_created(message: Message) -> None:
+        """Count a new message as unread for every other participant."""
+        states = ConversationReadState.objects.filter(
+            conversation_id=message.conversation_id
+        ).exclude(user_id=message.sender_id)
+        recipient_ids = list(states.values_list('user_id', flat=True))
+        if recipient_ids:
+            states.update(unread_count=F('unread_count') + 1)
+            UnreadCounterService.adjust(recipient_ids, 'messages', 1)
+
+    @staticmethod
+    def message_deleted(message: Message) -> None:
+        """Uncount a deleted message for participants who had not read it."""
+        states = ConversationReadState.objects.filter(
+            Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at),
+            conversation_id=message.conversation_id,
+            unread_count__gt=0
+        ).exclude(user_id=message.sender_id)
+        recipient_ids = list(states.values_list('user_id', flat=True))
+        if recipient_ids:
+            states.update(unread_count=F('unread_count') - 1)
+            UnreadCounterService.adjust(recipient_ids, 'messages', -1)
+
+    @staticmethod
+    def participants_added(conversation_id: int, user_ids: Iterable[int]) -> None:
+        """Start new participants with nothing unread."""
+        ConversationReadState.objects.bulk_create(
+            [
+                ConversationReadState(conversation_id=conversation_id, user_id=user_id, last_read_at=timezone.now())
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def mark_conversation_read(conversation: Conversation, user) -> None:
+        """Mark every message of ``conversation`` as read by ``user``."""
+        with transaction.atomic():
+            state, created = ConversationReadState.objects.select_for_update().get_or_create(
+                conversation=conversation, user=user
+            )
+            unread = 0 if created else state.unread_count
+            state.unread_count = 0
+            state.last_read_at = timezone.now()
+            state.save(update_fields=['unread_count', 'last_read_at'])
+            UnreadCounterService.adjust([user.id], 'messages', -unread)
+
+    # Reconciliation
+
+    @staticmethod
+    def reconcile(user_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute counters and per-conversation unread counts from the
+        source tables, optionally only for some users, and push the ones
+        that changed.
+
+        Returns:
+            Number of users reconciled
+        """
+        from users.models import User
+
+        users = User.objects.all()
+        if user_ids is not None:
+            users = users.filter(id__in=list(user_ids))
+        user_ids = list(users.values_list('id', flat=True))
+        if not user_ids:
+            return 0
+
+        notifications = dict(
+            Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+            .order_by().values_list('recipient_id').annotate(count=Count('id'))
+        )
+        file_notifications = dict(
+            SharedFileNotification.objects.filter(recipient_id__in=user_ids, is_read=False)
+            .order_by().values_list('recipient_id').annotate(count=Count('id'))
+        )
+
+        with transaction.atomic():
+            # Participants without a read state have not read anything yet
+            through = Conversation.participants.through
+            ConversationReadState.objects.bulk_create(
+                [
+                    ConversationReadState(conversation_id=conversation_id, user_id=user_id)
+                    for conversation_id, user_id in through.objects.filter(
+                        user_id__in=user_ids
+                    ).values_list('conversation_id', 'user_id')
+                ],
+                batch_size=500,
+                ignore_conflicts=True
+            )
+
+            # Messages from others after each participant's read position
+            states = list(ConversationReadState.objects.filter(user_id__in=user_ids).annotate(
+                unread=Count('conversation__messages', filter=(
+                    (Q(last_read_at__isnull=True) | Q(conversation__messages__created_at__gt=F('last_read_at')))
+                    & ~Q(conversation__messages__sender_id=F('user_id'))
+                ))
+            ))
+            messages: Dict[int, int] = {}
+            changed_states = []
+            for state in states:
+                unread = state.unread
+                messages[state.user_id] = messages.get(state.user_id, 0) + unread
+                if state.unread_count != unread:
+                    state.unread_count = unread
+                    changed_states.append(state)
+            ConversationReadState.objects.bulk_update(changed_states, ['unread_count'], batch_size=500)
+
+            existing = {counter.user_id: counter for counter in UnreadCounter.objects.filter(user_id__in=user_ids)}
+            now = timezone.now()
+            changed_users = []
+            to_create = []
+            for user_id in user_ids:
+                counts = {
+                    'notifications': notifications.get(user_id, 0),
+                    'file_notifications': file_notifications.get(user_id, 0),
+                    'messages': messages.get(user_id, 0),
+                }
+                counter = existing.get(user_id)
+                if counter is None:
+                    to_create.append(UnreadCounter(user_id=user_id, reconciled_at=now, **counts))
+                    continue
+                if UnreadCounterService._as_dict(counter) != counts:
+                    changed_users.append(user_id)
+                for field, value in counts.items():
+                    setattr(counter, field, value)
+                counter.reconciled_at = now
+
+            UnreadCounter.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+            UnreadCounter.objects.bulk_update(
+                list(existing.values()), list(COUNTER_FIELDS) + ['reconciled_at'], batch_size=500
+            )
+
+        if changed_users:
+            logger.info(f"Reconciled drifted unread counters of {len(changed_users)} user(s)")
+            UnreadCounterService.publish(changed_users)
+        return len(user_ids)
+
+    # Publishing
+
+    @staticmethod
+    def publish(user_ids: Iterable[int]) -> None:
+        """Push the current counts of ``user_ids`` to their notification groups."""
+        for counter in UnreadCounter.objects.filter(user_id__in=list(user_ids)):
+            notification_outbox.enqueue(f'user_{counter.user_id}_notifications', {
+                'type': 'notification_message',
+                'message': {
+                    'event': 'UNREAD_COUNTS',
+                    'data': UnreadCounterService._as_dict(counter),
+                }
+            })
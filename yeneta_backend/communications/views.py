@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from .models import Conversation, Message, SharedFileNotification, StudentAssignment, Notification
 from academics.models import StudentGrade
+from yeneta_backend.pagination import CursorPaginatedListMixin
 from .serializers import (
     ConversationSerializer, MessageSerializer,
     SharedFileNotificationSerializer, StudentAssignmentSerializer, StudentAssignmentListSerializer,
@@ -15,6 +16,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Messages returned per window of conversation history
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
 
 class ConversationViewSet(viewsets.ModelViewSet):
     """ViewSet for managing conversations."""
@@ -24,7 +29,14 @@ class ConversationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Conversation.objects.filter(participants=self.request.user)
+        from django.db.models import OuterRef, Subquery
+        from .models import ConversationReadState
+        unread = ConversationReadState.objects.filter(
+            conversation=OuterRef('pk'), user=self.request.user
+        ).values('unread_count')[:1]
+        return Conversation.objects.filter(participants=self.request.user).annotate(
+            unread_count=Subquery(unread)
+        )
     
     def create(self, request, *args, **kwargs):
         """Create a new conversation or return existing one between participants."""
@@ -75,11 +87,75 @@ class ConversationViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
-        """Get all messages in a conversation."""
+        """
+        Get a window of a conversation's messages, oldest first.
+        
+        Without parameters returns the latest ``MESSAGE_PAGE_SIZE`` messages.
+        ``?before=<message id>`` scrolls back from a message and
+        ``?after=<message id>`` catches up after one; ``?limit=N`` sets the
+        window size. The ``X-Has-More`` header tells whether further messages
+        exist in that direction.
+        """
+        from django.db.models import Q
+        
         conversation = self.get_object()
-        messages = Message.objects.filter(conversation=conversation).order_by('created_at')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response(
+                {'error': 'Use either before or after, not both'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', MESSAGE_PAGE_SIZE)), 1), MAX_MESSAGE_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        messages = Message.objects.filter(conversation=conversation).select_related('sender')
+        
+        # Keyset on (created_at, id), served by the (conversation, created_at) index
+        cursor = None
+        if before or after:
+            try:
+                cursor = messages.filter(id=int(before or after)).values_list('created_at', 'id').first()
+            except ValueError:
+                cursor = None
+            if cursor is None:
+                return Response(
+                    {'error': 'Cursor message not found in this conversation'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if after:
+            created_at, message_id = cursor
+            page = list(messages.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+            ).order_by('created_at', 'id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if before:
+                created_at, message_id = cursor
+                messages = messages.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+                )
+            page = list(messages.order_by('-created_at', '-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
+        
+        serializer = MessageSerializer(page, many=True)
+        response = Response(serializer.data)
+        response['X-Has-More'] = 'true' if has_more else 'false'
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """Mark every message of a conversation as read."""
+        from .unread_counters import UnreadCounterService
+        conversation = self.get_object()
+        UnreadCounterService.mark_conversation_read(conversation, request.user)
+        return Response({'status': 'marked as read'})
 
 
 class MessageViewSet(viewsets.ModelViewSet):
@@ -133,14 +209,19 @@ class SharedFileNotificationViewSet(viewsets.ModelViewSet):
         notification.save()
         return Response({'status': 'marked as downloaded'})
     
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """Mark all of the user's shared-file notifications as read."""
+        from .unread_counters import UnreadCounterService
+        marked = UnreadCounterService.mark_all_read(self.get_queryset(), request.user)
+        return Response({'status': 'marked as read', 'count': marked})
+    
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications."""
-        count = SharedFileNotification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
-        return Response({'count': count})
+        from .unread_counters import UnreadCounterService
+        counts = UnreadCounterService.get_counts(request.user)
+        return Response({'count': counts['file_notifications']})
 
 
 class StudentAssignmentViewSet(viewsets.ModelViewSet):
@@ -252,11 +333,12 @@ class StudentAssignmentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(CursorPaginatedListMixin, viewsets.ModelViewSet):
     """ViewSet for managing notifications."""
     
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         """Return notifications for current user."""
@@ -271,14 +353,25 @@ class NotificationViewSet(viewsets.ModelViewSet):
         notification.save()
         return Response({'status': 'marked as read'})
     
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        """Mark all of the user's notifications as read."""
+        from .unread_counters import UnreadCounterService
+        marked = UnreadCounterService.mark_all_read(self.get_queryset(), request.user)
+        return Response({'status': 'marked as read', 'count': marked})
+    
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications."""
-        count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
-        return Response({'count': count})
+        from .unread_counters import UnreadCounterService
+        counts = UnreadCounterService.get_counts(request.user)
+        return Response({'count': counts['notifications']})
+    
+    @action(detail=False, methods=['get'])
+    def unread_counts(self, request):
+        """Get unread notification, shared-file and message counts at once."""
+        from .unread_counters import UnreadCounterService
+        return Response(UnreadCounterService.get_counts(request.user))
     
     @action(detail=False, methods=['get'])
     def unread(self, request):
@@ -307,140 +400,7 @@ class CommunicationContactsView(viewsets.ViewSet):
         - Admins: All active admins.
         - Parents: All other active parents.
         """
-        user = request.user
-        
-        # Initialize containers
-        students = User.objects.none()
-        teachers = User.objects.none()
-        admins = User.objects.none()
-        parents = User.objects.none()
-        
-        if user.role == 'Parent':
-            # 1. Students: Only own children
-            # Note: We use 'children' related name if available, or filter directly
-            # Model has: parent = models.ForeignKey(..., related_name='children')
-            students = user.children.filter(role='Student', is_active=True)
-            
-            # 2. Teachers: Teachers of linked children's enrolled courses
-            # Logic:
-            # - Get children
-            # - Get enrollments (StudentEnrollmentRequest with status='approved' OR Enrollment model)
-            # The user request mentions "approved for enrollment".
-            # We should check both Enrollment model (actual enrollments) and accepted requests if needed.
-            # Usually Enrollment model is the source of truth for active enrollments.
-            
-            # Let's import Enrollment
-            from academics.models import Enrollment
-            
-            # Get IDs of children
-            child_ids = students.values_list('id', flat=True)
-            
-            # Get courses enrolled by these children
-            # Enrollment has 'course' foreign key
-            enrolled_course_ids = Enrollment.objects.filter(student_id__in=child_ids).values_list('course_id', flat=True)
-            
-            # Get teachers of these courses
-            # Course has 'teacher' foreign key
-            from academics.models import Course
-            teacher_ids = Course.objects.filter(id__in=enrolled_course_ids).values_list('teacher_id', flat=True).distinct()
-            
-            teachers = User.objects.filter(id__in=teacher_ids, role='Teacher', is_active=True)
-            
-            # 3. Admins: All active admins
-            admins = User.objects.filter(role='Admin', is_active=True)
-            
-            # 4. Parents: All other active parents
-            parents = User.objects.filter(role='Parent', is_active=True).exclude(id=user.id)
-            
-        elif user.role == 'Student':
-            from academics.models import Enrollment, Course
-            from users.models import FamilyMembership
-            
-            # 1. Teachers: Only teachers of enrolled courses
-            enrolled_course_ids = Enrollment.objects.filter(student=user).values_list('course_id', flat=True)
-            teacher_ids = Course.objects.filter(id__in=enrolled_course_ids).values_list('teacher_id', flat=True).distinct()
-            teachers = User.objects.filter(id__in=teacher_ids, role='Teacher', is_active=True)
-            
-            # 2. Family: Parents and Siblings
-            # A. Parents
-            parent_ids = set()
-            if user.parent:
-                parent_ids.add(user.parent.id)
-            
-            # B. Check Family memberships
-            # Get families this student belongs to
-            family_ids = FamilyMembership.objects.filter(user=user).values_list('family_id', flat=True)
-            
-            # Get other members of these families
-            family_members = FamilyMembership.objects.filter(family_id__in=family_ids).exclude(user=user)
-            
-            # Separate into Parents and Siblings (Students)
-            related_parent_ids = family_members.filter(role__in=['Parent', 'Guardian']).values_list('user_id', flat=True)
-            parent_ids.update(related_parent_ids)
-            
-            parents = User.objects.filter(id__in=parent_ids, role='Parent', is_active=True)
-            
-            # C. Siblings (Students)
-            sibling_ids = family_members.filter(role__in=['Student', 'Sibling']).values_list('user_id', flat=True)
-            students = User.objects.filter(id__in=sibling_ids, role='Student', is_active=True)
+        from .contact_graph import ContactGraphService
 
-            # 3. Admins: All active admins (for support)
-            admins = User.objects.filter(role='Admin', is_active=True)
-
-        elif user.role == 'Teacher':
-            from academics.models import Course, Enrollment
-            from users.models import FamilyMembership
-            
-            # 1. Students: Only students enrolled in courses taught by this teacher
-            # Get courses taught by this teacher
-            course_ids = Course.objects.filter(teacher=user).values_list('id', flat=True)
-            
-            # Get students enrolled in these courses
-            student_ids = Enrollment.objects.filter(course_id__in=course_ids).values_list('student_id', flat=True).distinct()
-            students = User.objects.filter(id__in=student_ids, role='Student', is_active=True)
-            
-            # 2. Parents: Parents of these students
-            # A. Direct parent
-            direct_parent_ids = students.values_list('parent_id', flat=True)
-            
-            # B. Family members (Parents/Guardians)
-            family_ids = FamilyMembership.objects.filter(user__in=students).values_list('family_id', flat=True)
-            family_parent_ids = FamilyMembership.objects.filter(
-                family_id__in=family_ids, 
-                role__in=['Parent', 'Guardian']
-            ).values_list('user_id', flat=True)
-            
-            all_parent_ids = set(direct_parent_ids)
-            all_parent_ids.update(family_parent_ids)
-            # Remove None if any
-            all_parent_ids.discard(None)
-            
-            parents = User.objects.filter(id__in=all_parent_ids, role='Parent', is_active=True)
-            
-            # 3. Teachers: All other teachers (colleagues)
-            teachers = User.objects.filter(role='Teacher', is_active=True).exclude(id=user.id)
-            
-            # 4. Admins: All active admins
-            admins = User.objects.filter(role='Admin', is_active=True)
-
-        else:
-            # Fallback for other roles (Admin)
-            if user.role == 'Admin':
-                # Admins see everyone usually
-                students = User.objects.filter(role='Student', is_active=True)
-                admins = User.objects.filter(role='Admin', is_active=True).exclude(id=user.id)
-                parents = User.objects.filter(role='Parent', is_active=True)
-                teachers = User.objects.filter(role='Teacher', is_active=True)
-
-        # Serialize results
-        # We need a simple serializer for User basic info
-        from users.serializers import UserSerializer # Or a leaner one if available
-        
-        data = {
-            'students': UserSerializer(students, many=True).data,
-            'teachers': UserSerializer(teachers, many=True).data,
-            'admins': UserSerializer(admins, many=True).data,
-            'parents': UserSerializer(parents, many=True).data,
-        }
-        
-        return Response(data)
+        # Materialized per user and kept current by signals
+        return Response(ContactGraphService.get_contacts(request.user))
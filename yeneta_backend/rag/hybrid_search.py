@@ -0,0 +1,331 @@
+"""
+Hybrid lexical + vector retrieval for curriculum and exam vector stores.
+
+Dense similarity alone ranks exact-term queries ("Unit 3 photosynthesis
+equation", "Question 23") below loosely related paragraphs. Every ChromaDB
+collection now gets a BM25 index stored next to it, and query results are
+the reciprocal-rank fusion (RRF) of the vector and BM25 rankings. An
+optional local cross-encoder (``RAG_RERANKER_MODEL``) reranks the fused
+candidates on CPU.
+
+The BM25 index is written at ingestion. Stores created before it existed,
+or changed outside ``create_vector_store``, are (re)indexed on first query
+when the collection size no longer matches the index.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+(?:\.\w+)*', re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were will with what which who how why when where do does
+""".split())
+
+# Metadata fields kept in the index so lexical hits honour ``where`` filters
+FILTER_FIELDS = ('chapter', 'chapter_raw')
+
+# Constant of the RRF formula 1 / (k + rank); 60 is the usual choice
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping numbers like "3.2" whole."""
+    return [token for token in TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+def index_path(vector_store_path: str, collection_name: str) -> str:
+    return os.path.join(vector_store_path, f'bm25_{collection_name}.json')
+
+
+class BM25Index:
+    """Okapi BM25 index over the chunks of one collection."""
+
+    def __init__(self, ids: List[str], postings: Dict[str, List[List[int]]], lengths: List[int],
+                 fields: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.postings = postings
+        self.lengths = lengths
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Optional[dict]]) -> 'BM25Index':
+        postings: Dict[str, List[List[int]]] = {}
+        lengths = []
+        fields = []
+        for position, (document, metadata) in enumerate(zip(documents, metadatas)):
+            tokens = tokenize(document)
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([position, frequency])
+            metadata = metadata or {}
+            fields.append({field: str(metadata[field]) for field in FILTER_FIELDS if metadata.get(field) is not None})
+        return cls(list(ids), postings, lengths, fields)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Persistence
+
+    def save(self, path: str) -> None:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'ids': self.ids,
+                'postings': self.postings,
+                'lengths': self.lengths,
+                'fields': self.fields,
+            }, handle, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        with open(path, encoding='utf-8') as handle:
+            data = json.load(handle)
+        return cls(data['ids'], data['postings'], data['lengths'], data['fields'])
+
+    # Search
+
+    def _matches(self, position: int, where: Optional[dict]) -> bool:
+        if not where:
+            return True
+        for field, condition in where.items():
+            expected = condition.get('$eq') if isinstance(condition, dict) else condition
+            if self.fields[position].get(field) != str(expected):
+                return False
+        return True
+
+    def search(self, query: str, top_k: int, where: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks for ``query``.
+
+        Args:
+            query: Search text
+            top_k: Number of hits
+            where: Chroma-style equality filter on indexed metadata fields
+
+        Returns:
+            [(chunk id, score)] best first
+        """
+        if not self.ids:
+            return []
+        count = len(self.ids)
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / (self.avg_length or 1))
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(
+            (item for item in scores.items() if self._matches(item[0], where)),
+            key=lambda item: item[1], reverse=True
+        )
+        return [(self.ids[position], score) for position, score in ranked[:top_k]]
+
+
+class _IndexCache:
+    """Process-wide cache of loaded indexes, refreshed when the file changes."""
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._indexes: 'OrderedDict[str, Tuple[float, BM25Index]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[BM25Index]:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._indexes.get(path)
+            if cached and cached[0] == mtime:
+                self._indexes.move_to_end(path)
+                return cached[1]
+        try:
+            index = BM25Index.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load BM25 index {path}: {e}")
+            return None
+        self.put(path, index, mtime)
+        return index
+
+    def put(self, path: str, index: BM25Index, mtime: Optional[float] = None) -> None:
+        if mtime is None:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return
+        with self._lock:
+            self._indexes[path] = (mtime, index)
+            self._indexes.move_to_end(path)
+            while len(self._indexes) > self.max_size:
+                self._indexes.popitem(last=False)
+
+
+_index_cache = _IndexCache()
+
+
+def build_index(vector_store_path: str, collection_name: str, ids, documents, metadatas) -> Optional[BM25Index]:
+    """Build and persist the BM25 index of a collection at ingestion."""
+    index = BM25Index.build(ids, documents, metadatas)
+    path = index_path(vector_store_path, collection_name)
+    try:
+        index.save(path)
+        _index_cache.put(path, index)
+    except OSError as e:
+        logger.warning(f"Could not save BM25 index {path}: {e}")
+    logger.info(f"Built BM25 index with {len(index)} chunks for {collection_name}")
+    return index
+
+
+def get_index(collection, vector_store_path: str, collection_name: str) -> Optional[BM25Index]:
+    """Load the collection's BM25 index, rebuilding it if missing or stale."""
+    path = index_path(vector_store_path, collection_name)
+    index = _index_cache.get(path)
+    try:
+        size = collection.count()
+    except Exception:
+        return index
+    if index is not None and len(index) == size:
+        return index
+
+    try:
+        data = collection.get(include=['documents', 'metadatas'])
+    except Exception as e:
+        logger.warning(f"Could not read {collection_name} to build BM25 index: {e}")
+        return index
+    return build_index(vector_store_path, collection_name, data['ids'], data['documents'], data['metadatas'])
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def hybrid_query(collection, vector_store_path: str, collection_name: str, query: str,
+                 n_results: int, where: Optional[dict] = None,
+                 query_embedding: Optional[List[float]] = None) -> dict:
+    """
+    Query a collection with vector search and BM25 and fuse the rankings.
+
+    ``query_embedding`` is used for the vector search when given; otherwise
+    ChromaDB embeds ``query`` itself.
+
+    Returns results in the shape of ``collection.query`` for a single query
+    text, with an extra ``scores`` list holding the fusion scores.
+    """
+    candidates = max(n_results * 4, 20)
+    if query_embedding is not None:
+        query_params = {'query_embeddings': [query_embedding], 'n_results': candidates}
+    else:
+        query_params = {'query_texts': [query], 'n_results': candidates}
+    if where:
+        query_params['where'] = where
+    vector = collection.query(**query_params)
+
+    vector_ids = vector['ids'][0] if vector and vector.get('ids') else []
+    by_id = {
+        chunk_id: {
+            'document': vector['documents'][0][i],
+            'metadata': vector['metadatas'][0][i] if vector.get('metadatas') else {},
+            'distance': vector['distances'][0][i] if vector.get('distances') else None,
+        }
+        for i, chunk_id in enumerate(vector_ids)
+    }
+
+    index = get_index(collection, vector_store_path, collection_name)
+    lexical_ids = [chunk_id for chunk_id, _ in index.search(query, candidates, where)] if index else []
+
+    fused = reciprocal_rank_fusion([vector_ids, lexical_ids])[:n_results]
+
+    # Lexical-only hits are not in the vector results; fetch their text
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+    if missing:
+        fetched = collection.get(ids=missing, include=['documents', 'metadatas'])
+        for i, chunk_id in enumerate(fetched['ids']):
+            by_id[chunk_id] = {
+                'document': fetched['documents'][i],
+                'metadata': fetched['metadatas'][i] if fetched.get('metadatas') else {},
+                'distance': None,
+            }
+
+    fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in by_id]
+    return {
+        'ids': [[chunk_id for chunk_id, _ in fused]],
+        'documents': [[by_id[chunk_id]['document'] for chunk_id, _ in fused]],
+        'metadatas': [[by_id[chunk_id]['metadata'] for chunk_id, _ in fused]],
+        'distances': [[by_id[chunk_id]['distance'] for chunk_id, _ in fused]],
+        'scores': [[score for _, score in fused]],
+    }
+
+
+class CrossEncoderReranker:
+    """Optional CPU cross-encoder rescoring (query, chunk) pairs."""
+
+    def __init__(self):
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return getattr(settings, 'RAG_RERANKER_MODEL', '')
+
+    def _load(self):
+        if self._model is not None or self._failed or not self.model_name:
+            return self._model
+        with self._lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=512, device='cpu')
+                    logger.info(f"Loaded reranker {self.model_name}")
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"Reranker {self.model_name} unavailable, using fused ranking: {e}")
+        return self._model
+
+    def rerank(self, query: str, documents: List[dict], top_k: int) -> List[dict]:
+        """
+        Reorder ``documents`` by cross-encoder relevance and keep ``top_k``.
+        Returns the first ``top_k`` unchanged when no reranker is configured.
+        """
+        model = self._load()
+        if model is None or len(documents) <= 1:
+            return documents[:top_k]
+
+        candidates = documents[:getattr(settings, 'RAG_RERANK_CANDIDATES', 20)]
+        try:
+            scores = model.predict([(query, document['content'][:2000]) for document in candidates])
+        except Exception as e:
+            logger.warning(f"Reranking failed, using fused ranking: {e}")
+            return documents[:top_k]
+
+        for document, score in zip(candidates, scores):
+            document['rerank_score'] = float(score)
+        candidates.sort(key=lambda document: document['rerank_score'], reverse=True)
+        return candidates[:top_k]
+
+
+reranker = CrossEncoderReranker()
@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import List, Optional, Dict
 from django.conf import settings
 from .models import VectorStore, ExamVectorStore
+from .hybrid_search import build_index, hybrid_query, reranker
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +36,30 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     logger.warning("Sentence Transformers not installed. Using basic embeddings.")
 
+# Model of ChromaDB's default embedding function, which embeds the collections
+COLLECTION_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+def _collection_embedder():
+    """
+    Shared embedding service when it produces vectors compatible with the
+    collections, so ingestion and queries use its runtime and its on-disk
+    embedding cache; None leaves embedding to ChromaDB. Quantized vectors
+    drift from the fp32 ones already stored, so a service running any ONNX
+    file other than the fp32 export is never used for collections.
+    """
+    from ai_tools.llm.embeddings import embedding_service
+    
+    model_name = embedding_service.sentence_transformer_model.split('/')[-1]
+    if (
+        embedding_service.embedding_model == 'sentence-transformers'
+        and embedding_service.model is not None
+        and not embedding_service.quantized
+        and model_name == COLLECTION_EMBEDDING_MODEL
+    ):
+        return embedding_service
+    return None
+
 
 class DocumentProcessor:
     """Process documents and create vector stores."""
@@ -53,8 +78,9 @@ class DocumentProcessor:
         
         if SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
-                # Use a lightweight model suitable for educational content
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                # Lightweight model suitable for educational content, shared with
+                # queries along with its embedding cache
+                self.embedding_model = _collection_embedder()
             except Exception as e:
                 logger.error(f"Failed to load embedding model: {str(e)}")
     
@@ -231,11 +257,23 @@ class DocumentProcessor:
                 batch_ids = ids[i:i+batch_size]
                 batch_metas = chunk_metadatas[i:i+batch_size]
                 
-                collection.add(
-                    documents=batch_chunks,
-                    ids=batch_ids,
-                    metadatas=batch_metas
-                )
+                add_params = {
+                    'documents': batch_chunks,
+                    'ids': batch_ids,
+                    'metadatas': batch_metas,
+                }
+                if self.embedding_model:
+                    embeddings = self.embedding_model.embed_texts(batch_chunks)
+                    if all(embedding is not None for embedding in embeddings):
+                        add_params['embeddings'] = embeddings
+                
+                collection.add(**add_params)
+            
+            # Lexical index used alongside the embeddings at query time
+            try:
+                build_index(vector_store_path, collection_name, ids, chunks, chunk_metadatas)
+            except Exception as e:
+                logger.warning(f"BM25 index not built for {collection_name}: {e}")
             
             logger.info(f"Created vector store with {len(chunks)} chunks at {vector_store_path}")
             return len(chunks)
@@ -449,6 +487,50 @@ def query_vector_store(
         return []
 
 
+def _hybrid_search_enabled() -> bool:
+    return getattr(settings, 'RAG_HYBRID_SEARCH', True)
+
+
+def _query_collection(
+    collection,
+    vector_store_path: str,
+    collection_name: str,
+    query: str,
+    n_results: int,
+    where: Optional[dict] = None
+) -> dict:
+    """
+    Query a collection, fusing vector and BM25 rankings when hybrid search
+    is enabled (``RAG_HYBRID_SEARCH``), else with vector search only.
+    """
+    embedder = _collection_embedder()
+    query_embedding = embedder.embed_query(query) if embedder else None
+    
+    if _hybrid_search_enabled():
+        return hybrid_query(
+            collection, vector_store_path, collection_name, query, n_results, where, query_embedding
+        )
+    if query_embedding is not None:
+        query_params = {"query_embeddings": [query_embedding], "n_results": n_results}
+    else:
+        query_params = {"query_texts": [query], "n_results": n_results}
+    if where:
+        query_params["where"] = where
+    return collection.query(**query_params)
+
+
+def _rank_documents(documents: List[dict], query: str, top_k: int) -> List[dict]:
+    """Order documents gathered from several stores and keep the best."""
+    if _hybrid_search_enabled():
+        documents.sort(key=lambda x: x.get('score') or 0, reverse=True)
+        return reranker.rerank(query, documents, top_k)
+    
+    # Sort by distance (relevance) if available
+    if documents and documents[0].get('distance') is not None:
+        documents.sort(key=lambda x: x.get('distance', float('inf')))
+    return documents[:top_k * 2]  # Return top results across all stores
+
+
 def _normalize_chapter_for_filter(chapter_input: str) -> int:
     """
     Normalize chapter input to a number for filtering.
@@ -713,11 +795,10 @@ def query_curriculum_documents(
                 else:
                     logger.info(f"📝 No chapter parameter provided, using semantic search only")
                 
-                # Query collection
-                query_params = {
-                    "query_texts": [query],
-                    "n_results": top_k
-                }
+                def run_query(where=None):
+                    return _query_collection(
+                        collection, vs.vector_store_path, collection_name, query, top_k, where
+                    )
                 
                 logger.info(f"🔎 Query text (first 150 chars): {query[:150]}...")
                 
@@ -725,21 +806,21 @@ def query_curriculum_documents(
                 if where_filter:
                     try:
                         logger.info(f"🎯 Attempting query WITH metadata filter...")
-                        results = collection.query(**query_params, where=where_filter)
+                        results = run_query(where_filter)
                         # If no results with filter, fall back to no filter
                         if not results or not results.get('documents') or not results['documents'][0]:
                             logger.warning(f"⚠️ No results with chapter filter, falling back to semantic search only")
-                            results = collection.query(**query_params)
+                            results = run_query()
                             logger.info(f"✅ Fallback query returned {len(results['documents'][0]) if results and results.get('documents') else 0} results")
                         else:
                             logger.info(f"✅ Filtered query returned {len(results['documents'][0])} results")
                     except Exception as e:
                         logger.warning(f"❌ Metadata filtering failed: {e}, using semantic search only")
-                        results = collection.query(**query_params)
+                        results = run_query()
                 else:
                     # No chapter filter, use semantic search with query variants
                     logger.info(f"🎯 Querying WITHOUT metadata filter (semantic search only)...")
-                    results = collection.query(**query_params)
+                    results = run_query()
                     logger.info(f"✅ Semantic query returned {len(results['documents'][0]) if results and results.get('documents') else 0} results")
                 
                 # Format results
@@ -764,6 +845,7 @@ def query_curriculum_documents(
                             'content': doc,
                             'metadata': metadata,
                             'distance': results['distances'][0][i] if results['distances'] else None,
+                            'score': results['scores'][0][i] if results.get('scores') else None,
                             'source': vs.file_name
                         })
                 
@@ -773,12 +855,8 @@ def query_curriculum_documents(
                 logger.error(f"Error querying vector store {vs.id}: {str(e)}")
                 continue
         
-        # Sort by distance (relevance) if available
-        if all_documents and all_documents[0].get('distance') is not None:
-            all_documents.sort(key=lambda x: x.get('distance', float('inf')))
-        
         logger.info(f"Total documents retrieved: {len(all_documents)}")
-        return all_documents[:top_k * 2]  # Return top results across all stores
+        return _rank_documents(all_documents, query, top_k)
     
     except Exception as e:
         logger.error(f"Error querying curriculum documents: {str(e)}")
@@ -871,11 +949,10 @@ def query_exam_documents(
                         logger.warning(f"Chapter metadata filtering not available: {e}")
                         where_filter = None
                 
-                # Query collection
-                query_params = {
-                    "query_texts": [query],
-                    "n_results": top_k
-                }
+                def run_query(where=None):
+                    return _query_collection(
+                        collection, es.vector_store_path, collection_name, query, top_k, where
+                    )
                 
                 logger.info(f"🔎 Exam query text (first 150 chars): {query[:150]}...")
                 
@@ -883,19 +960,19 @@ def query_exam_documents(
                 if where_filter:
                     try:
                         logger.info(f"🎯 Attempting exam query WITH metadata filter...")
-                        results = collection.query(**query_params, where=where_filter)
+                        results = run_query(where_filter)
                         if not results or not results.get('documents') or not results['documents'][0]:
                             logger.warning(f"⚠️ No results with chapter filter, falling back to semantic search only")
-                            results = collection.query(**query_params)
+                            results = run_query()
                             logger.info(f"✅ Fallback query returned {len(results['documents'][0]) if results and results.get('documents') else 0} results")
                         else:
                             logger.info(f"✅ Filtered query returned {len(results['documents'][0])} results")
                     except Exception as e:
                         logger.warning(f"❌ Metadata filtering failed: {e}, using semantic search only")
-                        results = collection.query(**query_params)
+                        results = run_query()
                 else:
                     logger.info(f"🎯 Querying exam WITHOUT metadata filter (semantic search only)...")
-                    results = collection.query(**query_params)
+                    results = run_query()
                     logger.info(f"✅ Semantic query returned {len(results['documents'][0]) if results and results.get('documents') else 0} results")
                 
                 # Format results
@@ -911,7 +988,8 @@ def query_exam_documents(
                         all_documents.append({
                             'content': doc,
                             'metadata': metadata,
-                            'distance': results['distances'][0][i] if results.get('distances') else None
+                            'distance': results['distances'][0][i] if results.get('distances') else None,
+                            'score': results['scores'][0][i] if results.get('scores') else None
                         })
                         
                         logger.info(f"📄 Retrieved exam document {i+1}: {doc[:100]}...")
@@ -920,12 +998,8 @@ def query_exam_documents(
                 logger.error(f"Error querying exam store {es.id}: {str(e)}")
                 continue
         
-        # Sort by distance (relevance) if available
-        if all_documents and all_documents[0].get('distance') is not None:
-            all_documents.sort(key=lambda x: x.get('distance', float('inf')))
-        
         logger.info(f"Total exam documents retrieved: {len(all_documents)}")
-        return all_documents[:top_k * 2]  # Return top results across all stores
+        return _rank_documents(all_documents, query, top_k)
     
     except Exception as e:
         logger.error(f"Error querying exam documents: {str(e)}")
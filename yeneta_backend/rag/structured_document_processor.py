@@ -162,9 +162,12 @@ class StructuredDocumentProcessor:
         # Check size
         current_size = 0
         if TOKEN_COUNTER_AVAILABLE:
-            current_size = token_counter.count_tokens(full_text)
+            # Count each chunk once (memoized across calls) and reuse the counts below
+            chunk_tokens = [token_counter.count_tokens(text) for text in chunks_text]
+            current_size = sum(chunk_tokens) + token_counter.count_tokens("\n\n") * (len(chunks_text) - 1)
             limit_val = max_limit if max_limit < 100000 else int(max_limit / 4)
         else:
+            chunk_tokens = [len(text) // 4 for text in chunks_text]
             current_size = len(full_text)
             limit_val = max_limit
 
@@ -238,7 +241,7 @@ class StructuredDocumentProcessor:
         current_tokens = 0
         
         for chunk in scored_chunks:
-            chunk_len = len(chunk['text']) // 4 if not TOKEN_COUNTER_AVAILABLE else token_counter.count_tokens(chunk['text'])
+            chunk_len = chunk_tokens[chunk['original_index']]
             
             if current_tokens + chunk_len <= limit_val:
                 selected_chunks.append(chunk)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
 from .models import Family, FamilyMembership
 
 User = get_user_model()
@@ -49,9 +50,15 @@ class FamilyAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [FamilyMembershipInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            active_member_count=Count('members', filter=Q(members__is_active=True))
+        )
+    
     def member_count(self, obj):
-        return obj.members.filter(is_active=True).count()
+        return obj.active_member_count
     member_count.short_description = 'Active Members'
+    member_count.admin_order_field = 'active_member_count'
 
 
 @admin.register(FamilyMembership)
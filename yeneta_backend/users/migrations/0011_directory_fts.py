@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from users.search_index import user_index, family_index
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if user_index.create(connection):
+        user_index.rebuild(apps.get_model('users', 'User').objects.iterator())
+    if family_index.create(connection):
+        family_index.rebuild(apps.get_model('users', 'Family').objects.prefetch_related('members__user').iterator(chunk_size=500))
+
+
+def drop_search_indexes(apps, schema_editor):
+    user_index.drop(schema_editor.connection)
+    family_index.drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_user_first_name_alter_user_last_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -1,7 +1,7 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 
@@ -211,3 +211,45 @@ class UserDocument(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.document_type}"
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    """Keep the directory search index in step with user changes."""
+    from .search_index import user_index, family_index, USER_INDEXED_FIELDS
+
+    if update_fields and not set(update_fields) & USER_INDEXED_FIELDS:
+        return
+    user_index.index(instance)
+    for family in Family.objects.filter(members__user=instance).prefetch_related('members__user').distinct():
+        family_index.index(family)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    from .search_index import user_index
+    user_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Family)
+def index_family(sender, instance, **kwargs):
+    from django.db.models import prefetch_related_objects
+    from .search_index import family_index
+    prefetch_related_objects([instance], 'members__user')
+    family_index.index(instance)
+
+
+@receiver(post_delete, sender=Family)
+def unindex_family(sender, instance, **kwargs):
+    from .search_index import family_index
+    family_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=FamilyMembership)
+@receiver(post_delete, sender=FamilyMembership)
+def reindex_membership_family(sender, instance, **kwargs):
+    """Member names are searchable on the family, so refresh it."""
+    from .search_index import family_index
+    family = Family.objects.prefetch_related('members__user').filter(pk=instance.family_id).first()
+    if family is not None:
+        family_index.index(family)
@@ -0,0 +1,59 @@
+"""
+Full-text indexes for the user and family directories (typeahead search).
+"""
+from yeneta_backend.fulltext import FullTextIndex
+
+# Fields whose changes require re-indexing a user
+USER_INDEXED_FIELDS = {'username', 'email', 'first_name', 'last_name', 'role', 'account_status'}
+
+# Typeahead result cap
+DIRECTORY_SEARCH_LIMIT = 50
+MAX_DIRECTORY_SEARCH_LIMIT = 200
+
+
+def _user_document(user):
+    return {
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'role': user.role,
+        'account_status': user.account_status,
+    }
+
+
+def _family_document(family):
+    # Callers prefetch members__user; filtering here keeps rebuilds at one query
+    members = [m for m in family.members.all() if m.is_active]
+    return {
+        'name': family.name,
+        'members': ' '.join(
+            f'{m.user.username} {m.user.first_name} {m.user.last_name}' for m in members
+        ),
+    }
+
+
+user_index = FullTextIndex(
+    'users_fts',
+    columns=('username', 'first_name', 'last_name', 'email'),
+    document=_user_document,
+    weights=(8.0, 6.0, 6.0, 3.0),
+    filter_columns=('role', 'account_status'),
+    # Typeahead starts at one character; pre-index short prefixes
+    prefix_lengths=(1, 2, 3, 4, 5, 6),
+)
+
+family_index = FullTextIndex(
+    'families_fts',
+    columns=('name', 'members'),
+    document=_family_document,
+    weights=(8.0, 4.0),
+)
+
+
+def search_limit(value) -> int:
+    """Parse a ``max_results`` query parameter into the allowed range."""
+    try:
+        return max(1, min(int(value), MAX_DIRECTORY_SEARCH_LIMIT))
+    except (TypeError, ValueError):
+        return DIRECTORY_SEARCH_LIMIT
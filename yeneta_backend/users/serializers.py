@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from .models import Family, FamilyMembership, UserDocument
 
 User = get_user_model()
@@ -115,7 +117,13 @@ class FamilySerializer(serializers.ModelSerializer):
 
 
 class FamilyDetailedSerializer(serializers.ModelSerializer):
-    """Serializer for Family model with member details."""
+    """
+    Serializer for Family model with member details.
+
+    Querysets prepared with ``setup_eager_loading`` are serialized in a
+    constant number of queries: member counts come from an annotation and
+    active memberships (with their users) from one prefetch.
+    """
     
     member_count = serializers.SerializerMethodField()
     members = serializers.SerializerMethodField()
@@ -125,13 +133,35 @@ class FamilyDetailedSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'member_count', 'members', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Annotate active member counts and prefetch active memberships."""
+        active_count = FamilyMembership.objects.filter(
+            family=OuterRef('pk'), is_active=True
+        ).order_by().values('family').annotate(count=Count('id')).values('count')
+        return queryset.annotate(
+            active_member_count=Coalesce(Subquery(active_count), 0)
+        ).prefetch_related(
+            Prefetch(
+                'members',
+                queryset=FamilyMembership.objects.filter(is_active=True).select_related('user'),
+                to_attr='active_members'
+            )
+        )
+    
+    def _active_members(self, obj):
+        if hasattr(obj, 'active_members'):
+            return obj.active_members
+        return obj.members.filter(is_active=True).select_related('user')
+    
     def get_member_count(self, obj):
         """Get count of active family members."""
+        if hasattr(obj, 'active_member_count'):
+            return obj.active_member_count
         return obj.members.filter(is_active=True).count()
     
     def get_members(self, obj):
         """Get active family members with their details."""
-        memberships = obj.members.filter(is_active=True)
         return [
             {
                 'id': m.id,
@@ -143,7 +173,7 @@ class FamilyDetailedSerializer(serializers.ModelSerializer):
                 },
                 'role': m.role
             }
-            for m in memberships
+            for m in self._active_members(obj)
         ]
 
 
@@ -7,7 +7,10 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 
+from yeneta_backend.pagination import CursorPaginatedListMixin, OptionalCursorPagination, is_stream_request, stream_json_response
+from yeneta_backend.fulltext import in_ranked_order
 from .models import Family, FamilyMembership, UserDocument
+from .search_index import user_index, family_index, search_limit
 from .serializers import (
     UserSerializer, 
     UserRegistrationSerializer, 
@@ -121,32 +124,66 @@ def current_user_view(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(CursorPaginatedListMixin, generics.ListAPIView):
     """List all users (Admin only)."""
     
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-date_joined'
+    
+    def paginate_queryset(self, queryset):
+        # Search results are capped and ranked; keyset pages would reorder them
+        if self.request.query_params.get('search'):
+            return None
+        return super().paginate_queryset(queryset)
     
     def get_queryset(self):
         queryset = User.objects.none()
+        allowed_roles = None  # Every role
         
         # Role-based access control
         if self.request.user.role == 'Admin':
             queryset = User.objects.all()
         elif self.request.user.role == 'Teacher':
-            queryset = User.objects.filter(role__in=['Student', 'Parent', 'Admin', 'Teacher'])
+            allowed_roles = ['Student', 'Parent', 'Admin', 'Teacher']
+            queryset = User.objects.filter(role__in=allowed_roles)
         elif self.request.user.role == 'Parent':
-            queryset = User.objects.filter(role__in=['Teacher', 'Admin', 'Parent'])
+            allowed_roles = ['Teacher', 'Admin', 'Parent']
+            queryset = User.objects.filter(role__in=allowed_roles)
         elif self.request.user.role == 'Student':
             # Allow students to see Teachers, Admins, Parents, and other Students
             queryset = User.objects.all()
         else:
             queryset = User.objects.filter(id=self.request.user.id)
 
-        # Search functionality
+        # Filter by role (comma-separated) and account status
+        role_filter = self.request.query_params.get('role', None)
+        if role_filter:
+            queryset = queryset.filter(role__in=role_filter.split(','))
+        status_filter = self.request.query_params.get('status', None)
+        if status_filter:
+            queryset = queryset.filter(account_status=status_filter)
+
+        # Search functionality: ranked, capped prefix search from the directory index
         query = self.request.query_params.get('search', None)
         if query:
+            # Restrict the index to visible roles so the cap is not spent on hidden users
+            filters = {}
+            roles = role_filter.split(',') if role_filter else allowed_roles
+            if role_filter and allowed_roles is not None:
+                roles = [role for role in roles if role in allowed_roles]
+            if roles is not None:
+                filters['role'] = roles
+            if status_filter:
+                filters['account_status'] = [status_filter]
+            ids = user_index.match_ids(
+                query,
+                limit=search_limit(self.request.query_params.get('max_results')),
+                filters=filters
+            )
+            if ids is not None:
+                return in_ranked_order(queryset, ids)
             queryset = queryset.filter(
                 Q(username__icontains=query) |
                 Q(email__icontains=query) |
@@ -154,11 +191,6 @@ class UserListView(generics.ListAPIView):
                 Q(last_name__icontains=query)
             )
             
-        # Filter by account status
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(account_status=status_filter)
-            
         return queryset
 
 
@@ -237,6 +269,15 @@ def students_list_view(request):
     """Get list of students (for teachers)."""
     
     students = User.objects.filter(role='Student')
+    
+    if is_stream_request(request):
+        return stream_json_response(students, UserSerializer, request=request)
+    
+    paginator = OptionalCursorPagination()
+    page = paginator.paginate_queryset(students, request)
+    if page is not None:
+        return paginator.get_paginated_response(UserSerializer(page, many=True).data)
+    
     serializer = UserSerializer(students, many=True)
     return Response(serializer.data)
 
@@ -340,9 +381,21 @@ class FamilyViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'Admin':
-            return Family.objects.all()
+            families = Family.objects.all()
+        else:
+            families = Family.objects.filter(members__user=user, members__is_active=True).distinct()
         
-        return Family.objects.filter(members__user=user, members__is_active=True).distinct()
+        if self.action in ('list', 'retrieve', 'my_families'):
+            from .serializers import FamilyDetailedSerializer
+            families = FamilyDetailedSerializer.setup_eager_loading(families)
+        return families
+    
+    def get_serializer_class(self):
+        # Reads include active members; writes keep the plain family fields
+        if self.action in ('list', 'retrieve', 'my_families'):
+            from .serializers import FamilyDetailedSerializer
+            return FamilyDetailedSerializer
+        return FamilySerializer
     
     @action(detail=False, methods=['get'])
     def my_families(self, request):
@@ -371,7 +424,7 @@ class FamilyViewSet(viewsets.ModelViewSet):
     def members(self, request, pk=None):
         """Get members of a family."""
         family = self.get_object()
-        memberships = family.members.filter(is_active=True)
+        memberships = family.members.filter(is_active=True).select_related('user', 'family')
         serializer = FamilyMembershipSerializer(memberships, many=True)
         return Response(serializer.data)
 
@@ -387,12 +440,14 @@ def student_families_view(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    families = Family.objects.filter(
-        members__user=request.user,
-        members__is_active=True
-    ).distinct()
-    
     from .serializers import FamilyDetailedSerializer
+    families = FamilyDetailedSerializer.setup_eager_loading(
+        Family.objects.filter(
+            members__user=request.user,
+            members__is_active=True
+        ).distinct()
+    )
+    
     serializer = FamilyDetailedSerializer(families, many=True)
     return Response(serializer.data)
 
@@ -412,13 +467,20 @@ def search_families_view(request):
     if not query:
         return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    families = Family.objects.filter(
-        Q(name__istartswith=query) |
-        Q(members__user__username__istartswith=query),
-        members__is_active=True
-    ).distinct()[:50]
-    
     from .serializers import FamilyDetailedSerializer
+    limit = search_limit(request.query_params.get('max_results'))
+    families = FamilyDetailedSerializer.setup_eager_loading(
+        Family.objects.filter(members__is_active=True).distinct()
+    )
+    ids = family_index.match_ids(query, limit=limit)
+    if ids is not None:
+        families = in_ranked_order(families, ids)
+    else:
+        families = families.filter(
+            Q(name__istartswith=query) |
+            Q(members__user__username__istartswith=query)
+        )[:limit]
+    
     serializer = FamilyDetailedSerializer(families, many=True)
     return Response(serializer.data)
 
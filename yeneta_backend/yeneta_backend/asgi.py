@@ -12,17 +12,26 @@ import os
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-
-import communications.routing
+from django.urls import re_path
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yeneta_backend.settings')
 
+# Initialize Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+import ai_tools.routing
+import communications.routing
+
 application = ProtocolTypeRouter({
-  "http": get_asgi_application(),
+  # Async streaming endpoints first, everything else goes to Django
+  "http": URLRouter(
+        ai_tools.routing.http_urlpatterns + [
+            re_path(r'', django_asgi_app),
+        ]
+    ),
   "websocket": AuthMiddlewareStack(
         URLRouter(
             communications.routing.websocket_urlpatterns
         )
     ),
 })
-
@@ -0,0 +1,274 @@
+"""
+SQLite FTS5 full-text indexes for model search.
+
+``icontains`` searches OR-ed across several columns scan the whole table on
+every keystroke. A ``FullTextIndex`` keeps an FTS5 table whose rowids are
+the model's primary keys, so a search becomes one index lookup that is
+joined back onto the normal queryset (and its visibility filters) and
+ordered by BM25 rank.
+
+Indexes are maintained from signals. When the database is not SQLite, or
+SQLite was built without FTS5, ``search()`` returns None and callers keep
+their existing ``icontains`` filters.
+"""
+import logging
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def flatten_text(value) -> str:
+    """Collect every string inside a JSON-style value into one text blob."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return ' '.join(flatten_text(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return ' '.join(flatten_text(item) for item in value)
+    return str(value)
+
+
+def in_ranked_order(queryset, ids: Sequence[int]):
+    """Filter ``queryset`` to ``ids`` and keep the order of ``ids``."""
+    if not ids:
+        return queryset.none()
+    position = Case(
+        *[When(pk=pk, then=index) for index, pk in enumerate(ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=ids).order_by(position)
+
+
+class FullTextIndex:
+    """An FTS5 table mirroring selected text of one model."""
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        document: Callable[[object], Dict[str, str]],
+        weights: Optional[Sequence[float]] = None,
+        filter_columns: Sequence[str] = (),
+        prefix_lengths: Sequence[int] = (2, 3),
+        rank_limit: int = 2000,
+        using: str = 'default'
+    ):
+        """
+        Args:
+            table: Name of the FTS5 virtual table
+            columns: Searchable columns, in ranking-weight order
+            document: Callable mapping a model instance to {column: text}
+            weights: Per-column BM25 weights (defaults to 1.0 each)
+            filter_columns: Columns holding exact values (e.g. role) that
+                ``match_ids`` can filter on; never matched by search text
+            prefix_lengths: Prefix lengths FTS5 pre-indexes; longer lists
+                make short typeahead prefixes faster at the cost of size
+            rank_limit: Above this many matches ``match_ids`` skips BM25
+                ranking and returns the newest rows instead
+            using: Database alias holding the index
+        """
+        self.table = table
+        self.columns = tuple(columns)
+        self.filter_columns = tuple(filter_columns)
+        self.document = document
+        self.weights = tuple(weights or [1.0] * len(self.columns))
+        self.prefix_lengths = tuple(prefix_lengths)
+        self.rank_limit = rank_limit
+        self.using = using
+        self._available: Optional[bool] = None
+
+    # Schema
+
+    def create(self, connection=None) -> bool:
+        """Create the FTS5 table if the database supports it."""
+        connection = connection or connections[self.using]
+        if connection.vendor != 'sqlite':
+            return False
+        prefix = ' '.join(str(length) for length in self.prefix_lengths)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                    f"{', '.join(self.columns + self.filter_columns)}, "
+                    f"tokenize='unicode61 remove_diacritics 2', prefix='{prefix}')"
+                )
+        except DatabaseError as e:
+            logger.warning(f"FTS5 unavailable, {self.table} not created: {e}")
+            return False
+        self._available = None
+        return True
+
+    def drop(self, connection=None) -> None:
+        connection = connection or connections[self.using]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+        self._available = None
+
+    def is_available(self) -> bool:
+        """Whether the index table exists on the current database."""
+        if self._available is None:
+            connection = connections[self.using]
+            if connection.vendor != 'sqlite':
+                self._available = False
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.table]
+                    )
+                    self._available = cursor.fetchone() is not None
+        return self._available
+
+    # Maintenance
+
+    @property
+    def _insert_sql(self) -> str:
+        all_columns = self.columns + self.filter_columns
+        placeholders = ', '.join(['%s'] * (len(all_columns) + 1))
+        return f"INSERT INTO {self.table} (rowid, {', '.join(all_columns)}) VALUES ({placeholders})"
+
+    def _row(self, obj):
+        document = self.document(obj)
+        return [obj.pk] + [document.get(column) or '' for column in self.columns + self.filter_columns]
+
+    def index(self, obj) -> None:
+        """Insert or replace the index row of one instance."""
+        if not self.is_available():
+            return
+        try:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [obj.pk])
+                cursor.execute(self._insert_sql, self._row(obj))
+        except DatabaseError as e:
+            logger.error(f"Failed to index {obj._meta.label} {obj.pk} in {self.table}: {e}")
+
+    def remove(self, pk) -> None:
+        if not self.is_available():
+            return
+        try:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+        except DatabaseError as e:
+            logger.error(f"Failed to remove {pk} from {self.table}: {e}")
+
+    def rebuild(self, objects: Iterable, batch_size: int = 500) -> int:
+        """
+        Replace the whole index with ``objects``.
+
+        Returns:
+            Number of rows indexed
+        """
+        if not self.is_available():
+            return 0
+        insert = self._insert_sql
+        count = 0
+        with transaction.atomic(using=self.using), connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for obj in objects:
+                batch.append(self._row(obj))
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert, batch)
+                count += len(batch)
+        return count
+
+    # Querying
+
+    def build_query(self, text: str, filters: Optional[Dict[str, Sequence[str]]] = None) -> Optional[str]:
+        """
+        Turn user input into an FTS5 query: every word, prefix-matched, in
+        the searchable columns only, AND-ed with the exact-value filters.
+        """
+        tokens = TOKEN_RE.findall(text or '')
+        if not tokens:
+            return None
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        if self.filter_columns:
+            match = f"{{{' '.join(self.columns)}}}: ({match})"
+        for column, values in (filters or {}).items():
+            if column not in self.filter_columns:
+                raise ValueError(f"{column} is not a filter column of {self.table}")
+            if not values:
+                continue
+            phrases = ' OR '.join('"%s"' % value.replace('"', '""') for value in values)
+            match += f' AND {column}: ({phrases})'
+        return match
+
+    @property
+    def _bm25(self) -> str:
+        weights = list(self.weights) + [0.0] * len(self.filter_columns)
+        return f"bm25({self.table}, {', '.join(str(weight) for weight in weights)})"
+
+    def match_ids(
+        self,
+        text: str,
+        limit: int = 50,
+        filters: Optional[Dict[str, Sequence[str]]] = None
+    ) -> Optional[List[int]]:
+        """
+        Return the primary keys of the best ``limit`` matches, best first.
+
+        Ranking costs grow with the number of matches, so very broad
+        prefixes (more than ``rank_limit`` hits) return the newest matching
+        rows unranked; this keeps typeahead queries in the low milliseconds.
+
+        Args:
+            text: User search input
+            limit: Maximum number of ids returned
+            filters: {filter_column: allowed values}
+
+        Returns:
+            Ranked primary keys, or None when full-text search is unavailable
+        """
+        match = self.build_query(text, filters)
+        if match is None or not self.is_available():
+            return None
+
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE {self.table} MATCH %s", [match])
+            ordering = self._bm25 if cursor.fetchone()[0] <= self.rank_limit else 'rowid DESC'
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY {ordering} LIMIT %s",
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, queryset, text: str):
+        """
+        Restrict ``queryset`` to rows matching ``text``, best match first.
+
+        The queryset keeps all of its existing filters; rows are annotated
+        with ``search_rank`` (lower is better).
+
+        Returns:
+            The ranked queryset, or None when full-text search is unavailable
+        """
+        match = self.build_query(text)
+        if match is None or not self.is_available():
+            return None
+
+        connection = connections[self.using]
+        pk_column = '%s.%s' % (
+            connection.ops.quote_name(queryset.model._meta.db_table),
+            connection.ops.quote_name(queryset.model._meta.pk.column)
+        )
+        matching = RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [match])
+        rank = RawSQL(
+            f"SELECT {self._bm25} FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND rowid = {pk_column}",
+            [match]
+        )
+        return queryset.filter(pk__in=matching).annotate(search_rank=rank).order_by('search_rank', '-pk')
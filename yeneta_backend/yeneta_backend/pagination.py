@@ -0,0 +1,112 @@
+"""
+Opt-in pagination and streaming helpers for large list endpoints.
+
+Pagination is disabled globally because the frontend expects plain arrays.
+Endpoints that can grow large mix in ``CursorPaginatedListMixin``:
+- no extra params: the usual JSON array (unchanged contract)
+- ``?limit=N`` / ``?cursor=...``: keyset pagination with ``next``/``previous``
+- ``?stream=true``: the full array streamed in chunks from ``.iterator()``
+  (Admin exports only; other users get the plain array)
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Cursor pagination that only kicks in when the client asks for it.
+
+    Views choose the keyset with ``cursor_ordering``; it should match the
+    queryset's natural ordering so pages line up with the array response.
+    """
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                and self.page_size_query_param not in request.query_params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+def stream_json_response(queryset, serializer_class, context=None, chunk_size=500, request=None):
+    """
+    Stream a queryset as a JSON array without materializing it in memory.
+
+    Rows are read with ``.iterator()`` and serialized ``chunk_size`` at a
+    time, so memory stays bounded however large the table is. Under ASGI
+    the chunks are handed out through an async iterator: Django drains a
+    sync iterator into a list there, which would build the whole export in
+    memory.
+    """
+    def generate():
+        yield '['
+        first = True
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield _encode_chunk(chunk, first)
+                first = False
+                chunk = []
+        if chunk:
+            yield _encode_chunk(chunk, first)
+        yield ']'
+
+    def _encode_chunk(chunk, first):
+        data = serializer_class(chunk, many=True, context=context or {}).data
+        encoded = ','.join(json.dumps(item, cls=JSONEncoder) for item in data)
+        return encoded if first else ',' + encoded
+
+    async def agenerate():
+        parts = generate()
+        # Database access stays on the request's sync thread
+        next_part = sync_to_async(lambda: next(parts, None), thread_sensitive=True)
+        while True:
+            part = await next_part()
+            if part is None:
+                return
+            yield part
+
+    if request is None and context:
+        request = context.get('request')
+    asgi = isinstance(getattr(request, '_request', request), ASGIRequest)
+    return StreamingHttpResponse(agenerate() if asgi else generate(), content_type='application/json')
+
+
+def is_stream_request(request):
+    """Whether to stream the full list; reserved for Admin exports."""
+    if getattr(request.user, 'role', None) != 'Admin':
+        return False
+    return request.query_params.get('stream', '').lower() in ('1', 'true')
+
+
+class CursorPaginatedListMixin:
+    """
+    List mixin adding opt-in cursor pagination and ``?stream=true`` exports.
+
+    Must come before the DRF view class in the bases.
+    """
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = '-id'
+
+    def list(self, request, *args, **kwargs):
+        if is_stream_request(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            return stream_json_response(
+                queryset, self.get_serializer_class(), self.get_serializer_context()
+            )
+        return super().list(request, *args, **kwargs)
@@ -78,9 +78,37 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yeneta_backend.wsgi.application'
 ASGI_APPLICATION = 'yeneta_backend.asgi.application'
 
-CHANNEL_LAYERS = {
+# Channel layer backend: 'sqlite' shares groups across all ASGI worker processes
+# on this host through a local SQLite file (no Redis needed); 'memory' only
+# reaches sockets held by the same process.
+CHANNEL_LAYER_BACKEND = os.getenv('CHANNEL_LAYER_BACKEND', 'sqlite')
+
+if CHANNEL_LAYER_BACKEND == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'communications.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {
+                'path': os.getenv('CHANNEL_LAYER_PATH', str(BASE_DIR / 'channel_layer.sqlite3')),
+            },
+        },
+    }
+
+# Cache shared by every worker process on this host through a local SQLite
+# file, so invalidations made in one worker are seen by all of them
+CACHES = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': 'yeneta_backend.sqlite_cache.SQLiteCache',
+        'LOCATION': os.getenv('CACHE_PATH', str(BASE_DIR / 'cache.sqlite3')),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
     },
 }
 
@@ -125,6 +153,42 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Rendered PDF/DOCX exports (kept outside MEDIA_ROOT so they are never served directly)
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', str(BASE_DIR / 'export_cache'))
+# Documents larger than this many characters are rendered in the background
+# for clients that poll (?async=1)
+EXPORT_BACKGROUND_THRESHOLD = int(os.getenv('EXPORT_BACKGROUND_THRESHOLD', '20000'))
+EXPORT_MAX_BACKGROUND_RENDERS = int(os.getenv('EXPORT_MAX_BACKGROUND_RENDERS', '4'))
+# Renders still running after this many seconds are abandoned
+EXPORT_RENDER_TIMEOUT = int(os.getenv('EXPORT_RENDER_TIMEOUT', '300'))
+
+# Computed embeddings, keyed by model and text hash; the oldest are culled
+# above EMBEDDING_CACHE_MAX_ENTRIES
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', str(BASE_DIR / 'data' / 'embedding_cache.sqlite3'))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))
+
+# Text extracted from uploaded files, keyed by content hash
+EXTRACTED_TEXT_CACHE_DIR = os.getenv('EXTRACTED_TEXT_CACHE_DIR', str(BASE_DIR / 'extracted_text_cache'))
+
+# Curriculum RAG retrieval: fuse vector hits with a BM25 index per collection,
+# optionally reranked by a local CPU cross-encoder
+# (e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2'; empty disables reranking)
+RAG_HYBRID_SEARCH = os.getenv('RAG_HYBRID_SEARCH', 'True') == 'True'
+RAG_RERANKER_MODEL = os.getenv('RAG_RERANKER_MODEL', '')
+RAG_RERANK_CANDIDATES = int(os.getenv('RAG_RERANK_CANDIDATES', '20'))
+
+# New smart alerts are analyzed by the LLM in the background, several per
+# request, critical ones first
+ALERT_AUTO_ANALYSIS = os.getenv('ALERT_AUTO_ANALYSIS', 'True') == 'True'
+ALERT_ANALYSIS_BATCH_SIZE = int(os.getenv('ALERT_ANALYSIS_BATCH_SIZE', '8'))
+ALERT_ANALYSIS_BATCH_WINDOW = float(os.getenv('ALERT_ANALYSIS_BATCH_WINDOW', '2.0'))
+
+# AI Tutor prompts carry a rolling summary plus the recent turns of the
+# server-side session that fit in this many tokens; a session idle for longer
+# than TUTOR_SESSION_IDLE_MINUTES is not resumed implicitly
+TUTOR_HISTORY_TOKEN_BUDGET = int(os.getenv('TUTOR_HISTORY_TOKEN_BUDGET', '1500'))
+TUTOR_SESSION_IDLE_MINUTES = int(os.getenv('TUTOR_SESSION_IDLE_MINUTES', '120'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -137,6 +201,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     # Disable pagination to return arrays directly (frontend expects arrays, not paginated objects)
+    # Large list endpoints opt into ?cursor=/?limit= pagination via yeneta_backend.pagination
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 100,
 }
@@ -195,6 +260,13 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Lets the browser read whether older/newer message history remains and
+# which tutor session a response belongs to
+CORS_EXPOSE_HEADERS = [
+    'x-has-more',
+    'x-tutor-session',
+]
+
 # File Upload Settings
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 220200960  # 210MB
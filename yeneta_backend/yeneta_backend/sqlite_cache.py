@@ -0,0 +1,223 @@
+"""
+SQLite-backed Django cache shared by every worker process on one host.
+
+Without a ``CACHES`` setting Django uses LocMemCache, so each worker has a
+private cache and ``cache.delete()`` in a signal handler only clears the
+worker that handled the save. This backend keeps entries in one local
+SQLite file (WAL mode) that all processes open, so a write or invalidation
+in one worker is seen by all of them, without Redis or memcached.
+
+Integers are stored as SQLite integers so ``incr``/``decr`` run as a
+single ``UPDATE``, which makes them atomic across processes; other values
+are pickled.
+
+Configure with::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'yeneta_backend.sqlite_cache.SQLiteCache',
+            'LOCATION': BASE_DIR / 'cache.sqlite3',
+        },
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires);
+"""
+
+# Expired rows are purged (and the table culled) every this many writes
+CULL_EVERY = 200
+
+
+class SQLiteCache(BaseCache):
+    """Cache backend storing entries in a shared local SQLite file."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._writes = 0
+
+    # Connection handling
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the schema on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    # Encoding
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(stored):
+        if isinstance(stored, int):
+            return stored
+        return pickle.loads(stored)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        return self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        placeholders = ', '.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) "
+            f"AND (expires IS NULL OR expires > ?)",
+            (*key_map, time.time())
+        ).fetchall()
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+            [(key, self._encode(value), self.get_backend_timeout(timeout))]
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._write(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+            [(self.make_and_validate_key(key, version=version), self._encode(value), expires)
+             for key, value in data.items()]
+        )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key = ? AND expires IS NOT NULL AND expires <= ?",
+                (key, time.time())
+            )
+            added = conn.execute(
+                "INSERT OR IGNORE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+                (key, self._encode(value), self.get_backend_timeout(timeout))
+            ).rowcount == 1
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            "UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically add ``delta`` to an integer entry across processes."""
+        key = self.make_and_validate_key(key, version=version)
+        rows = self._connection().execute(
+            "UPDATE cache_entries SET value = value + ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, key, time.time())
+        ).fetchall()
+        if not rows:
+            raise ValueError("Key '%s' not found or not an integer" % key)
+        return rows[0][0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            "DELETE FROM cache_entries WHERE key = ?", (key,)
+        ).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._connection().execute(
+                f"DELETE FROM cache_entries WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            "SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def close(self, **kwargs):
+        # Connections are reused for the life of the thread
+        pass
+
+    # Maintenance
+
+    def _write(self, sql, rows):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(sql, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        self._writes += len(rows)
+        if self._writes >= CULL_EVERY:
+            self._writes = 0
+            self._cull(conn)
+
+    def _cull(self, conn):
+        """Drop expired rows, then the soonest-expiring ones above MAX_ENTRIES."""
+        conn.execute("DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries + (count // self._cull_frequency if self._cull_frequency else count)
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                "SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?)",
+                (excess,)
+            )